@@ -4,6 +4,8 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 import os, traceback
 
+import warmup
+
 def _fallback_app(error_msg: str):
     fa = FastAPI(title="GanadoBravo (ASGI fallback)")
     static_dir = os.path.join(os.path.dirname(__file__), "static")
@@ -32,8 +34,8 @@ def _fallback_app(error_msg: str):
     return fa
 
 try:
-    from main_app import app as fastapi_app
-    app = fastapi_app
+    # el tiempo de importar la app queda en warmup.IMPORTS_MS (/api/diag, /metrics)
+    app = warmup.timed_import("main_app").app
 except Exception:
     err = traceback.format_exc()
     app = _fallback_app(err)
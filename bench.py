@@ -0,0 +1,249 @@
+"""
+GanadoBravo — bench.py
+
+Micro-benchmarks de las heurísticas de imagen a resoluciones reales, sin red ni datos externos.
+Usa los bovinos sintéticos deterministas de synthetic.py (silueta con cabeza/giba/patas, lesiones
+rojas, ruido) de 0.3 a 12 MP y mide por función el tiempo (mediana/mín de N repeticiones, Frame nuevo en cada
+una, como un request) y el pico de memoria de Python/NumPy (tracemalloc, en una corrida aparte;
+no incluye los buffers internos de PIL).
+
+Uso:
+    python bench.py                      # corre todo y compara con bench_baseline.json
+    python bench.py --sizes 0.3,2 --cases single_pass,cc_label
+    python bench.py --update             # reescribe la línea base con esta máquina
+    python bench.py --threshold 0.3      # tolerancia de regresión en tiempo (default 50 %)
+    python bench.py --check-draft        # heurísticas con decodificación JPEG reducida vs completa
+    python bench.py --check-lot          # separación de animales en fotos de corral sintéticas
+
+Los casos decode/decode_full miden los niveles reducidos que piden heurísticas y huella
+(512 px) desde un JPEG, con y sin draft de PIL; el reporte muestra el tiempo ahorrado. El caso
+lot segmenta un corral sintético (synthetic_pen) del mismo tamaño, desde el JPEG.
+Sale con código 1 si algún caso empeora más que la tolerancia respecto de la línea base
+(o, con --check-draft, si algún veredicto cambia; con --check-lot, si algún corral no se separa
+en el número correcto de animales con IoU ≥ 0.5).
+"""
+from typing import Any, Callable, Dict, List, Tuple
+import argparse, json, os, platform, statistics, sys, time, tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from synthetic import synthetic_cow, synthetic_pen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+SIZES = {"0.3": (640, 480), "2": (1632, 1224), "5": (2592, 1944), "12": (4000, 3000)}
+
+def _cases() -> Dict[str, Callable[[Image.Image], Callable[[], Any]]]:
+    # cada caso prepara lo que no es parte de la medición y devuelve la función a cronometrar
+    import heuristics, pathology, breed, config
+    from frame import Frame
+
+    def single_pass(img):
+        return lambda: heuristics.run_single_pass(Frame(img))
+    def ensemble(img):
+        return lambda: heuristics.second_pass_ensemble(Frame(img), 0.5)
+    def pathology_all(img):
+        return lambda: pathology.run_pathology_heuristic(Frame(img), "levante", 0.5)
+    def cc_label(img):
+        mask = pathology._red_like(np.asarray(img))
+        return lambda: pathology._cc_label(mask)
+    def breed_heur(img):
+        return lambda: breed.run_breed_heuristic(Frame(img), config.current().raw)
+    def decode(img, draft=True):
+        data = _jpeg(img)
+        return lambda: _with_draft(draft, lambda: Frame.from_bytes(data).small_gray(512))
+    def lot_segment(img):
+        import lot
+        data = _jpeg(synthetic_pen(img.width, img.height, 6, seed=1)[0])
+        return lambda: lot.segment(Frame.from_bytes(data))
+    return {"single_pass": single_pass, "ensemble": ensemble, "pathology": pathology_all,
+            "cc_label": cc_label, "breed": breed_heur,
+            "decode": decode, "decode_full": lambda img: decode(img, draft=False), "lot": lot_segment}
+
+def _jpeg(img: Image.Image, quality: int = 90) -> bytes:
+    import io
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+def _with_draft(on: bool, fn: Callable[[], Any]) -> Any:
+    import frame
+    prev, frame.JPEG_DRAFT = frame.JPEG_DRAFT, on
+    try:
+        return fn()
+    finally:
+        frame.JPEG_DRAFT = prev
+
+def _time(fn: Callable[[], Any], repeat: int) -> Tuple[float, float]:
+    fn()  # calentamiento (imports perezosos, pools)
+    ts = []
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); ts.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(ts), min(ts)
+
+_CAL = np.random.default_rng(0).random((512, 512), dtype=np.float32)
+
+def _calibrate(repeat: int = 5) -> float:
+    # carga fija (gradientes + orden + convolución simple) cronometrada junto a cada caso:
+    # la comparación usa ms/cal, que tolera CPUs más lentas o con frecuencia variable
+    def work():
+        g = np.abs(np.diff(_CAL, axis=0))[:, :-1] + np.abs(np.diff(_CAL, axis=1))[:-1, :]
+        np.sort(g, axis=None)
+        return (_CAL[:-2] + 2*_CAL[1:-1] + _CAL[2:]).sum()
+    return _time(work, repeat)[1]
+
+def _peak_mb(fn: Callable[[], Any], runs: int = 3) -> float:
+    # mínimo de varios picos: pathology usa hilos y el solapamiento cambia el pico entre corridas
+    peaks = []
+    for _ in range(runs):
+        tracemalloc.start()
+        try:
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] / (1024*1024))
+        finally:
+            tracemalloc.stop()
+    return min(peaks)
+
+def run(sizes: List[str], cases: List[str], repeat: int) -> Dict[str, Any]:
+    available = _cases()
+    results = {}
+    for sz in sizes:
+        w, h = SIZES[sz]
+        img = synthetic_cow(w, h, seed=int(float(sz)*10))
+        for name in cases:
+            fn = available[name](img)
+            cal = _calibrate()
+            med, best = _time(fn, repeat)
+            cal = min(cal, _calibrate())
+            results[f"{name}@{sz}MP"] = {"ms_median": round(med, 2), "ms_min": round(best, 2),
+                                         "rel": round(best / cal, 3), "cal_ms": round(cal, 3),
+                                         "peak_mb": round(_peak_mb(fn), 2)}
+            print(f"{name+'@'+sz+'MP':<22} {med:9.1f} ms  (min {best:8.1f})  pico {results[f'{name}@{sz}MP']['peak_mb']:8.1f} MB",
+                  flush=True)
+    for sz in sizes:
+        d, f = results.get(f"decode@{sz}MP"), results.get(f"decode_full@{sz}MP")
+        if d and f:
+            print(f"decode@{sz}MP: draft {d['ms_min']:.1f} ms vs completa {f['ms_min']:.1f} ms → ahorra "
+                  f"{f['ms_min'] - d['ms_min']:.1f} ms ({(1 - d['ms_min']/f['ms_min'])*100:.0f} %)")
+    return {"meta": {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                     "cpus": os.cpu_count(), "repeat": repeat}, "results": results}
+
+def check_draft(sizes: List[str], seeds: int, rubric_tol: float) -> List[str]:
+    # conjunto de referencia: bovinos sintéticos con y sin lesiones, JPEG q90, en cada tamaño
+    import pipeline_real, tiers
+    out = []
+    for sz in sizes:
+        w, h = SIZES[sz]
+        for seed in range(seeds):
+            data = _jpeg(synthetic_cow(w, h, seed=100 + seed, lesions=seed % 3))
+            full = _with_draft(False, lambda: pipeline_real.heuristic_eval(data, "levante"))
+            draft = _with_draft(True, lambda: pipeline_real.heuristic_eval(data, "levante"))
+            diff = max(abs(a["score"] - b["score"]) for a, b in zip(full["rubric"], draft["rubric"]))
+            same = {
+                "decision": full["decision"]["decision_level"] == draft["decision"]["decision_level"],
+                "health": [x["status"] for x in full["health"]] == [x["status"] for x in draft["health"]],
+                "breed": full["breed"]["name"] == draft["breed"]["name"],
+                "escalation": tiers.escalation_reasons(full) == tiers.escalation_reasons(draft),
+                "rubric": diff <= rubric_tol,
+            }
+            bad = [k for k, ok in same.items() if not ok]
+            saved = full["timings_ms"]["heuristics"] - draft["timings_ms"]["heuristics"]
+            print(f"{sz}MP seed {seed}: {draft['decision']['decision_level']:<16} Δrubric máx {diff:.2f}  "
+                  f"heurísticas {full['timings_ms']['heuristics']:.0f} → {draft['timings_ms']['heuristics']:.0f} ms"
+                  f" ({saved:+.0f})  {'OK' if not bad else 'DISTINTO: ' + ', '.join(bad)}", flush=True)
+            if bad:
+                out.append(f"{sz}MP seed {seed}: {', '.join(bad)}")
+    return out
+
+def _iou(a, b) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2]-a[0])*(a[3]-a[1]) + (b[2]-b[0])*(b[3]-b[1]) - inter
+    return inter / union if union else 0.0
+
+def check_lot(sizes: List[str], seeds: int, counts=(0, 1, 2, 3, 4, 6, 8, 10)) -> List[str]:
+    # cada animal real tiene que aparecer en un recorte con IoU ≥ 0.5 y no puede sobrar ninguno
+    import lot
+    out = []
+    for sz in sizes:
+        w, h = SIZES[sz]
+        for n in counts:
+            for seed in range(seeds):
+                img, gt = synthetic_pen(w, h, n, seed)
+                t0 = time.perf_counter()
+                boxes = [a["box"] for a in lot.segment(_jpeg(img))["animals"]]
+                ms = (time.perf_counter() - t0) * 1000
+                ious = [max([_iou(g, b) for b in boxes] or [0.0]) for g in gt]
+                ok = len(boxes) == n and all(x >= 0.5 for x in ious)
+                print(f"{sz}MP n={n:<2} seed {seed}: {len(boxes):>2} recortes  IoU mín "
+                      f"{min(ious or [1.0]):.2f}  {ms:.0f} ms  {'OK' if ok else 'DISTINTO'}", flush=True)
+                if not ok:
+                    out.append(f"{sz}MP n={n} seed {seed}: {len(boxes)} recortes")
+    return out
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, mem_threshold: float,
+            floor_ms: float = 3.0) -> List[str]:
+    # regresión = tiempo relativo (mín./calibración) mayor que base*(1+threshold) y diferencia
+    # absoluta estimada mayor que floor_ms (casos de pocos ms son puro ruido)
+    out = []
+    base = baseline.get("results", {})
+    for k, cur in current["results"].items():
+        b = base.get(k)
+        if not b:
+            continue
+        if "rel" in b and cur["rel"] > b["rel"] * (1 + threshold) and (cur["rel"] - b["rel"]) * cur["cal_ms"] > floor_ms:
+            out.append(f"{k}: {b['rel']:.1f} → {cur['rel']:.1f} ×cal (+{(cur['rel']/b['rel']-1)*100:.0f} %), "
+                       f"{b['ms_min']:.1f} → {cur['ms_min']:.1f} ms")
+        if cur["peak_mb"] > b["peak_mb"] * (1 + mem_threshold) and cur["peak_mb"] - b["peak_mb"] > 1.0:
+            out.append(f"{k}: pico {b['peak_mb']:.1f} → {cur['peak_mb']:.1f} MB")
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Micro-benchmarks de heurísticas GanadoBravo")
+    ap.add_argument("--sizes", default=",".join(SIZES), help="MP separados por coma (%s)" % ",".join(SIZES))
+    ap.add_argument("--cases", default="single_pass,ensemble,pathology,cc_label,breed,decode,decode_full,lot")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--threshold", type=float, default=0.5)
+    ap.add_argument("--mem-threshold", type=float, default=0.25)
+    ap.add_argument("--update", action="store_true", help="guardar resultados como nueva línea base")
+    ap.add_argument("--json", help="escribir resultados en este archivo")
+    ap.add_argument("--check-draft", action="store_true", help="comparar veredictos draft vs decodificación completa")
+    ap.add_argument("--check-lot", action="store_true", help="separación de animales en corrales sintéticos")
+    ap.add_argument("--seeds", type=int, default=5, help="imágenes por tamaño para --check-draft/--check-lot")
+    ap.add_argument("--rubric-tol", type=float, default=0.5, help="diferencia máx. por métrica (escala 1–10)")
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, HERE)
+    if args.check_draft:
+        mismatches = check_draft(args.sizes.split(","), args.seeds, args.rubric_tol)
+        print("OK" if not mismatches else f"{len(mismatches)} imágenes con veredicto distinto")
+        return 1 if mismatches else 0
+    if args.check_lot:
+        mismatches = check_lot(args.sizes.split(","), args.seeds)
+        print("OK" if not mismatches else f"{len(mismatches)} corrales mal separados")
+        return 1 if mismatches else 0
+    current = run(args.sizes.split(","), args.cases.split(","), args.repeat)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.update:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"línea base actualizada: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("sin línea base (usa --update para crearla)")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        regressions = compare(current, json.load(f), args.threshold, args.mem_threshold)
+    for r in regressions:
+        print("REGRESIÓN", r)
+    print("OK" if not regressions else f"{len(regressions)} regresiones")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@
 from typing import Dict, Any
 import numpy as np
 from PIL import Image
+from frame import FrameLike, as_frame
 
 PROMPT_SISTEMA = """
 Eres un evaluador de ENRAZAMIENTO visual de ganado en fotos laterales.
@@ -59,8 +60,8 @@ def _hump_score(rgb: np.ndarray) -> float:
     s = min(1.0, 0.6*prom + 0.4*e/0.02)
     return s
 
-def run_breed_heuristic(img: Image.Image, cfg: Dict[str, Any]) -> Dict[str, Any]:
-    rgb = _to_np(img)
+def run_breed_heuristic(img: FrameLike, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    rgb = as_frame(img).rgb
     bw = cfg.get("breed", {}).get("weights", {"ears":0.35,"dewlap":0.40,"hump":0.25})
     zebu_hi = float(cfg.get("breed", {}).get("zebu_hi", 0.55))
     zebu_lo = float(cfg.get("breed", {}).get("zebu_lo", 0.40))
@@ -1,13 +1,10 @@
 
 from typing import Dict, Any, Optional
-import base64, os, io
 from PIL import Image
 
-# Optional OpenAI client (v1)
-try:
-    from openai import OpenAI  # type: ignore
-except Exception:  # pragma: no cover
-    OpenAI = None  # type: ignore
+import metrics
+import providers
+import upload
 
 # -------- System prompt (hidden) --------
 SYSTEM_PROMPT = """
@@ -28,32 +25,24 @@ Reglas:
 
 USER_PROMPT = "Evalúa la raza probable del bovino en la imagen siguiendo las reglas. No uses texto externo. Responde solo JSON."
 
-def _img_to_b64(img: Image.Image) -> str:
-    buf = io.BytesIO()
-    img.convert("RGB").save(buf, format="JPEG", quality=90)
-    return base64.b64encode(buf.getvalue()).decode("ascii")
+def _img_to_b64(img: upload.ImageLike) -> str:
+    # mismo artefacto reducido que el resto de llamadas de visión del request
+    return upload.build(img).b64
 
-def _call_openai(img: Image.Image, model: str = "gpt-4o-mini") -> Optional[Dict[str, Any]]:
-    if OpenAI is None or os.getenv("OPENAI_API_KEY") is None:
-        return None
-    client = OpenAI()
+def _messages(img: upload.ImageLike):
     b64 = _img_to_b64(img)
-    msg = client.chat.completions.create(
-        model=model,
-        temperature=0.0,
-        messages=[
-            {"role":"system","content":SYSTEM_PROMPT},
-            {"role":"user","content":[
-                {"type":"text","text":USER_PROMPT},
-                {"type":"image_url","image_url":{"url":f"data:image/jpeg;base64,{b64}"}},
-            ]}
-        ],
-        response_format={"type":"json_object"},
-        timeout=20,
-    )
+    return [
+        {"role":"system","content":SYSTEM_PROMPT},
+        {"role":"user","content":[
+            {"type":"text","text":USER_PROMPT},
+            {"type":"image_url","image_url":{"url":f"data:image/jpeg;base64,{b64}"}},
+        ]}
+    ]
+
+def _parse(content: Optional[str]) -> Optional[Dict[str, Any]]:
     try:
         import json as _json
-        data = _json.loads(msg.choices[0].message.content or "{}")
+        data = _json.loads(content or "{}")
         # basic validation
         if not isinstance(data, dict): return None
         label = str(data.get("label","Criollo/Mix"))[:40]
@@ -64,6 +53,16 @@ def _call_openai(img: Image.Image, model: str = "gpt-4o-mini") -> Optional[Dict[
     except Exception:
         return None
 
+async def _call_provider(img: upload.ImageLike, model: str = "gpt-4o-mini", timeout: float = 20) -> Optional[Dict[str, Any]]:
+    provider = providers.get_provider()
+    if not providers.configured(provider):
+        return None
+    # cliente async compartido (keep-alive) del proveedor: OpenAI o Azure OpenAI
+    with metrics.stage("ai_breed", provider=provider, model=model):
+        content = await providers.chat_completion(_messages(img), model, timeout_s=timeout, provider=provider,
+                                                  temperature=0.0, response_format={"type":"json_object"})
+    return _parse(content)
+
 # --------- Stub provider (dev/offline): uses existing heuristic result if passed in ---------
 def _stub(img: Image.Image, heuristic: Optional[Dict[str,Any]]) -> Dict[str,Any]:
     if heuristic:
@@ -73,10 +72,11 @@ def _stub(img: Image.Image, heuristic: Optional[Dict[str,Any]]) -> Dict[str,Any]
                 "reason": heuristic.get("reason","(stub) heurística"), "source":"ai_stub"}
     return {"label":"Criollo/Mix","class":"CRIOLLO","conf":0.45,"reason":"(stub) sin evidencia fuerte","source":"ai_stub"}
 
-def run_breed_ai(img: Image.Image, cfg: Dict[str, Any], heuristic: Optional[Dict[str,Any]] = None) -> Dict[str,Any]:
-    prov = (cfg.get("breed_ai",{}) or {}).get("provider","stub")
-    if prov == "openai":
-        ans = _call_openai(img, model=(cfg.get("breed_ai",{}).get("model","gpt-4o-mini")))
+async def run_breed_ai(img: upload.ImageLike, cfg: Dict[str, Any], heuristic: Optional[Dict[str,Any]] = None) -> Dict[str,Any]:
+    bcfg = cfg.get("breed_ai",{}) or {}
+    prov = bcfg.get("provider","stub")
+    if prov == "openai":  # "openai" = API de chat-completions; Azure si providers.get_provider() lo indica
+        ans = await _call_provider(img, model=bcfg.get("model","gpt-4o-mini"), timeout=float(bcfg.get("timeout_s", 20)))
         if ans: return ans
         # fallthrough -> stub if allowed
     # default / stub
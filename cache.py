@@ -0,0 +1,92 @@
+"""
+GanadoBravo — cache.py
+
+Cache en memoria acotada: LRU + TTL por entrada + presupuesto total en bytes, con
+contadores de hit/miss/evicción. Reemplaza los dicts de módulo que crecían sin límite.
+
+Variables de entorno (defaults para caches que no reciben parámetros explícitos):
+- CACHE_MAX_MB        presupuesto por cache en MB (default 32)
+- CACHE_TTL_S         vida de cada entrada en segundos (default 21600 = 6 h; 0 = sin TTL)
+- CACHE_MAX_ENTRIES   máximo de entradas por cache (default 5000)
+"""
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import os, json, time, threading
+
+CACHE_MAX_MB = float(os.getenv("CACHE_MAX_MB", "32"))
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", "21600"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+
+_MISSING = object()
+REGISTRY: Dict[str, "LRUCache"] = {}
+
+def approx_size(value: Any) -> int:
+    # tamaño aproximado del payload (los valores cacheados son JSON de los prompts)
+    try:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return len(repr(value))
+
+class LRUCache:
+    def __init__(self, name: str, max_bytes: Optional[int] = None, ttl_s: Optional[float] = None,
+                 max_entries: Optional[int] = None, sizeof: Callable[[Any], int] = approx_size):
+        self.name = name
+        self.max_bytes = int(max_bytes if max_bytes is not None else CACHE_MAX_MB * 1024 * 1024)
+        self.ttl_s = float(ttl_s if ttl_s is not None else CACHE_TTL_S)
+        self.max_entries = int(max_entries if max_entries is not None else CACHE_MAX_ENTRIES)
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        REGISTRY[name] = self
+
+    def _drop(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, _, expires = item
+            if expires and expires < time.monotonic():
+                self._drop(key)
+                self.expirations += 1; self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        size = self.sizeof(value) + len(str(key))
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + self.ttl_s if self.ttl_s > 0 else 0.0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, size, expires)
+            self._bytes += size
+            while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_entries):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear(); self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries, "ttl_s": self.ttl_s,
+                "hits": self.hits, "misses": self.misses, "hit_ratio": round(self.hits/total, 3) if total else None,
+                "evictions": self.evictions, "expirations": self.expirations}
+
+def stats() -> Dict[str, Any]:
+    return {name: c.stats() for name, c in REGISTRY.items()}
@@ -0,0 +1,231 @@
+"""
+GanadoBravo — config.py
+
+config.json cargado una sola vez por proceso, validado y compilado:
+- weights_by_mode → un vector NumPy por modo, alineado con RUBRIC_KEYS y ya normalizado
+  (y la matriz modos × métricas para puntuar todos los modos de una vez);
+- decision_sublevels, visibility_caps y los umbrales de patología → floats listos para usar.
+
+current() devuelve la versión compilada vigente y, como mucho cada CONFIG_RELOAD_S, mira el
+mtime del archivo: si cambió la recompila y la reemplaza de forma atómica (cada worker y cada
+proceso del pool CPU por su cuenta, sin reiniciar). Si la nueva versión no valida se conserva
+la anterior y el error queda en stats(). La ruta es relativa a este módulo, no al directorio
+de trabajo.
+
+Variables de entorno:
+- CONFIG_PATH       ruta de config.json (default: junto a este módulo)
+- CONFIG_RELOAD_S   cada cuánto revisar el mtime (default 2; 0 = no recargar)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib, json, os, threading, time
+import numpy as np
+
+import metrics
+
+CONFIG_PATH = os.getenv("CONFIG_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
+CONFIG_RELOAD_S = float(os.getenv("CONFIG_RELOAD_S", "2"))
+
+# mismo orden que heuristics._rubric_from_heuristic: la rubric se alinea sin buscar claves
+RUBRIC_KEYS = ("cabeza_cuello", "linea_dorsal", "prof_toracica", "costillar", "grupo_posterior", "aplomos",
+               "cola_grupa", "piel_pelo", "bcs")
+_KEY_INDEX = {k: i for i, k in enumerate(RUBRIC_KEYS)}
+
+DEFAULT_WEIGHTS_BY_MODE = {
+    "levante": {"bcs":0.30, "grupo_posterior":0.10, "aplomos":0.05, "linea_dorsal":0.12, "prof_toracica":0.12, "costillar":0.07, "cabeza_cuello":0.04, "cola_grupa":0.04, "piel_pelo":0.06},
+    "engorde": {"bcs":0.30, "grupo_posterior":0.30, "aplomos":0.05, "linea_dorsal":0.08, "prof_toracica":0.08, "costillar":0.04, "cola_grupa":0.05, "piel_pelo":0.10, "cabeza_cuello":0.00},
+    "vaca_flaca": {"bcs":0.40, "aplomos":0.25, "linea_dorsal":0.08, "prof_toracica":0.08, "costillar":0.04, "piel_pelo":0.10, "cabeza_cuello":0.04, "cola_grupa":0.01, "grupo_posterior":0.00},
+}
+DEFAULT_MODE = "levante"
+ALL_MODES = ("all", "todas", "todos")  # category/mode que pide el puntaje de todos los modos
+
+def is_all_modes(mode: Any) -> bool:
+    return str(mode).strip().lower() in ALL_MODES
+
+class ConfigError(ValueError):
+    pass
+
+def _seqsum(a: np.ndarray) -> np.ndarray:
+    # suma de izquierda a derecha sobre el último eje: los mismos redondeos que sum() de Python
+    # (np.sum/np.dot reordenan y un total en x.xx5 puede cambiar de centésima)
+    return np.cumsum(a, axis=-1)[..., -1]
+
+def _float(section: Dict[str, Any], key: str, default: float, where: str) -> float:
+    v = section.get(key, default)
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        raise ConfigError(f"{where}.{key} no es numérico: {v!r}")
+
+class Compiled:
+    """Vista inmutable de config.json; se reemplaza entera al recargar."""
+
+    def __init__(self, raw: Dict[str, Any], version: str):
+        if not isinstance(raw, dict):
+            raise ConfigError("config.json debe ser un objeto")
+        self.raw, self.version = raw, version
+        wbm = raw.get("weights_by_mode", DEFAULT_WEIGHTS_BY_MODE)
+        if not isinstance(wbm, dict) or not wbm:
+            raise ConfigError("weights_by_mode debe ser un objeto con al menos un modo")
+        if DEFAULT_MODE not in wbm:
+            raise ConfigError(f"weights_by_mode necesita el modo '{DEFAULT_MODE}' (es el de respaldo)")
+        self.weights_by_mode: Dict[str, Dict[str, float]] = {}
+        rows = []
+        for mode, w in wbm.items():
+            if not isinstance(w, dict):
+                raise ConfigError(f"weights_by_mode.{mode} debe ser un objeto")
+            unknown = set(w) - set(RUBRIC_KEYS)
+            if unknown:
+                raise ConfigError(f"weights_by_mode.{mode}: métricas desconocidas {sorted(unknown)}")
+            vec = np.array([_float(w, k, 0.0, f"weights_by_mode.{mode}") for k in RUBRIC_KEYS])
+            if (vec < 0).any():
+                raise ConfigError(f"weights_by_mode.{mode}: pesos negativos")
+            self.weights_by_mode[mode] = w
+            rows.append(vec)
+        self.modes: Tuple[str, ...] = tuple(wbm)
+        self.raw_weights = np.vstack(rows)  # (modos, métricas) sin normalizar
+        sums = _seqsum(self.raw_weights)[:, None]
+        self.weights = self.raw_weights / np.where(sums > 0, sums, 1.0)  # cada fila suma 1
+        self._mode_index = {m: i for i, m in enumerate(self.modes)}
+        # un solo modo por request: tuplas de floats, más baratas que NumPy para 9 elementos
+        self._rows = [tuple(float(x) for x in row) for row in self.weights]
+
+        d = raw.get("decision_sublevels", {}) or {}
+        self.cutoffs = (_float(d, "no_comprar_max", 2.9, "decision_sublevels"),
+                        _float(d, "considerar_bajo_max", 3.2, "decision_sublevels"),
+                        _float(d, "considerar_alto_max", 3.7, "decision_sublevels"))
+        if not self.cutoffs[0] <= self.cutoffs[1] <= self.cutoffs[2]:
+            raise ConfigError(f"decision_sublevels deben ser crecientes: {self.cutoffs}")
+        caps = raw.get("visibility_caps", {}) or {}
+        self.cap35 = _float(caps, "lt_0_35", 3.5, "visibility_caps")
+        self.cap55 = _float(caps, "lt_0_55", 3.9, "visibility_caps")
+
+        p = raw.get("pathology", {}) or {}
+        self.alert_threshold = _float(p, "alert_threshold", 0.80, "pathology")
+        self.confirm_threshold = _float(p, "confirm_threshold", 0.90, "pathology")
+        self.checklist: Dict[str, List[str]] = {m: list(v) for m, v in (p.get("checklist", {}) or {}).items()}
+        shp = p.get("shape", {}) or {}
+        self.min_area_ratio = _float(shp, "min_area_ratio", 0.0008, "pathology.shape")
+        self.max_area_ratio = _float(shp, "max_area_ratio", 0.08, "pathology.shape")
+        self.extent_min = _float(shp, "extent_min", 0.45, "pathology.shape")
+        self.oval_aspect_lo = _float(shp, "oval_aspect_lo", 0.6, "pathology.shape")
+        self.oval_aspect_hi = _float(shp, "oval_aspect_hi", 1.8, "pathology.shape")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+    def mode_index(self, mode: str) -> int:
+        # modo desconocido → levante, como antes
+        return self._mode_index.get(mode, self._mode_index[DEFAULT_MODE])
+
+    def mode_weights(self, mode: str) -> Dict[str, float]:
+        return self.weights_by_mode.get(mode, self.weights_by_mode[DEFAULT_MODE])
+
+    def align(self, rubric: List[Dict[str, Any]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        # scores en el orden de RUBRIC_KEYS; present=None si están todas las métricas (caso normal)
+        scores = np.zeros(len(RUBRIC_KEYS))
+        if len(rubric) == len(RUBRIC_KEYS) and all(r["key"] == k for r, k in zip(rubric, RUBRIC_KEYS)):
+            scores[:] = [r["score"] for r in rubric]
+            return scores, None
+        present = np.zeros(len(RUBRIC_KEYS), dtype=bool)
+        for r in rubric:
+            i = _KEY_INDEX.get(r["key"])
+            if i is not None:
+                scores[i] = r["score"]; present[i] = True
+        return scores, present
+
+    def weighted_total(self, rubric: List[Dict[str, Any]], mode: str) -> float:
+        # total 1–5 de un modo; misma aritmética (y redondeos) que el sum() original
+        if len(rubric) == len(RUBRIC_KEYS):
+            t = 0.0
+            for r, k, w in zip(rubric, RUBRIC_KEYS, self._rows[self.mode_index(mode)]):
+                if r["key"] != k:
+                    break
+                t += r["score"] * w
+            else:
+                return t
+        return float(self.weighted_totals(rubric, [mode])[0])
+
+    def weighted_totals(self, rubric: List[Dict[str, Any]], modes: Optional[List[str]] = None) -> np.ndarray:
+        # totales 1–5 de varios modos (default: todos) en una pasada vectorizada; renormaliza sobre
+        # las métricas presentes si la rubric viene incompleta
+        scores, present = self.align(rubric)
+        rows = [self.mode_index(m) for m in modes] if modes is not None else slice(None)
+        if present is None:
+            return _seqsum(self.weights[rows] * scores)
+        w = self.raw_weights[rows] * present
+        s = _seqsum(w)[..., None]
+        return _seqsum(w / np.where(s > 0, s, 1.0) * scores)
+
+    def level(self, total_1to5: float) -> int:
+        # índice 0..3 de NO_COMPRAR … COMPRAR con los cortes de decision_sublevels
+        no_max, c_low, c_hi = self.cutoffs
+        if total_1to5 < no_max:
+            return 0
+        if total_1to5 <= c_low:
+            return 1
+        return 2 if total_1to5 <= c_hi else 3
+
+def _read(path: str) -> Tuple[Dict[str, Any], str]:
+    with open(path, "rb") as f:
+        data = f.read()
+    return json.loads(data.decode("utf-8")), hashlib.sha256(data).hexdigest()[:12]
+
+_lock = threading.Lock()
+_current: Optional[Compiled] = None
+_state: Dict[str, Any] = {"mtime": None, "checked": 0.0, "loaded_at": None, "reloads": 0, "errors": 0,
+                          "last_error": None}
+
+def _load(initial: bool) -> Compiled:
+    try:
+        mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    try:
+        c = Compiled(*_read(CONFIG_PATH)) if mtime is not None else Compiled({}, "defaults")
+    except (OSError, ValueError) as e:  # JSON inválido o ConfigError
+        _state["errors"] += 1
+        _state["last_error"] = f"{type(e).__name__}: {e}"
+        _state["mtime"] = mtime  # no reintentar el mismo archivo roto en cada chequeo
+        if not initial:
+            return _current
+        c = Compiled({}, "defaults")  # arranque con archivo roto: defaults, como antes
+    else:
+        _state["last_error"] = None
+        if not initial:
+            _state["reloads"] += 1
+    _state["mtime"], _state["loaded_at"] = mtime, time.time()
+    return c
+
+def current() -> Compiled:
+    global _current
+    c = _current
+    if c is not None and (CONFIG_RELOAD_S <= 0 or time.monotonic() - _state["checked"] < CONFIG_RELOAD_S):
+        return c
+    with _lock:
+        if _current is None:
+            _current = _load(initial=True)
+        elif time.monotonic() - _state["checked"] >= CONFIG_RELOAD_S > 0:
+            try:
+                mtime = os.stat(CONFIG_PATH).st_mtime_ns
+            except OSError:
+                mtime = _state["mtime"]  # archivo ausente durante un deploy: se mantiene la versión vigente
+            if mtime != _state["mtime"]:
+                _current = _load(initial=False)
+        _state["checked"] = time.monotonic()
+        return _current
+
+def reload() -> Compiled:
+    # recarga forzada (sin esperar el mtime)
+    global _current
+    with _lock:
+        _current = _load(initial=_current is None)
+        _state["checked"] = time.monotonic()
+        return _current
+
+def stats() -> Dict[str, Any]:
+    c = current()
+    return {"path": CONFIG_PATH, "version": c.version, "modes": list(c.modes), "reload_s": CONFIG_RELOAD_S,
+            **{k: v for k, v in _state.items() if k not in ("checked", "mtime")}}
+
+metrics.Gauge("ganadobravo_config_reloads_total", "Recargas de config.json por resultado",
+              lambda: {"ok": _state["reloads"], "error": _state["errors"]}, ("result",), kind="counter")
@@ -0,0 +1,160 @@
+"""
+GanadoBravo — decision.py
+
+Motor de decisión local: la misma aritmética que pide PROMPT_3 (promedio simple, ponderado
+por categoría, offset de bandas, cortes 6.2/7.2/8.2 y ajuste de ±1 nivel por señales
+fuertes) calculada en NumPy, sin ida y vuelta al proveedor y reproducible.
+Las tablas se compilan una vez a una matriz (categorías × métricas): puntuar una o muchas
+rubrics contra todas las categorías es un solo producto matricial.
+
+Variables de entorno:
+- DECISION_ENGINE   "local" (default) | "llm" (PROMPT_3 como antes) |
+                    "hybrid" (números locales; el LLM solo redacta el rationale)
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import os, unicodedata
+import numpy as np
+
+DECISION_ENGINE = os.getenv("DECISION_ENGINE", "local").lower()
+
+METRICS = (
+    "Condición corporal (BCS)", "Conformación general", "Línea dorsal", "Angulación costillar",
+    "Profundidad de pecho", "Aplomos (patas)", "Lomo", "Grupo / muscling posterior",
+    "Balance anterior-posterior", "Ancho torácico", "Inserción de cola",
+)
+
+# Tablas de PROMPT_3 (cada una suma 1.0)
+WEIGHTS = {
+    "vaca flaca": {
+        "Aplomos (patas)": 0.18, "Balance anterior-posterior": 0.14, "Línea dorsal": 0.12,
+        "Conformación general": 0.10, "Lomo": 0.10, "Grupo / muscling posterior": 0.10,
+        "Angulación costillar": 0.08, "Profundidad de pecho": 0.08, "Ancho torácico": 0.06,
+        "Condición corporal (BCS)": 0.02, "Inserción de cola": 0.02,
+    },
+    "levante": {
+        "Aplomos (patas)": 0.16, "Balance anterior-posterior": 0.12, "Línea dorsal": 0.10,
+        "Grupo / muscling posterior": 0.12, "Lomo": 0.10, "Conformación general": 0.10,
+        "Angulación costillar": 0.08, "Profundidad de pecho": 0.06, "Ancho torácico": 0.06,
+        "Condición corporal (BCS)": 0.06, "Inserción de cola": 0.04,
+    },
+    "engorde": {
+        "Grupo / muscling posterior": 0.18, "Profundidad de pecho": 0.14, "Ancho torácico": 0.12,
+        "Conformación general": 0.10, "Lomo": 0.10, "Condición corporal (BCS)": 0.10,
+        "Balance anterior-posterior": 0.08, "Línea dorsal": 0.06, "Aplomos (patas)": 0.06,
+        "Angulación costillar": 0.04, "Inserción de cola": 0.02,
+    },
+}
+OFFSETS = {"vaca flaca": 0.8, "levante": 0.4, "engorde": -0.3}
+BANDS = np.array([6.2, 7.2, 8.2])
+LEVELS = ("NO_COMPRAR", "CONSIDERAR_BAJO", "CONSIDERAR_ALTO", "COMPRAR")
+TEXTS = ("No comprar", "Considerar (bajo)", "Considerar alto", "Comprar")
+
+CATEGORIES = tuple(WEIGHTS)
+
+def _norm(name: str) -> str:
+    s = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(s.lower().replace("_", " ").split())
+
+_INDEX = {_norm(m): i for i, m in enumerate(METRICS)}
+_W = np.array([[WEIGHTS[c].get(m, 0.0) for m in METRICS] for c in CATEGORIES])  # (C, M)
+_OFF = np.array([OFFSETS[c] for c in CATEGORIES])
+
+def _idx(*names: str) -> List[int]:
+    return [_INDEX[_norm(n)] for n in names]
+
+_BCS = _idx("Condición corporal (BCS)")[0]
+_STRUCT_VF = _idx("Aplomos (patas)", "Balance anterior-posterior", "Línea dorsal")
+_STRUCT_LEV = _idx("Aplomos (patas)", "Balance anterior-posterior", "Línea dorsal", "Grupo / muscling posterior")
+_MASS_ENG = _idx("Grupo / muscling posterior", "Profundidad de pecho", "Ancho torácico")
+
+def category_index(category: str) -> int:
+    c = _norm(category)
+    if c not in CATEGORIES:
+        raise ValueError(f"categoría desconocida: {category!r} (usa {', '.join(CATEGORIES)})")
+    return CATEGORIES.index(c)
+
+def rubric_vector(rubric: Sequence[Dict[str, Any]]):
+    # (M,) con NaN en métricas ausentes + promedio simple de TODOS los scores (extras incluidos)
+    v = np.full(len(METRICS), np.nan)
+    allv = []
+    for item in rubric or []:
+        try:
+            s = float(item.get("score"))
+        except (TypeError, ValueError):
+            continue
+        allv.append(s)
+        i = _INDEX.get(_norm(item.get("name", "")))
+        if i is not None:
+            v[i] = s
+    return v, (float(np.mean(allv)) if allv else float("nan"))
+
+def _nanmean(S: np.ndarray, cols: List[int]) -> np.ndarray:
+    # redondeado como band: (7.6 + 6.8 + 7.2) / 3 da 7.1999… y no alcanzaría el umbral 7.2
+    sub = S[:, cols]
+    n = np.sum(~np.isnan(sub), axis=1)
+    return np.round(np.where(n > 0, np.nansum(sub, axis=1) / np.maximum(n, 1), np.nan), 6)
+
+def score_matrix(S: np.ndarray) -> Dict[str, np.ndarray]:
+    # S: (N, M) scores con NaN. Devuelve arrays (N, C) para todas las categorías.
+    S = np.atleast_2d(np.asarray(S, dtype=np.float64))
+    present = ~np.isnan(S)
+    X = np.where(present, S, 0.0)
+    wsum = present.astype(np.float64) @ _W.T                # pesos presentes: métricas faltantes se ignoran
+    weighted = np.where(wsum > 0, (X @ _W.T) / np.where(wsum > 0, wsum, 1.0), np.nan)
+    band = np.round(weighted + _OFF, 6)  # cortes exactos en decimales (6.5 - 0.3 → 6.2, no 6.1999…)
+    level = np.searchsorted(BANDS, np.nan_to_num(band, nan=-np.inf), side="right").astype(np.int64)
+
+    # Ajustes discrecionales (máx ±1 nivel); una regla sin datos no se aplica
+    bcs = S[:, _BCS]
+    vf = (_nanmean(S, _STRUCT_VF) >= 6.8) & (bcs <= 5.5)
+    lev = (_nanmean(S, _STRUCT_LEV) >= 7.0) & (bcs >= 6.0)
+    eng_up = (_nanmean(S, _MASS_ENG) >= 7.2) & (bcs >= 6.5)
+    eng_down = bcs < 5.5
+    adj = np.zeros_like(level)
+    adj[:, CATEGORIES.index("vaca flaca")] = vf
+    adj[:, CATEGORIES.index("engorde")] = eng_up.astype(np.int64) - eng_down.astype(np.int64)
+    adjusted = np.clip(level + adj, 0, len(LEVELS) - 1)
+    li = CATEGORIES.index("levante")
+    adjusted[:, li] = np.where(lev, np.maximum(adjusted[:, li], 2), adjusted[:, li])
+    return {"weighted": weighted, "band": band, "base_level": level, "level": adjusted}
+
+def _rationale(category: str, v: np.ndarray, ci: int, weighted: float, level: int, base_level: int) -> str:
+    # dos razones clave: la métrica que más aporta y la que más resta frente al ponderado
+    w = _W[ci]
+    ok = ~np.isnan(v) & (w > 0)
+    parts = [f"Categoría {category}: ponderado {weighted:.2f} → {TEXTS[level].lower()}"]
+    if ok.any():
+        contrib = np.where(ok, w * (np.nan_to_num(v) - weighted), np.nan)
+        hi, lo = int(np.nanargmax(contrib)), int(np.nanargmin(contrib))
+        parts.append(f"fortaleza: {METRICS[hi]} ({v[hi]:.1f}); punto débil: {METRICS[lo]} ({v[lo]:.1f})")
+    if level != base_level:
+        parts.append("nivel ajustado por señales fuertes de la categoría")
+    return "; ".join(parts) + "."
+
+def decide(rubric: Sequence[Dict[str, Any]], category: str, rationale: Optional[str] = None) -> Dict[str, Any]:
+    ci = category_index(category)
+    v, global_score = rubric_vector(rubric)
+    return _decision(ci, v, global_score, score_matrix(v[None, :]), rationale)
+
+def decide_all(rubric: Sequence[Dict[str, Any]], rationales: Optional[Dict[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    # la misma rubric contra todas las categorías: un solo score_matrix, una decisión por categoría
+    v, global_score = rubric_vector(rubric)
+    r = score_matrix(v[None, :])
+    return {c: _decision(ci, v, global_score, r, (rationales or {}).get(c)) for ci, c in enumerate(CATEGORIES)}
+
+def _decision(ci: int, v: np.ndarray, global_score: float, r: Dict[str, np.ndarray],
+              rationale: Optional[str]) -> Dict[str, Any]:
+    weighted, band = float(r["weighted"][0, ci]), float(r["band"][0, ci])
+    level, base = int(r["level"][0, ci]), int(r["base_level"][0, ci])
+    if np.isnan(weighted):  # ninguna métrica con nombre conocido: bandas sobre el promedio simple
+        weighted = global_score if not np.isnan(global_score) else 0.0
+        band = round(weighted + float(_OFF[ci]), 6)
+        level = base = int(np.searchsorted(BANDS, band, side="right"))
+    return {
+        "global_score": round(global_score, 2) if not np.isnan(global_score) else 0.0,
+        "weighted_score": round(weighted, 2),
+        "band_score": round(band, 2),
+        "decision_level": LEVELS[level],
+        "decision_text": TEXTS[level],
+        "rationale": rationale or _rationale(CATEGORIES[ci], v, ci, weighted, level, base),
+    }
@@ -0,0 +1,107 @@
+"""
+GanadoBravo — execution.py
+
+Capa de ejecución para los endpoints async: las etapas CPU (heurísticas/NumPy) van a un
+pool de procesos y las de I/O bloqueante (HTTP síncrono, SDKs) a un pool de hilos, así el
+event loop de uvicorn queda libre (/healthz y el watchdog siguen respondiendo).
+
+Variables de entorno:
+- CPU_WORKERS      tamaño del pool CPU (default: núcleos - 1, mínimo 1)
+- CPU_POOL_KIND    "process" (default) | "thread"
+- IO_WORKERS       tamaño del pool de I/O (default 16)
+- EXEC_QUEUE_MAX   máximo de tareas CPU en curso + en cola; por encima → Overloaded (default 32)
+"""
+from typing import Any, Callable, Dict, Optional
+import os, asyncio, functools, threading, multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+CPU_WORKERS = max(1, int(os.getenv("CPU_WORKERS", str(max(1, (os.cpu_count() or 2) - 1)))))
+CPU_POOL_KIND = os.getenv("CPU_POOL_KIND", "process").lower()
+IO_WORKERS = max(1, int(os.getenv("IO_WORKERS", "16")))
+EXEC_QUEUE_MAX = max(1, int(os.getenv("EXEC_QUEUE_MAX", "32")))
+
+class Overloaded(RuntimeError):
+    pass
+
+_lock = threading.Lock()
+_cpu_pool: Optional[Executor] = None
+_io_pool: Optional[Executor] = None
+_inflight = {"cpu": 0, "io": 0}
+_counters = {"cpu_done": 0, "io_done": 0, "rejected": 0, "pool_restarts": 0}
+
+def _new_cpu_pool() -> Executor:
+    if CPU_POOL_KIND == "thread":
+        return ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="gb-cpu")
+    # forkserver/spawn: no heredar hilos ni sockets del proceso de uvicorn
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    return ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=ctx)
+
+def cpu_pool() -> Executor:
+    global _cpu_pool
+    with _lock:
+        if _cpu_pool is None:
+            _cpu_pool = _new_cpu_pool()
+        return _cpu_pool
+
+def io_pool() -> Executor:
+    global _io_pool
+    with _lock:
+        if _io_pool is None:
+            _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="gb-io")
+        return _io_pool
+
+def _reset_cpu_pool(broken: Executor):
+    global _cpu_pool
+    with _lock:
+        if _cpu_pool is broken:
+            _cpu_pool = None
+            _counters["pool_restarts"] += 1
+    broken.shutdown(wait=False, cancel_futures=True)
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    # fn y sus argumentos deben ser picklables (funciones de módulo, bytes, dicts)
+    if _inflight["cpu"] >= EXEC_QUEUE_MAX:
+        _counters["rejected"] += 1
+        raise Overloaded(f"cola CPU llena ({EXEC_QUEUE_MAX})")
+    loop = asyncio.get_running_loop()
+    pool = cpu_pool()
+    _inflight["cpu"] += 1
+    try:
+        return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+    except BrokenProcessPool:
+        _reset_cpu_pool(pool)
+        raise
+    finally:
+        _inflight["cpu"] -= 1
+        _counters["cpu_done"] += 1
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    _inflight["io"] += 1
+    try:
+        return await loop.run_in_executor(io_pool(), functools.partial(fn, *args, **kwargs))
+    finally:
+        _inflight["io"] -= 1
+        _counters["io_done"] += 1
+
+def stats() -> Dict[str, Any]:
+    return {"cpu_pool": CPU_POOL_KIND, "cpu_workers": CPU_WORKERS, "io_workers": IO_WORKERS,
+            "queue_max": EXEC_QUEUE_MAX, "inflight_cpu": _inflight["cpu"], "inflight_io": _inflight["io"],
+            **_counters}
+
+metrics.Gauge("ganadobravo_executor_inflight", "Tareas en curso + en cola por pool",
+              lambda: {"cpu": _inflight["cpu"], "io": _inflight["io"]}, ("pool",))
+metrics.Gauge("ganadobravo_executor_rejected_total", "Tareas CPU rechazadas por cola llena (Overloaded)",
+              lambda: _counters["rejected"], kind="counter")
+
+def shutdown():
+    global _cpu_pool, _io_pool
+    with _lock:
+        pools, _cpu_pool, _io_pool = (_cpu_pool, _io_pool), None, None
+    for p in pools:
+        if p is not None:
+            p.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,136 @@
+"""
+GanadoBravo — frame.py
+
+Imagen decodificada UNA vez por request y compartida por heuristics, pathology y breed.
+Las conversiones (RGB/L uint8, pirámide reducida, gradientes) se calculan la primera vez
+que alguien las pide y quedan cacheadas; los arrays se entregan en solo lectura.
+
+La decodificación completa es perezosa (tamaño y formato salen de la cabecera). Los niveles
+reducidos de un JPEG se decodifican directo a la menor escala DCT (1/2, 1/4, 1/8) que cubre
+el tamaño pedido (draft de PIL) y luego se ajustan con el mismo resize de siempre; así
+heurísticas (512 px), huella perceptual y artefacto de subida (1024 px) no pagan la imagen
+completa. PNG/WEBP/etc. y las imágenes sin bytes de origen usan la decodificación normal.
+pathology y breed siguen sobre los píxeles completos: sus umbrales (energía de gradiente,
+blur) son por píxel y están calibrados a resolución original.
+
+Variables de entorno:
+- JPEG_DRAFT   "0" desactiva la decodificación reducida (todos los niveles salen de la completa)
+"""
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+import io, os, threading, time
+import numpy as np
+from PIL import Image
+
+JPEG_DRAFT = os.getenv("JPEG_DRAFT", "1") != "0"
+
+def _ro(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+class Frame:
+    __slots__ = ("_img", "size", "format", "source", "_cache", "_locks", "_guard")
+
+    def __init__(self, image: Image.Image, source: Optional[bytes] = None):
+        object.__setattr__(self, "_img", image)
+        object.__setattr__(self, "source", source)  # bytes originales del archivo, si se conocen
+        object.__setattr__(self, "size", image.size)
+        object.__setattr__(self, "format", image.format)
+        object.__setattr__(self, "_cache", {})
+        object.__setattr__(self, "_locks", {})
+        object.__setattr__(self, "_guard", threading.Lock())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Frame es inmutable")
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Frame":
+        return cls(Image.open(io.BytesIO(data)), data)
+
+    def memo(self, key: Any, fn: Callable[[], Any]) -> Any:
+        # un lock por clave: varios hilos pueden pedir conversiones distintas en paralelo
+        # sin repetir ninguna (y sin bloquearse cuando una conversión depende de otra)
+        c = self._cache
+        if key in c:
+            return c[key]
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in c:
+                c[key] = fn()
+        return c[key]
+
+    def _timed(self, key: Any, fn: Callable[[], Any]) -> Any:
+        # decodificaciones de escalas distintas corren en paralelo (locks por clave distintos):
+        # el dict compartido de tiempos se escribe y se copia bajo _guard
+        t0 = time.perf_counter()
+        out = fn()
+        ms = round((time.perf_counter() - t0) * 1000, 2)
+        with self._guard:
+            self._cache.setdefault("decode_ms", {})[key] = ms
+        return out
+
+    @property
+    def image(self) -> Image.Image:
+        # imagen completa, decodificada la primera vez que alguien necesita todos los píxeles
+        return self.memo("image", lambda: self._timed("full", lambda: (self._img.load(), self._img)[1]))
+
+    def _draft(self, size: Tuple[int, int]) -> Image.Image:
+        # misma elección de escala que JpegImagePlugin.draft: la mayor reducción que no baja de size
+        w, h = self.size
+        r = min(w // max(1, size[0]), h // max(1, size[1]))
+        d = 8 if r >= 8 else 4 if r >= 4 else 2 if r >= 2 else 1
+        if d == 1 or not (JPEG_DRAFT and self.format == "JPEG" and self.source is not None):
+            return self.image
+        def decode():
+            im = Image.open(io.BytesIO(self.source))
+            im.draft(im.mode, size)
+            im.load()
+            return im
+        return self.memo(("draft", d), lambda: self._timed(f"1/{d}", decode))
+
+    def decode_stats(self) -> Dict[str, Any]:
+        # ms por decodificación hecha en este Frame: "full" y/o escalas "1/2", "1/4", "1/8"
+        with self._guard:
+            decode_ms = dict(self._cache.get("decode_ms", {}))
+        return {"format": self.format, "size": self.size, "draft": JPEG_DRAFT, "decode_ms": decode_ms}
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.memo("rgb", lambda: _ro(np.array(self.image.convert("RGB"))))
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.memo("gray", lambda: _ro(np.array(self.image.convert("L"))))
+
+    @property
+    def gray_f32(self) -> np.ndarray:
+        return self.memo("gray_f32", lambda: _ro(self.gray.astype(np.float32) / 255.0))
+
+    def level(self, target_max: int) -> Image.Image:
+        # nivel de la pirámide: mismo redimensionado que heuristics._prep, desde la escala DCT más chica
+        def build():
+            w, h = self.size
+            scale = target_max / max(w, h)
+            if scale >= 1.0:
+                return self.image
+            size = (int(w*scale), int(h*scale))
+            return self._draft(size).resize(size)
+        return self.memo(("level", target_max), build)
+
+    def small_gray(self, target_max: int = 512) -> np.ndarray:
+        return self.memo(("small_gray", target_max),
+                         lambda: _ro(np.asarray(self.level(target_max).convert("L"), dtype=np.float32) / 255.0))
+
+    def gradients(self, target_max: int = 512) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        from heuristics import _gradients
+        return self.memo(("gradients", target_max),
+                         lambda: tuple(_ro(g) for g in _gradients(self.small_gray(target_max))))
+
+FrameLike = Union[Frame, Image.Image, bytes]
+
+def as_frame(x: FrameLike) -> Frame:
+    if isinstance(x, Frame):
+        return x
+    if isinstance(x, (bytes, bytearray, memoryview)):
+        return Frame.from_bytes(bytes(x))
+    return Frame(x)
@@ -2,21 +2,13 @@
 from typing import Any, Dict, List, Tuple
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
-import statistics, json, pathlib
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import config
+from frame import FrameLike, as_frame
 
 Heuristic = Dict[str, Any]
 
-def _load_cfg() -> Dict[str, Any]:
-    p = pathlib.Path("config.json")
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
-
-CFG = _load_cfg()
-
 def _prep(img: Image.Image, target_max: int = 512) -> np.ndarray:
     w, h = img.size
     scale = target_max / max(w, h)
@@ -27,20 +19,21 @@ def _prep(img: Image.Image, target_max: int = 512) -> np.ndarray:
     return arr
 
 def _gradients(arr: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # arr: (H,W) o pila (N,H,W)
     gx = np.zeros_like(arr)
     gy = np.zeros_like(arr)
-    gx[:,1:-1] = arr[:,2:] - arr[:,:-2]
-    gy[1:-1,:] = arr[2:,:] - arr[:-2,:]
+    gx[...,:,1:-1] = arr[...,:,2:] - arr[...,:,:-2]
+    gy[...,1:-1,:] = arr[...,2:,:] - arr[...,:-2,:]
     mag = np.sqrt(gx*gx + gy*gy)
     return gx, gy, mag
 
 def _band(arr: np.ndarray, y0: float, y1: float, x0: float=0.0, x1: float=1.0) -> np.ndarray:
-    h, w = arr.shape
+    h, w = arr.shape[-2:]
     r0, r1 = int(h*y0), int(h*y1)
     c0, c1 = int(w*x0), int(w*x1)
     r0 = max(0, min(h-1, r0)); r1 = max(r0+1, min(h, r1))
     c0 = max(0, min(w-1, c0)); c1 = max(c0+1, min(w, c1))
-    return arr[r0:r1, c0:c1]
+    return arr[..., r0:r1, c0:c1]
 
 def _straightness_score(arr: np.ndarray) -> float:
     mag = np.abs(arr)
@@ -68,9 +61,10 @@ def _posterior_score(mag_lr: np.ndarray) -> float:
 def _whiteness(arr: np.ndarray) -> float:
     return float((arr > 0.75).mean())
 
-def run_single_pass(image: Image.Image, target_max: int = 512):
-    arr = _prep(image, target_max=target_max)
-    gx, gy, mag = _gradients(arr)
+def run_single_pass(image: FrameLike, target_max: int = 512):
+    fr = as_frame(image)
+    arr = fr.small_gray(target_max)
+    gx, gy, mag = fr.gradients(target_max)
 
     brightness = float(arr.mean())
     contrast   = float(arr.std())
@@ -82,7 +76,10 @@ def run_single_pass(image: Image.Image, target_max: int = 512):
     ribs = _ribs_visible(center_band, thresh=0.08 if contrast>0.18 else 0.06)
     backline_score = _straightness_score(back_band)
     posterior      = _posterior_score(posterior_zone)
+    return _heuristic_from_stats(brightness, contrast, _whiteness(arr), ribs, backline_score, posterior)
 
+def _heuristic_from_stats(brightness: float, contrast: float, white: float,
+                          ribs: bool, backline_score: float, posterior: float) -> Heuristic:
     thorax   = "high" if brightness>0.58 else ("med" if brightness>0.45 else "low")
     abdomen  = "high" if (brightness>0.55 and contrast<0.20) else ("med" if brightness>0.42 else "low")
     backline = "good" if backline_score>=4.0 else ("ok" if backline_score>=3.4 else "poor")
@@ -91,7 +88,6 @@ def run_single_pass(image: Image.Image, target_max: int = 512):
     elif ribs: bcs = 2.8
     else: bcs = 3.2 if brightness>0.5 else 3.0
 
-    white = _whiteness(arr)
     if white > 0.40:
         breed = {"class":"ENRAZADO","label":"Brahman/Mix","conf":0.80}
     elif white < 0.20:
@@ -109,6 +105,31 @@ def run_single_pass(image: Image.Image, target_max: int = 512):
         "stats": {"brightness":brightness, "contrast":contrast, "white": white}
     }
 
+def run_single_pass_batch(stack: np.ndarray) -> List[Heuristic]:
+    # misma lógica que run_single_pass sobre una pila (N,H,W) de grises en [0,1], en una sola pasada
+    n = stack.shape[0]
+    flat = stack.reshape(n, -1)
+    gx, gy, mag = _gradients(stack)
+    brightness = flat.mean(axis=1)
+    contrast   = flat.std(axis=1)
+    white      = (flat > 0.75).mean(axis=1)
+
+    center = np.abs(_band(gx, 0.35, 0.65, 0.15, 0.85)).reshape(n, -1).mean(axis=1)
+    ribs = center > np.where(contrast > 0.18, 0.08, 0.06)
+
+    back = np.abs(_band(gy, 0.18, 0.32, 0.10, 0.90))
+    if back.shape[-1] >= 2:
+        var = np.argmax(back, axis=1).var(axis=1)
+        backline = np.select([var < 2.0, var < 5.0, var < 9.0], [4.2, 3.6, 3.2], 2.8)
+    else:
+        backline = np.full(n, 3.0)
+
+    edge = _band(mag, 0.45, 0.95, 0.65, 0.98).reshape(n, -1).mean(axis=1)
+    posterior = np.select([edge < 0.03, edge < 0.06, edge < 0.09], [4.0, 3.6, 3.3], 3.0)
+
+    return [_heuristic_from_stats(float(brightness[i]), float(contrast[i]), float(white[i]), bool(ribs[i]),
+                                  float(backline[i]), float(posterior[i])) for i in range(n)]
+
 def _obs_cabeza(breed_class: str, bcs: float) -> str:
     if breed_class == "ENRAZADO":
         return "Cabeza cebuina; cuello fino" if bcs <= 3.0 else "Cabeza cebuina; cuello proporcionado"
@@ -171,50 +192,49 @@ def _rubric_from_heuristic(h):
     ]
     return rubric
 
-DEFAULT_WEIGHTS_BY_MODE = {
-    "levante": {"bcs":0.30, "grupo_posterior":0.10, "aplomos":0.05, "linea_dorsal":0.12, "prof_toracica":0.12, "costillar":0.07, "cabeza_cuello":0.04, "cola_grupa":0.04, "piel_pelo":0.06},
-    "engorde": {"bcs":0.30, "grupo_posterior":0.30, "aplomos":0.05, "linea_dorsal":0.08, "prof_toracica":0.08, "costillar":0.04, "cola_grupa":0.05, "piel_pelo":0.10, "cabeza_cuello":0.00},
-    "vaca_flaca": {"bcs":0.40, "aplomos":0.25, "linea_dorsal":0.08, "prof_toracica":0.08, "costillar":0.04, "piel_pelo":0.10, "cabeza_cuello":0.04, "cola_grupa":0.01, "grupo_posterior":0.00},
-}
-WEIGHTS_BY_MODE = CFG.get("weights_by_mode", DEFAULT_WEIGHTS_BY_MODE)
-
-def _decision_with_sublevels(t: float):
-    dcfg = CFG.get("decision_sublevels", {})
-    no_max = float(dcfg.get("no_comprar_max", 2.9))
-    c_low = float(dcfg.get("considerar_bajo_max", 3.2))
-    c_hi  = float(dcfg.get("considerar_alto_max", 3.7))
-    if t < no_max:
-        return "NO_COMPRAR", "NO COMPRAR", ""
-    elif t <= c_low:
-        return "CONSIDERAR_BAJO", "CONSIDERAR (bajo)", "Solo si precio bajo."
-    elif t <= c_hi:
-        return "CONSIDERAR_ALTO", "CONSIDERAR (alto)", "Vale si condiciones son buenas."
-    else:
-        return "COMPRAR", "COMPRAR", ""
+_SUBLEVELS = (("NO_COMPRAR", "NO COMPRAR", ""),
+              ("CONSIDERAR_BAJO", "CONSIDERAR (bajo)", "Solo si precio bajo."),
+              ("CONSIDERAR_ALTO", "CONSIDERAR (alto)", "Vale si condiciones son buenas."),
+              ("COMPRAR", "COMPRAR", ""))
 
-def _weighted_total_1to5(rubric, breed, vis_ratio, mode: str):
-    w = WEIGHTS_BY_MODE.get(mode, WEIGHTS_BY_MODE["levante"])
-    total_w = sum(w.get(r["key"], 0.0) for r in rubric)
-    if total_w <= 0: total_w = 1.0
-    total_1to5 = sum(r["score"] * (w.get(r["key"], 0.0)/total_w) for r in rubric)
+def _decision_with_sublevels(t: float, cfg: config.Compiled = None):
+    return _SUBLEVELS[(cfg or config.current()).level(t)]
 
+def _breed_adj(breed) -> float:
     breed_class = (breed or {}).get("class","MIXTO")
     breed_conf = float((breed or {}).get("conf") or 0.0)
-    breed_adj = 0.0
     if breed_class == "ENRAZADO" and breed_conf >= 0.75:
-        breed_adj = 0.10
-    elif breed_class == "CRIOLLO":
-        breed_adj = -0.10
-    total_1to5 = max(1.0, min(5.0, total_1to5 + breed_adj))
+        return 0.10
+    if breed_class == "CRIOLLO":
+        return -0.10
+    return 0.0
+
+def _weighted_total_1to5(rubric, breed, vis_ratio, mode: str):
+    # pesos ya normalizados y alineados con la rubric en config.py: un producto punto
+    cfg = config.current()
+    total_1to5 = cfg.weighted_total(rubric, mode)
 
-    caps = CFG.get("visibility_caps", {})
-    cap35 = float(caps.get("lt_0_35", 3.5))
-    cap55 = float(caps.get("lt_0_55", 3.9))
-    if vis_ratio < 0.35: total_1to5 = min(total_1to5, cap35)
-    elif vis_ratio < 0.55: total_1to5 = min(total_1to5, cap55)
+    breed_adj = _breed_adj(breed)
+    total_1to5 = max(1.0, min(5.0, total_1to5 + breed_adj))
 
-    level, label, hint = _decision_with_sublevels(total_1to5)
-    return {"total_1to5": round(total_1to5,2), "decision_level": level, "decision_label": label, "decision_hint": hint, "breed_adj": breed_adj, "weights_used": w}
+    if vis_ratio < 0.35: total_1to5 = min(total_1to5, cfg.cap35)
+    elif vis_ratio < 0.55: total_1to5 = min(total_1to5, cfg.cap55)
+
+    level, label, hint = _decision_with_sublevels(total_1to5, cfg)
+    return {"total_1to5": round(total_1to5,2), "decision_level": level, "decision_label": label, "decision_hint": hint, "breed_adj": breed_adj, "weights_used": cfg.mode_weights(mode)}
+
+def _weighted_totals_by_mode(rubric, breed, vis_ratio) -> Dict[str, Dict[str, Any]]:
+    # todos los modos de config.json en una pasada vectorizada; por fila, la misma aritmética
+    # que _weighted_total_1to5 (ajuste de raza, límites 1–5, topes por visibilidad, subniveles)
+    cfg = config.current()
+    totals = np.clip(cfg.weighted_totals(rubric) + _breed_adj(breed), 1.0, 5.0)
+    if vis_ratio < 0.35: totals = np.minimum(totals, cfg.cap35)
+    elif vis_ratio < 0.55: totals = np.minimum(totals, cfg.cap55)
+    out = {}
+    for mode, t in zip(cfg.modes, totals.tolist()):
+        level, label, hint = _SUBLEVELS[cfg.level(t)]
+        out[mode] = {"total_1to5": round(t,2), "decision_level": level, "decision_label": label, "decision_hint": hint}
+    return out
 
 def _evidence_score_1to5(vis_ratio: float, h) -> float:
     contrast = float(((h.get("stats") or {}).get("contrast")) or 0.15)
@@ -233,38 +253,68 @@ def _conflict_flags(h) -> bool:
     bcs = float(h.get("bcs_1_5",{}).get("value") or 3.0)
     return bool(ribs and bcs >= 3.5)
 
-def _crop_variants(img: Image.Image):
-    w, h = img.size; crops = []
+def _crop_boxes(w: int, h: int):
+    boxes = []
     for frac in (0.92, 0.88):
         cw, ch = int(w*frac), int(h*frac)
         for dx in (-int(w*0.04), 0, int(w*0.04)):
             x0 = max(0, min(w-cw, (w-cw)//2 + dx))
             y0 = max(0, (h-ch)//2)
-            crops.append(img.crop((x0,y0,x0+cw,y0+ch)))
-    return crops[:3]
+            boxes.append((x0,y0,x0+cw,y0+ch))
+    return boxes[:3]
+
+def _crop_variants(img: Image.Image):
+    return [img.crop(b) for b in _crop_boxes(*img.size)]
+
+_JITTERS = (lambda im: ImageEnhance.Brightness(im).enhance(1.05),
+            lambda im: ImageEnhance.Contrast(im).enhance(0.95),
+            lambda im: im.filter(ImageFilter.GaussianBlur(radius=0.5)))
 
 def _jitter_variants(img: Image.Image):
-    out = []
-    out.append(ImageEnhance.Brightness(img).enhance(1.05))
-    out.append(ImageEnhance.Contrast(img).enhance(0.95))
-    out.append(img.filter(ImageFilter.GaussianBlur(radius=0.5)))
-    return out
+    return [j(img) for j in _JITTERS]
 
 def _majority_label(labels):
     return max(set(labels), key=labels.count) if labels else "MIXTO"
 
-def second_pass_ensemble(img: Image.Image, vis_ratio: float):
-    variants = [img] + _crop_variants(img) + _jitter_variants(img)
+# construir y reducir cada variante es PIL a resolución completa (suelta el GIL) → hilos
+_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="ensemble")
+
+def _batched_variants(fr) -> List[Heuristic]:
+    # Mismas 7 variantes y mismos píxeles que _serial_variants: recortes y jitters salen de la imagen
+    # completa y cada una se reduce con Frame.level antes de medir (reducir primero no es exacto).
+    # Cambia el cómo: las variantes se construyen en hilos y las estadísticas se calculan por pila
+    # de variantes del mismo tamaño en una sola pasada vectorizada (run_single_pass_batch).
+    img = fr.image
+    makers = [lambda b=b: img.crop(b) for b in _crop_boxes(*img.size)] + [lambda j=j: j(img) for j in _JITTERS]
+    # orden serial: [original, 3 recortes, brillo, contraste, blur]; índices pares a 512, impares a 384
+    target = lambda i: 512 if i % 2 == 0 else 384
+    grays = [fr.small_gray(512)] + list(_POOL.map(lambda i: as_frame(makers[i-1]()).small_gray(target(i)),
+                                                  range(1, len(makers)+1)))
+    by_shape: Dict[Tuple[int, int], List[int]] = {}
+    for i, g in enumerate(grays):
+        by_shape.setdefault(g.shape, []).append(i)
+    out: List[Heuristic] = [None] * len(grays)
+    for idx in by_shape.values():
+        for i, hres in zip(idx, run_single_pass_batch(np.stack([grays[i] for i in idx]))):
+            out[i] = hres
+    return out
+
+def _serial_variants(fr) -> List[Heuristic]:
+    img = fr.image
+    variants = [fr] + _crop_variants(img) + _jitter_variants(img)
+    return [run_single_pass(im, target_max=(512 if (i % 2 == 0) else 384)) for i, im in enumerate(variants)]
+
+def second_pass_ensemble(img: FrameLike, vis_ratio: float, batched: bool = True):
+    # batched=False: una run_single_pass por variante, como la 2ª pasada original; mismo resultado
+    fr = as_frame(img)
+    hrefs = _batched_variants(fr) if batched else _serial_variants(fr)
     per_rubrics = []
     breeds, breed_confs = [], []
-    hrefs = []
-    for i, im in enumerate(variants):
-        target_max = 512 if (i % 2 == 0) else 384
-        h = run_single_pass(im, target_max=target_max); hrefs.append(h)
+    for h in hrefs:
         per_rubrics.append(_rubric_from_heuristic(h))
         br = h.get("breed") or {}
         breeds.append(br.get("class","MIXTO")); breed_confs.append(float(br.get("conf") or 0.0))
-    keys = [r["key"] for r in _rubric_from_heuristic(run_single_pass(img))]
+    keys = [r["key"] for r in per_rubrics[0]]
     name_map = {r["key"]: r["name"] for r in per_rubrics[0]}
     obs_map  = {r["key"]: r["obs"] for r in per_rubrics[0]}
     scores_by_key = {k: [] for k in keys}
@@ -272,12 +322,11 @@ def second_pass_ensemble(img: Image.Image, vis_ratio: float):
         for r in rub:
             scores_by_key[r["key"]].append(float(r["score"]))
     def mad(vals):
-        import statistics
         m = statistics.median(vals); return float(statistics.median([abs(x-m) for x in vals]))
     rubric_agg = []
     SI_items = {}
     for k in keys:
-        vs = scores_by_key[k]; med = float(__import__("statistics").median(vs)); mad_v = mad(vs)
+        vs = scores_by_key[k]; med = float(statistics.median(vs)); mad_v = mad(vs)
         SI_r = 1.0 - min(1.0, mad_v / 1.5); SI_items[name_map[k]] = round(SI_r,2)
         rubric_agg.append({"key":k, "name":name_map[k], "score":round(med,2), "obs":obs_map[k]})
     majority = _majority_label(breeds)
@@ -286,7 +335,7 @@ def second_pass_ensemble(img: Image.Image, vis_ratio: float):
     very_imp_names = {"Grupo posterior (anca, muslos, nalgas)","Línea dorsal (lomo)","Profundidad torácica","Condición corporal (BCS)"}
     si_vals = [v for n,v in SI_items.items() if n in very_imp_names]
     SI_global = round(sum(si_vals)/len(si_vals), 2) if si_vals else 0.7
-    return {"rubric": rubric_agg, "breed": breed_agg, "SI_items": SI_items, "SI_global": SI_global, "n": len(variants)}
+    return {"rubric": rubric_agg, "breed": breed_agg, "SI_items": SI_items, "SI_global": SI_global, "n": len(hrefs)}
 
 def run_auction_heuristics(image_bgr: Image.Image):
     return run_single_pass(image_bgr)
@@ -304,7 +353,11 @@ def apply_heuristic_scoring(d_in, first_h):
     low_conf_cnt = sum([ (float(first_h.get("bcs_1_5",{}).get("conf") or 0.0) < 0.6),
                          (float(first_h.get("capacity",{}).get("conf") or 0.0) < 0.6),
                          (float(first_h.get("posterior",{}).get("conf") or 0.0) < 0.6) ])
-    borderline = (3.2 <= totals1["total_1to5"] <= 3.4) or (3.9 <= totals1["total_1to5"] <= 4.1)
+    near_cut = lambda t: (3.2 <= t <= 3.4) or (3.9 <= t <= 4.1)
+    borderline = near_cut(totals1["total_1to5"])
+    all_modes = bool(d.get("all_modes"))
+    if all_modes:  # una sola rubric para todos los modos: 2ª pasada si alguno queda en el límite
+        borderline = any(near_cut(t["total_1to5"]) for t in _weighted_totals_by_mode(rubric1, breed1, vis_ratio).values())
     trigger = (evidence < 3.5) or (vis_ratio < 0.55) or borderline or (sigma > 0.6) or conflicts or (low_conf_cnt>=2)
 
     used_second = False; SI_global=None; SI_items=None; weights_used = totals1["weights_used"]
@@ -330,6 +383,8 @@ def apply_heuristic_scoring(d_in, first_h):
                         "conflict_ribs_bcs": conflicts, "low_conf_count": int(low_conf_cnt),
                         "second_pass_used": used_second, "SI_global": SI_global, "SI_items": SI_items}
     d["reasons"].append(f"Pesos por modo: {mode}.")
+    if all_modes:
+        d["by_mode"] = _weighted_totals_by_mode(rubric, breed, vis_ratio)
     if used_second:
         d["reasons"].append(f"2ª pasada de confirmación ejecutada; SI={SI_global}.")
     if SI_global is not None:
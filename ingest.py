@@ -0,0 +1,140 @@
+"""
+GanadoBravo — ingest.py
+
+Ingesta de subidas en streaming, antes de decodificar nada:
+- BodyLimit (middleware ASGI): rechaza con 413 por Content-Length sin leer el cuerpo, y corta
+  la lectura apenas los bytes recibidos superan el límite de la ruta (clientes sin
+  Content-Length o que mienten). El multipart nunca llega a guardarse completo.
+- El parser multipart guarda cada archivo en memoria hasta INGEST_SPILL_KB y por encima en un
+  archivo temporal, así un request ocupa en RAM como máximo ese umbral mientras llega.
+- read_upload: una pasada por bloques sobre el archivo recibido que detecta el formato por
+  los bytes mágicos (415 si no es una imagen), aplica MAX_IMAGE_MB y calcula el SHA-256 de
+  forma incremental; solo si todo pasa se materializan los bytes para el pipeline.
+
+Variables de entorno:
+- MAX_IMAGE_MB       tamaño máximo por imagen (default 8)
+- INGEST_CHUNK_KB    tamaño de bloque de lectura (default 256)
+- INGEST_SPILL_KB    por encima de esto el archivo subido va a disco (default 1024)
+"""
+from typing import Dict, NamedTuple, Optional
+import hashlib, os, time
+
+from starlette.exceptions import HTTPException
+from starlette.datastructures import UploadFile
+from starlette import formparsers
+
+import metrics
+
+MAX_IMAGE_MB = int(os.getenv("MAX_IMAGE_MB", "8"))
+MAX_IMAGE_BYTES = MAX_IMAGE_MB * 1024 * 1024
+INGEST_CHUNK_KB = max(4, int(os.getenv("INGEST_CHUNK_KB", "256")))
+INGEST_SPILL_KB = max(64, int(os.getenv("INGEST_SPILL_KB", "1024")))
+MULTIPART_OVERHEAD = 64 * 1024  # boundaries, headers y campos de formulario
+
+if hasattr(formparsers.MultiPartParser, "spool_max_size"):
+    formparsers.MultiPartParser.spool_max_size = INGEST_SPILL_KB * 1024
+
+_counters = {"accepted": 0, "too_large": 0, "not_image": 0, "empty": 0, "body_too_large": 0}
+metrics.Gauge("ganadobravo_ingest_total", "Subidas procesadas por resultado", lambda: dict(_counters), ("result",),
+              kind="counter")
+
+class Upload(NamedTuple):
+    data: bytes
+    sha256: str
+    size: int
+    kind: str
+    spilled: bool
+    ingest_ms: float
+
+# firmas de los formatos que PIL decodifica sin plugins
+def sniff(head: bytes) -> Optional[str]:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if head.startswith(b"BM"):
+        return "bmp"
+    return None
+
+def _reject(key: str, status: int, detail: str):
+    _counters[key] += 1
+    raise HTTPException(status_code=status, detail=detail)
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> Upload:
+    t0 = time.perf_counter()
+    if file.size is not None and file.size > max_bytes:  # tamaño ya conocido por el parser
+        _reject("too_large", 413, f"Imagen supera {max_bytes // (1024*1024)} MB")
+    spilled = bool(getattr(file.file, "_rolled", False))
+    h = hashlib.sha256()
+    size, kind = 0, None
+    await file.seek(0)
+    while True:
+        chunk = await file.read(INGEST_CHUNK_KB * 1024)
+        if not chunk:
+            break
+        if kind is None:
+            kind = sniff(chunk[:16])
+            if kind is None:
+                _reject("not_image", 415, "El archivo no es una imagen (JPEG, PNG, WEBP, GIF, TIFF o BMP)")
+        size += len(chunk)
+        if size > max_bytes:
+            _reject("too_large", 413, f"Imagen supera {max_bytes // (1024*1024)} MB")
+        h.update(chunk)
+    if size == 0:
+        _reject("empty", 400, "Archivo vacío")
+    # segunda lectura secuencial del archivo ya validado: una sola copia en memoria
+    await file.seek(0)
+    data = await file.read()
+    await file.close()
+    _counters["accepted"] += 1
+    secs = time.perf_counter() - t0
+    metrics.STAGE_SECONDS.observe(secs, stage="ingest", status="ok", cache="spilled" if spilled else "memory")
+    return Upload(data, h.hexdigest(), size, kind, spilled, round(secs * 1000, 1))
+
+class BodyLimit:
+    """Límite de cuerpo por ruta (POST). limits: {ruta: bytes máximos del request completo}."""
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = {p.rstrip("/") or "/": n for p, n in limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            return await self.app(scope, receive, send)
+        limit = self.limits.get(scope["path"].rstrip("/") or "/")
+        if limit is None:
+            return await self.app(scope, receive, send)
+        declared = None
+        for k, v in scope.get("headers", []):
+            if k == b"content-length":
+                try:
+                    declared = int(v)
+                except ValueError:
+                    pass
+        received = 0
+
+        async def limited_receive():
+            # la excepción sube desde el parser de formularios hasta el handler de HTTPException
+            # de la app, que responde 413 en su propio formato sin haber leído el resto
+            nonlocal received
+            if declared is not None and declared > limit:
+                _counters["body_too_large"] += 1
+                raise HTTPException(status_code=413, detail=f"Cuerpo supera {limit // (1024*1024)} MB")
+            msg = await receive()
+            if msg["type"] == "http.request":
+                received += len(msg.get("body", b""))
+                if received > limit:
+                    _counters["body_too_large"] += 1
+                    raise HTTPException(status_code=413, detail=f"Cuerpo supera {limit // (1024*1024)} MB")
+            return msg
+
+        await self.app(scope, limited_receive, send)
+
+def body_limit(max_files: int = 1, max_bytes: int = MAX_IMAGE_BYTES) -> int:
+    return max_files * (max_bytes + MULTIPART_OVERHEAD)
@@ -0,0 +1,199 @@
+"""
+GanadoBravo — loadgen.py
+
+Generador de carga de lazo abierto contra /api/evaluate (main.py) o /evaluate (main_app.py):
+dispara requests a la tasa objetivo sin esperar respuestas (llegadas Poisson o constantes),
+como llegan los lotes en un remate, y reporta latencia p50/p95/p99, throughput, códigos HTTP,
+errores de la app y timeouts del watchdog. Pensado para usarse con mock_provider.py.
+
+Las imágenes son bovinos sintéticos (synthetic.synthetic_cow) o archivos de --images. Con --pool
+menor que el total de requests se repiten fotos y se ejercitan los cachés; para medir el
+camino completo usa --pool >= rps*duration.
+
+Uso:
+    python mock_provider.py --port 9100 &
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=mock uvicorn main:app --port 8000 &
+    python loadgen.py --url http://127.0.0.1:8000 --rps 5 --duration 60 --pool 300
+    python loadgen.py --endpoint /evaluate --category engorde --rps 2 --json out.json
+"""
+from typing import Any, Dict, List, Optional
+import argparse, asyncio, glob, io, json, os, random, sys, time
+
+import httpx
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def synthetic_pool(n: int, mp: str, seed: int = 1000) -> List[bytes]:
+    sys.path.insert(0, HERE)
+    from bench import SIZES
+    from synthetic import synthetic_cow
+    w, h = SIZES[mp]
+    out = []
+    for i in range(n):
+        buf = io.BytesIO()
+        synthetic_cow(w, h, seed=seed + i).save(buf, format="JPEG", quality=88)
+        out.append(buf.getvalue())
+    return out
+
+def file_pool(pattern: str) -> List[bytes]:
+    paths = sorted(p for p in glob.glob(os.path.join(pattern, "*") if os.path.isdir(pattern) else pattern)
+                   if p.lower().endswith((".jpg", ".jpeg", ".png", ".webp")))
+    if not paths:
+        raise SystemExit(f"sin imágenes en {pattern}")
+    out = []
+    for p in paths:
+        with open(p, "rb") as f:
+            out.append(f.read())
+    return out
+
+def classify(status: int, body: Any) -> str:
+    # main.py responde errores con 200 + {"error": ...}; main_app.py con {"status":"error","code":...}
+    if isinstance(body, dict):
+        msg = str(body.get("message") or body.get("error") or "")
+        if status == 504 or body.get("code") == 504 or "watchdog" in msg.lower():
+            return "watchdog_timeout"
+        if status == 200 and (body.get("error") or body.get("status") == "error"):
+            return "app_error"
+    return "ok" if status == 200 else f"http_{status}"
+
+class Recorder:
+    def __init__(self):
+        self.latency: List[float] = []
+        self.ok_latency: List[float] = []
+        self.status: Dict[str, int] = {}
+        self.outcome: Dict[str, int] = {}
+        self.tier: Dict[str, int] = {}
+        self.sent = self.dropped = 0
+        self.max_inflight = 0
+
+    def add(self, ms: float, status: str, outcome: str, body: Any = None):
+        self.latency.append(ms)
+        if outcome == "ok":
+            self.ok_latency.append(ms)
+            if isinstance(body, dict) and body.get("tier"):
+                self.tier[body["tier"]] = self.tier.get(body["tier"], 0) + 1
+        self.status[status] = self.status.get(status, 0) + 1
+        self.outcome[outcome] = self.outcome.get(outcome, 0) + 1
+
+def _pct(v: List[float]) -> Dict[str, Optional[float]]:
+    if not v:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    a = np.asarray(v)
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(a.max()), 1)}
+
+async def run(url: str, endpoint: str, images: List[bytes], rps: float, duration: float, arrival: str,
+              field: str, value: str, force_ai: bool, timeout_s: float, max_inflight: int, seed: int) -> Dict[str, Any]:
+    rec = Recorder()
+    rnd = random.Random(seed)
+    inflight = 0
+    tasks = set()
+    limits = httpx.Limits(max_connections=max_inflight, max_keepalive_connections=max_inflight)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=httpx.Timeout(timeout_s, connect=10)) as client:
+        async def one(i: int):
+            nonlocal inflight
+            data = {field: value}
+            if force_ai:
+                data["force_ai"] = "true"
+            files = {"file": (f"lg_{i}.jpg", images[i % len(images)], "image/jpeg")}
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(endpoint, data=data, files=files)
+                ms = (time.perf_counter() - t0) * 1000
+                try:
+                    body = r.json()
+                except ValueError:
+                    body = None
+                rec.add(ms, str(r.status_code), classify(r.status_code, body), body)
+            except httpx.TimeoutException:
+                rec.add((time.perf_counter() - t0) * 1000, "client_timeout", "client_timeout")
+            except httpx.HTTPError as e:
+                rec.add((time.perf_counter() - t0) * 1000, type(e).__name__, "connection_error")
+            finally:
+                inflight -= 1
+
+        start = time.perf_counter()
+        next_t, i = 0.0, 0
+        while next_t < duration:
+            delay = start + next_t - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # lazo abierto: si el cliente llega a su tope se descarta el envío en vez de frenar la tasa
+            if inflight >= max_inflight:
+                rec.dropped += 1
+            else:
+                inflight += 1
+                rec.max_inflight = max(rec.max_inflight, inflight)
+                rec.sent += 1
+                t = asyncio.ensure_future(one(i))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+            i += 1
+            next_t += rnd.expovariate(rps) if arrival == "poisson" else 1.0 / rps
+        send_s = time.perf_counter() - start
+        if tasks:
+            await asyncio.gather(*list(tasks), return_exceptions=True)
+        wall_s = time.perf_counter() - start
+
+    ok = rec.outcome.get("ok", 0)
+    return {
+        "config": {"url": url + endpoint, "target_rps": rps, "duration_s": duration, "arrival": arrival,
+                   "images": len(images), "timeout_s": timeout_s, "max_inflight": max_inflight},
+        "sent": rec.sent, "dropped": rec.dropped, "completed": len(rec.latency), "ok": ok,
+        "offered_rps": round(rec.sent / send_s, 2) if send_s else None,
+        "throughput_rps": round(ok / wall_s, 2) if wall_s else None,
+        "wall_s": round(wall_s, 1), "max_inflight": rec.max_inflight,
+        "latency": _pct(rec.latency), "ok_latency": _pct(rec.ok_latency),
+        "status_codes": rec.status, "outcomes": rec.outcome,
+        "watchdog_timeouts": rec.outcome.get("watchdog_timeout", 0),
+        "error_rate": round(1 - ok / len(rec.latency), 3) if rec.latency else None,
+        "tiers": rec.tier,
+    }
+
+def report(res: Dict[str, Any]):
+    c, lat, okl = res["config"], res["latency"], res["ok_latency"]
+    print(f"{c['url']}  objetivo {c['target_rps']} rps × {c['duration_s']} s ({c['arrival']}), {c['images']} imágenes")
+    print(f"enviados {res['sent']}  descartados {res['dropped']}  completados {res['completed']}  ok {res['ok']}"
+          f"  (máx. en vuelo {res['max_inflight']})")
+    print(f"tasa ofrecida {res['offered_rps']} rps  throughput ok {res['throughput_rps']} rps  en {res['wall_s']} s")
+    fmt = lambda d: "  ".join(f"{k[:-3]} {v:.0f} ms" if v is not None else f"{k[:-3]} -" for k, v in d.items())
+    print("latencia (todas)", fmt(lat))
+    print("latencia (ok)   ", fmt(okl))
+    print("códigos", json.dumps(res["status_codes"]), " resultados", json.dumps(res["outcomes"]))
+    print(f"watchdog timeouts {res['watchdog_timeouts']}  tasa de error {res['error_rate']}")
+    if res["tiers"]:
+        print("tiers", json.dumps(res["tiers"]))
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Generador de carga GanadoBravo")
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--endpoint", default="/api/evaluate", help="/api/evaluate (main.py) o /evaluate (main_app.py)")
+    ap.add_argument("--rps", type=float, default=2.0)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--arrival", choices=("poisson", "constant"), default="poisson")
+    ap.add_argument("--category", default="levante", help="categoría (/api/evaluate) o mode (/evaluate)")
+    ap.add_argument("--force-ai", action="store_true", help="saltear el tier heurístico (/api/evaluate)")
+    ap.add_argument("--images", help="carpeta o glob de fotos; sin esto se usan bovinos sintéticos")
+    ap.add_argument("--pool", type=int, default=20, help="cantidad de imágenes sintéticas distintas")
+    ap.add_argument("--mp", default="0.3", help="tamaño de las sintéticas (0.3, 2, 5, 12 MP)")
+    ap.add_argument("--timeout", type=float, default=60.0, help="timeout del cliente por request (s)")
+    ap.add_argument("--max-inflight", type=int, default=256)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="escribir el reporte en este archivo")
+    args = ap.parse_args(argv)
+
+    images = file_pool(args.images) if args.images else synthetic_pool(args.pool, args.mp)
+    field = "category" if args.endpoint.startswith("/api/") else "mode"
+    res = asyncio.run(run(args.url.rstrip("/"), args.endpoint, images, args.rps, args.duration, args.arrival,
+                          field, args.category, args.force_ai, args.timeout, args.max_inflight, args.seed))
+    report(res)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
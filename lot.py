@@ -0,0 +1,143 @@
+"""
+GanadoBravo — lot.py
+
+Modo corral/lote: una foto con varios animales se separa en recortes, uno por animal, y cada
+recorte pasa por el pipeline normal (heurísticas → IA si escala) como si fuera una foto suelta.
+
+Segmentación barata, sobre una versión reducida (LOT_WORK_PX de lado mayor):
+- fondo por filas: en un corral la tierra/pasto/cielo cambia sobre todo en vertical, así que el
+  color de fondo de cada fila sale de la mediana de sus márgenes izquierdo y derecho;
+- primer plano = distancia de color al fondo de su fila por encima del ruido medido en los
+  márgenes, o energía de gradiente (heuristics._gradients) claramente mayor que la del fondo;
+- mayoría en ventana (imagen integral) para cerrar huecos y limpiar ruido, y componentes
+  conexas con el etiquetado por runs de pathology;
+- componentes demasiado anchas para un solo animal se parten por los valles del perfil de
+  columnas (animales que se tocan de costado).
+Si no aparece ningún animal se evalúa la foto completa (segmented=False).
+
+Variables de entorno:
+- LOT_MAX_ANIMALS   máximo de recortes por foto (default 10; se quedan los más grandes)
+- LOT_MIN_AREA      área mínima de un animal como fracción de la foto (default 0.005)
+- LOT_WORK_PX       lado mayor de la imagen de trabajo para segmentar (default 320)
+- LOT_PAD           margen agregado a cada recorte, fracción de su lado (default 0.06)
+- LOT_CONCURRENCY   recortes evaluados a la vez por request (default 4)
+"""
+from typing import Any, Dict, List, Tuple
+import io, os, time
+import numpy as np
+
+from frame import FrameLike, as_frame
+from heuristics import _gradients
+from pathology import _cc_stats, _integral
+
+LOT_MAX_ANIMALS = max(1, int(os.getenv("LOT_MAX_ANIMALS", "10")))
+LOT_MIN_AREA = float(os.getenv("LOT_MIN_AREA", "0.005"))
+LOT_WORK_PX = max(128, int(os.getenv("LOT_WORK_PX", "320")))
+LOT_PAD = float(os.getenv("LOT_PAD", "0.06"))
+LOT_CONCURRENCY = max(1, int(os.getenv("LOT_CONCURRENCY", "4")))
+
+SPLIT_ASPECT = 2.6   # ancho/alto por encima de esto: probablemente más de un animal
+VALLEY = 0.45        # columna con menos de esta fracción del máximo del perfil = separación
+BAND = 0.15          # alto/ancho por debajo de esto no es un animal: cerco, horizonte, bebedero
+
+Box = Tuple[int, int, int, int]  # x0, y0, x1, y1 (fin exclusivo)
+
+def _box_mean(a: np.ndarray, r: int) -> np.ndarray:
+    # promedio en ventana (2r+1)² con imagen integral; bordes con la ventana recortada
+    h, w = a.shape
+    ii = np.zeros((h+1, w+1), dtype=np.float64)
+    np.cumsum(np.cumsum(a, axis=0), axis=1, out=ii[1:, 1:])
+    y0 = np.clip(np.arange(h) - r, 0, h); y1 = np.clip(np.arange(h) + r + 1, 0, h)
+    x0 = np.clip(np.arange(w) - r, 0, w); x1 = np.clip(np.arange(w) + r + 1, 0, w)
+    s = ii[y1][:, x1] - ii[y0][:, x1] - ii[y1][:, x0] + ii[y0][:, x0]
+    return s / np.outer(y1 - y0, x1 - x0)
+
+def foreground(rgb: np.ndarray) -> np.ndarray:
+    # rgb: (H, W, 3) uint8 reducida → máscara bool de animales
+    h, w, _ = rgb.shape
+    x = rgb.astype(np.float32) / 255.0
+    m = max(2, int(w * 0.04))
+    margins = np.concatenate([x[:, :m], x[:, -m:]], axis=1)           # (H, 2m, 3)
+    bg = np.median(margins, axis=1)                                     # fondo por fila
+    k = max(1, h // 60)                                                 # suaviza filas con un animal en el margen
+    bg = np.stack([np.convolve(np.pad(bg[:, c], k, mode="edge"), np.ones(2*k+1) / (2*k+1), "valid")
+                   for c in range(3)], axis=1)
+    dist = np.sqrt(((x - bg[:, None, :]) ** 2).sum(axis=2))
+    dm = np.concatenate([dist[:, :m], dist[:, -m:]], axis=1)
+    noise = float(np.median(dm)) * 1.4826 + 0.02
+    color_fg = dist > max(0.12, 4.0 * noise)
+
+    gray = x @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    _, _, mag = _gradients(gray)
+    tex = _box_mean(mag, 2)
+    tm = np.concatenate([tex[:, :m], tex[:, -m:]], axis=1)
+    tex_fg = tex > max(0.05, 3.0 * float(np.percentile(tm, 90)))
+
+    fg = (color_fg | tex_fg).astype(np.float64)
+    return _box_mean(fg, max(1, min(h, w) // 80)) > 0.5
+
+def _split(mask: np.ndarray, box: Box) -> List[Box]:
+    # partir por los valles del perfil de columnas mientras el recorte siga siendo demasiado ancho
+    x0, y0, x1, y1 = box
+    bw, bh = x1 - x0, y1 - y0
+    if bw < SPLIT_ASPECT * bh or bw < 8:
+        return [box]
+    prof = mask[y0:y1, x0:x1].sum(axis=0).astype(np.float64)
+    k = max(1, bw // 40)
+    prof = np.convolve(prof, np.ones(2*k+1) / (2*k+1), "same")
+    lo, hi = int(bw * 0.2), int(bw * 0.8)  # no cortar cabezas ni colas
+    if hi <= lo:
+        return [box]
+    cut = lo + int(np.argmin(prof[lo:hi]))
+    if prof[cut] > VALLEY * prof.max():
+        return [box]
+    return _split(mask, _tight(mask, (x0, y0, x0 + cut, y1))) + _split(mask, _tight(mask, (x0 + cut, y0, x1, y1)))
+
+def _tight(mask: np.ndarray, box: Box) -> Box:
+    x0, y0, x1, y1 = box
+    sub = mask[y0:y1, x0:x1]
+    rows, cols = np.flatnonzero(sub.any(axis=1)), np.flatnonzero(sub.any(axis=0))
+    if rows.size == 0:
+        return box
+    return (x0 + int(cols[0]), y0 + int(rows[0]), x0 + int(cols[-1]) + 1, y0 + int(rows[-1]) + 1)
+
+def segment(img: FrameLike) -> Dict[str, Any]:
+    fr = as_frame(img)
+    W, H = fr.size
+    small = np.asarray(fr.level(LOT_WORK_PX).convert("RGB"))
+    h, w, _ = small.shape
+    mask = foreground(small)
+    st = _cc_stats(mask)
+    ii = _integral(mask)
+    keep = np.flatnonzero(st["area"] >= LOT_MIN_AREA * h * w)
+    boxes: List[Box] = []
+    for i in keep:
+        box = (int(st["minc"][i]), int(st["minr"][i]), int(st["maxc"][i]) + 1, int(st["maxr"][i]) + 1)
+        boxes.extend(_split(mask, box))
+    # tras partir: descartar pedazos chicos (área real de máscara, no del bbox) y franjas chatas
+    area = lambda b: int(ii[b[3], b[2]] - ii[b[1], b[2]] - ii[b[3], b[0]] + ii[b[1], b[0]])
+    boxes = [b for b in boxes if area(b) >= LOT_MIN_AREA * h * w and b[3] - b[1] >= BAND * (b[2] - b[0])]
+    boxes = sorted(boxes, key=area, reverse=True)[:LOT_MAX_ANIMALS]
+    sx, sy = W / w, H / h
+    out = []
+    for b in sorted(boxes, key=lambda b: (b[1] // max(1, h // 4), b[0])):  # por filas del corral, izq → der
+        px, py = (b[2] - b[0]) * LOT_PAD, (b[3] - b[1]) * LOT_PAD
+        full = (max(0, int((b[0] - px) * sx)), max(0, int((b[1] - py) * sy)),
+                min(W, int(np.ceil((b[2] + px) * sx))), min(H, int(np.ceil((b[3] + py) * sy))))
+        out.append({"box": full, "area_ratio": round(area(b) / (h * w), 4)})
+    return {"size": (W, H), "work_size": (w, h), "animals": out, "segmented": bool(out)}
+
+def split(data: bytes, quality: int = 90) -> Dict[str, Any]:
+    # corre en el pool CPU: segmenta y devuelve cada recorte ya codificado (JPEG) para el pipeline
+    t = time.perf_counter()
+    fr = as_frame(data)
+    seg = segment(fr)
+    if not seg["animals"]:
+        seg["animals"] = [{"box": (0, 0) + tuple(seg["size"]), "area_ratio": 1.0}]
+    full = fr.image.convert("RGB")
+    for a in seg["animals"]:
+        buf = io.BytesIO()
+        full.crop(a["box"]).save(buf, format="JPEG", quality=quality)
+        a["data"] = buf.getvalue()
+    seg["split_ms"] = round((time.perf_counter() - t) * 1000, 1)
+    return seg
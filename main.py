@@ -1,18 +1,50 @@
 # main.py
 from fastapi import FastAPI, File, Form, UploadFile
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from openai import AsyncOpenAI
-import json, base64, os as osmod, asyncio, hashlib
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+import json, os as osmod, asyncio, hashlib, re, time, unicodedata
 
 import prompts
+import providers
+from cache import LRUCache
+import cache as cachemod
+import config
+import execution
+import ingest
+import lot
+import metrics
+import phash
+import upload
+import warmup
+import decision as decision_engine
+import pipeline_real
+import tiers
+from store import STORE
+from singleflight import SingleFlight
+from stagegraph import StageGraph
 
 ALLOWED_DECISIONS = {"NO_COMPRAR","CONSIDERAR_BAJO","CONSIDERAR_ALTO","COMPRAR"}
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
+# cuerpos más grandes que una imagen se cortan mientras llegan (413), sin bufferizarlos
+app.add_middleware(ingest.BodyLimit, limits={"/api/evaluate": ingest.body_limit(),
+                                             "/api/evaluate/stream": ingest.body_limit(),
+                                             "/api/evaluate/lot": ingest.body_limit()})
 
-client = AsyncOpenAI()
+# cliente compartido sobre el pool HTTP de providers (keep-alive, límites, HTTP/2 si hay h2)
+client = providers.async_openai_sdk()
+PROVIDER = "openai"  # el SDK va siempre a OPENAI_BASE_URL; Azure solo lo usan pipeline_real y breed_ai
+PROMPT_TIMEOUT_S = float(osmod.getenv("PROMPT_TIMEOUT_S", "30"))
+
+@app.on_event("startup")
+async def _start_metrics():
+    metrics.start_loop_monitor()
+    warmup.start()
+
+@app.on_event("shutdown")
+async def _close_http():
+    await providers.aclose()
 
 def clamp(v, lo=1.0, hi=10.0):
     return max(lo, min(hi, v))
@@ -32,10 +64,122 @@ def normalize_rubric(rubric):
 def img_hash(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
-RUBRIC_CACHE = {}
-HEALTH_BREED_CACHE = {}
+MODEL = osmod.getenv("PROMPT_MODEL", "gpt-4o")
+
+# caches acotadas (LRU + TTL + bytes); la clave incluye modelo y versión de los prompts usados
+RUBRIC_CACHE = LRUCache("rubric")
+HEALTH_BREED_CACHE = LRUCache("health_breed")
+RUBRIC_VERSION = prompts.prompt_version(prompts.PROMPT_1, prompts.PROMPT_2)
+HEALTH_BREED_VERSION = prompts.prompt_version(prompts.PROMPT_4, prompts.PROMPT_5)
+DECISION_VERSION = prompts.prompt_version(prompts.PROMPT_3)
+# veredictos heurísticos que no escalaron (nivel 0): mismos caché y almacén, clave por categoría
+HEURISTIC_CACHE = LRUCache("heuristic")
+
+def heuristic_version() -> str:
+    # pesos, cortes y umbrales de escalado viven en config.json: al recargarlo no se sirven veredictos viejos
+    return f"{prompts.PROMPT_VERSION}+cfg{config.current().version}"
+
+def cache_key(img_key: str, version: str) -> str:
+    return f"{img_key}:{MODEL}:{version}"
+
+# memoria (LRU del proceso) → almacén persistente compartido (SQLite) → proveedor de IA
+async def layered_get(lru, kind: str, img_key: str, version: str, mode: str = "-"):
+    ck = cache_key(img_key, version) if mode == "-" else cache_key(f"{img_key}:{mode}", version)
+    v = lru.get(ck) if lru is not None else None
+    if v is None and STORE is not None:
+        v = await execution.run_io(STORE.get, kind, img_key, mode, MODEL, version)
+        if v is not None and lru is not None:
+            lru.set(ck, v)
+    return v
+
+async def layered_put(lru, kind: str, img_key: str, version: str, value, mode: str = "-"):
+    ck = cache_key(img_key, version) if mode == "-" else cache_key(f"{img_key}:{mode}", version)
+    if lru is not None:
+        lru.set(ck, value)
+    if STORE is not None:
+        await execution.run_io(STORE.put, kind, img_key, mode, MODEL, version, value)
+
+# casi-duplicados: huella perceptual → hash exacto de la primera foto evaluada
+PHASH_INDEX = phash.PHashIndex()
+
+async def image_fingerprint(b: bytes):
+    try:
+        return await execution.run_cpu(phash.fingerprint, b)
+    except Exception:
+        return None  # imagen no decodificable o pool lleno: sin búsqueda aproximada
+
+# peticiones concurrentes por la misma foto comparten una sola cadena de prompts
+FLIGHTS = SingleFlight("evaluate")
+
+async def compute_morphology(img: upload.UploadArtifact, key: str):
+    return await FLIGHTS.do(("prompt_1", key), lambda: run_prompt(prompts.PROMPT_1, None, None, img))
+
+async def compute_rubric(res1, key: str):
+    async def run():
+        res2 = await run_prompt(prompts.PROMPT_2, None, res1)
+        rubric = normalize_rubric(res2["rubric"])
+        await layered_put(RUBRIC_CACHE, "rubric", key, RUBRIC_VERSION, rubric)
+        return rubric
+    return await FLIGHTS.do(("rubric", key), run)
+
+async def compute_health(img: upload.UploadArtifact, key: str):
+    return await FLIGHTS.do(("prompt_4", key), lambda: run_prompt(prompts.PROMPT_4, None, None, img))
+
+async def compute_breed(img: upload.UploadArtifact, key: str):
+    return await FLIGHTS.do(("prompt_5", key), lambda: run_prompt(prompts.PROMPT_5, None, None, img))
+
+async def store_health_breed(key: str, res4, res5):
+    pair = [res4, res5]
+    await layered_put(HEALTH_BREED_CACHE, "health_breed", key, HEALTH_BREED_VERSION, pair)
+    return pair
 
-async def run_prompt(prompt, category=None, input_data=None, image_bytes=None):
+async def llm_decision(category: str, rubric):
+    # depende de categoría y de la rubric usada (que puede venir de un casi-duplicado)
+    decision_key = img_hash(json.dumps(rubric, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    async def run():
+        res3 = await layered_get(None, "decision", decision_key, DECISION_VERSION, mode=category)
+        if res3 is None:
+            res3 = await run_prompt(prompts.PROMPT_3, category, {"rubric": rubric})
+            await layered_put(None, "decision", decision_key, DECISION_VERSION, res3, mode=category)
+        return res3
+    return await FLIGHTS.do(("decision", decision_key, category), run)
+
+async def compute_decision(category: str, rubric):
+    # PROMPT_3 es aritmética pura: local por defecto; "hybrid" usa el LLM solo para el rationale
+    engine = decision_engine.DECISION_ENGINE
+    if engine != "llm":
+        try:
+            decision_engine.category_index(category)
+        except ValueError:
+            engine = "llm"  # categoría fuera de las tablas: la resuelve el modelo como antes
+    if engine == "llm":
+        return await llm_decision(category, rubric)
+    rationale = None
+    if engine == "hybrid":
+        rationale = (await llm_decision(category, rubric)).get("rationale")
+    return decision_engine.decide(rubric, category, rationale)
+
+async def compute_decisions_all(rubric):
+    # category=all: una decisión por categoría sobre la misma rubric (local: un solo score_matrix)
+    engine = decision_engine.DECISION_ENGINE
+    cats = decision_engine.CATEGORIES
+    if engine == "llm":
+        return dict(zip(cats, await asyncio.gather(*[llm_decision(c, rubric) for c in cats])))
+    rationales = None
+    if engine == "hybrid":
+        res = await asyncio.gather(*[llm_decision(c, rubric) for c in cats])
+        rationales = {c: r.get("rationale") for c, r in zip(cats, res)}
+    return decision_engine.decide_all(rubric, rationales)
+
+PROMPT_STAGES = {prompts.PROMPT_1: "ai_prompt_1", prompts.PROMPT_2: "ai_prompt_2", prompts.PROMPT_3: "ai_prompt_3",
+                 prompts.PROMPT_4: "ai_prompt_4", prompts.PROMPT_5: "ai_prompt_5"}
+
+async def run_prompt(prompt, category=None, input_data=None, image=None):
+    with metrics.stage(PROMPT_STAGES.get(prompt, "ai_prompt"), mode=category or "-",
+                       provider=PROVIDER, model=MODEL, cache="miss"):
+        return await _run_prompt(prompt, category, input_data, image)
+
+async def _run_prompt(prompt, category=None, input_data=None, image=None):
     # inyecta categoría solo si se provee (solo PROMPT_3)
     if category:
         prompt = prompt.replace("{category}", category)
@@ -43,32 +187,40 @@ async def run_prompt(prompt, category=None, input_data=None, image_bytes=None):
     # fuerza español + JSON
     prompt = prompt + "\n\nResponde SIEMPRE en español. Devuelve SOLO JSON válido."
 
-    if image_bytes:
-        b64 = base64.b64encode(image_bytes).decode("utf-8")
+    if image is not None:
         resp = await client.chat.completions.create(
-            model="gpt-4o",
+            model=MODEL,
             temperature=0,
             messages=[
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": [
                     {"type": "text", "text": "Analiza esta imagen y devuelve solo JSON."},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}}
+                    {"type": "image_url", "image_url": {"url": upload.build(image).data_url}}
                 ]}
             ],
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            timeout=PROMPT_TIMEOUT_S
         )
     else:
         resp = await client.chat.completions.create(
-            model="gpt-4o",
+            model=MODEL,
             temperature=0,
             messages=[
                 {"role": "system", "content": prompt},
                 {"role": "user", "content": json.dumps(input_data)}
             ],
-            response_format={"type": "json_object"}
+            response_format={"type": "json_object"},
+            timeout=PROMPT_TIMEOUT_S
         )
     return json.loads(resp.choices[0].message.content)
 
+@app.get("/api/cache/stats")
+async def cache_stats():
+    # el COUNT(*) de SQLite va a un hilo, como el resto de las lecturas del store
+    store = await execution.run_io(STORE.stats) if STORE is not None else None
+    return {"model": MODEL, "prompt_version": prompts.PROMPT_VERSION, "caches": cachemod.stats(),
+            "phash": PHASH_INDEX.stats(), "store": store, "singleflight": FLIGHTS.stats()}
+
 @app.get("/")
 async def root():
     return FileResponse(osmod.path.join("static", "index.html"))
@@ -82,53 +234,322 @@ def fallback_decision_from_score(gs: float):
         return "CONSIDERAR_ALTO", "Considerar alto"
     return "COMPRAR", "Comprar"
 
+def checked_decision(decision):
+    if "decision_level" in decision and decision.get("decision_level") in ALLOWED_DECISIONS:
+        return decision
+    gs = float(decision.get("global_score", 0))
+    level, text = fallback_decision_from_score(gs)
+    return {
+        "global_score": gs,
+        "weighted_score": decision.get("weighted_score", gs),
+        "band_score": decision.get("band_score", gs),
+        "decision_level": level,
+        "decision_text": text,
+        "rationale": decision.get("rationale", "Ajustado automáticamente para cumplir el formato.")
+    }
+
+def cache_label(cache_info) -> str:
+    return "hit" if cache_info.get("exact") else "approx" if cache_info.get("approximate") else "miss"
+
+async def evaluate_image(img: bytes, category: str, key: str = None):
+    t_lookup = time.perf_counter()
+    key = key or img_hash(img)
+
+    rubric = await layered_get(RUBRIC_CACHE, "rubric", key, RUBRIC_VERSION)
+    cached = await layered_get(HEALTH_BREED_CACHE, "health_breed", key, HEALTH_BREED_VERSION)
+    cache_info = {"exact": rubric is not None and cached is not None, "approximate": False}
+
+    # Sin hit exacto: buscar la misma foto re-codificada (huella perceptual)
+    fp = None
+    if not cache_info["exact"]:
+        fp = await image_fingerprint(img)
+        near = PHASH_INDEX.nearest(fp) if fp is not None else None
+        if near is not None:
+            near_key, dist = near
+            near_rubric = await layered_get(RUBRIC_CACHE, "rubric", near_key, RUBRIC_VERSION)
+            near_hb = await layered_get(HEALTH_BREED_CACHE, "health_breed", near_key, HEALTH_BREED_VERSION)
+            if near_rubric is not None and near_hb is not None:
+                rubric, cached = near_rubric, near_hb
+                cache_info = {"exact": False, "approximate": True, "distance": dist, "match": near_key[:12]}
+
+    labels = {"mode": category, "provider": PROVIDER, "model": MODEL, "cache": cache_label(cache_info)}
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - t_lookup, stage="cache_lookup", status="ok", **labels)
+
+    # Cada prompt arranca apenas están sus entradas: PROMPT_4/5 no esperan a la cadena 1→2
+    # (compartidos con peticiones concurrentes por la misma foto vía FLIGHTS)
+    graph = StageGraph()
+    if rubric is None or cached is None:
+        graph.stage("upload", lambda: execution.run_cpu(upload.build, img))  # una sola codificación
+    if rubric is None:
+        graph.stage("morphology", lambda art: compute_morphology(art, key), "upload")
+        graph.stage("rubric", lambda res1: compute_rubric(res1, key), "morphology")
+    else:
+        graph.value("rubric", rubric)
+    if cached is None:
+        graph.stage("health", lambda art: compute_health(art, key), "upload")
+        graph.stage("breed", lambda art: compute_breed(art, key), "upload")
+        graph.stage("health_breed", lambda res4, res5: store_health_breed(key, res4, res5), "health", "breed")
+    else:
+        graph.value("health_breed", cached)
+    all_modes = config.is_all_modes(category)
+    if all_modes:
+        graph.stage("decision", compute_decisions_all, "rubric")
+    else:
+        graph.stage("decision", lambda r: compute_decision(category, r), "rubric")
+    results, timings = await graph.run()
+    # la huella entra al índice recién con rubric y salud/raza ya escritas en cache: una evaluación
+    # fallida no deja una clave que los casi-duplicados no pueden resolver
+    if fp is not None and not cache_info["approximate"]:
+        PHASH_INDEX.add(fp, key)
+    metrics.record_stages(timings, **labels)
+    t_format = time.perf_counter()
+
+    rubric, res3, art = results["rubric"], results["decision"], results.get("upload")
+    res4, res5 = results["health_breed"]
+
+    by_mode = {c: checked_decision(d) for c, d in res3.items()} if all_modes else None
+    decision = by_mode[config.DEFAULT_MODE] if all_modes else checked_decision(res3)
+
+    out = {
+        "engine": "ai",
+        "decision_engine": decision_engine.DECISION_ENGINE,
+        "category": category,
+        "rubric": rubric,
+        "decision": decision,
+        "health": res4["health"],
+        "breed": res5["breed"],
+        "cache": cache_info,
+        "upload": art.stats() if art is not None else None,
+        "stages": timings
+    }
+    if by_mode is not None:
+        out["by_mode"] = by_mode
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - t_format, stage="format", status="ok", **labels)
+    return out
+
+async def heuristic_first(img: bytes, category: str):
+    # nivel 0: veredicto NumPy + motivos para escalar ([] = no hace falta la IA)
+    labels = {"mode": category, "provider": "local", "model": "-"}
+    try:
+        with metrics.stage("heuristic_eval", **labels):  # incluye cola y envío al pool de procesos
+            h = await execution.run_cpu(pipeline_real.heuristic_eval, img, category)
+    except Exception:
+        return None, ["heuristic_error"]
+    metrics.record_stages(h.get("timings_ms") or {}, **labels)
+    return h, tiers.escalation_reasons(h)
+
+async def cached_verdict(key: str, category: str, force_ai: bool = False):
+    # hit exacto por SHA-256 antes de cualquier trabajo pesado: ("ai", None) si la rubric y salud/raza de la IA
+    # ya están (la decisión es local); ("heuristic", veredicto) si hay uno guardado; (None, None) si no hay nada
+    t = time.perf_counter()
+    tier, hit = None, None
+    if await layered_get(RUBRIC_CACHE, "rubric", key, RUBRIC_VERSION) is not None and \
+            await layered_get(HEALTH_BREED_CACHE, "health_breed", key, HEALTH_BREED_VERSION) is not None:
+        tier = "ai"
+    elif not force_ai:
+        hit = await layered_get(HEURISTIC_CACHE, "heuristic", key, heuristic_version(), mode=category)
+        if hit is not None:
+            tier = "heuristic"
+            hit = {**hit, "cache": {"exact": True, "approximate": False},
+                   "timings_ms": {"cache_lookup": round((time.perf_counter() - t) * 1000, 2)}}
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - t, stage="verdict_lookup", status="ok", mode=category,
+                                  provider="local", model="-", cache="hit" if tier else "miss")
+    return tier, hit
+
+async def remember_heuristic(key: str, category: str, h):
+    # solo veredictos finales (sin motivos de escalado); los que escalaron esperan a la IA
+    await layered_put(HEURISTIC_CACHE, "heuristic", key, heuristic_version(), h, mode=category)
+
+async def evaluate_tiered(img: bytes, category: str, force_ai: bool = False, key: str = None):
+    t0 = time.perf_counter()
+    ms = lambda: (time.perf_counter() - t0) * 1000
+    key = key or img_hash(img)
+    tier, hit = await cached_verdict(key, category, force_ai)
+    if tier == "heuristic":
+        tiers.STATS.record("heuristic", ms())
+        return {**hit, "tier": "heuristic", "escalation": [], "elapsed_ms": int(ms())}
+    h = None
+    if tier == "ai":
+        reasons = ["cached"]
+    elif force_ai:
+        reasons = ["forced"]  # la heurística solo se calcula si la IA falla
+    else:
+        h, reasons = await heuristic_first(img, category)
+        if not reasons:
+            await remember_heuristic(key, category, h)
+            tiers.STATS.record("heuristic", ms())
+            return {**h, "tier": "heuristic", "escalation": [], "elapsed_ms": int(ms())}
+    try:
+        res = await evaluate_image(img, category, key)
+    except Exception as e:
+        if h is None:
+            h, _ = await heuristic_first(img, category)
+        if h is None:
+            raise
+        # proveedor caído o lento: el animal no se queda sin veredicto, sale el heurístico
+        tiers.STATS.record("heuristic", ms(), reasons, escalation_error=True)
+        return {**h, "tier": "heuristic", "escalation": reasons, "escalation_error": str(e), "elapsed_ms": int(ms())}
+    tiers.STATS.record("ai", ms(), reasons)
+    return {**res, "tier": "ai", "escalation": reasons, "elapsed_ms": int(ms())}
+
 @app.post("/api/evaluate")
-async def evaluate(category: str = Form(...), file: UploadFile = File(...)):
+async def evaluate(category: str = Form(...), file: UploadFile = File(...), force_ai: bool = Form(False)):
+    t0 = time.perf_counter()
+    up = await ingest.read_upload(file)  # límite, formato y SHA-256 por bloques antes de decodificar
     try:
-        img = await file.read()
-        key = img_hash(img)
+        res = await evaluate_tiered(up.data, category, force_ai, up.sha256)
+    except Exception as e:
+        metrics.observe_request(time.perf_counter() - t0, "/api/evaluate", category, "error")
+        return {"error": str(e)}
+    metrics.observe_request(time.perf_counter() - t0, "/api/evaluate", category,
+                            "escalation_error" if "escalation_error" in res else "ok", res.get("tier"),
+                            cache_label(res["cache"]) if res.get("cache") else None)
+    return res
 
-        # Morfología cacheada por imagen (no depende de categoría)
-        if key in RUBRIC_CACHE:
-            rubric = RUBRIC_CACHE[key]
-        else:
-            res1 = await run_prompt(prompts.PROMPT_1, None, None, img)
-            res2 = await run_prompt(prompts.PROMPT_2, None, res1)
-            rubric = normalize_rubric(res2["rubric"])
-            RUBRIC_CACHE[key] = rubric
-
-        # Salud/Raza cacheadas por imagen
-        if key in HEALTH_BREED_CACHE:
-            res4, res5 = HEALTH_BREED_CACHE[key]
-        else:
-            health_task = asyncio.create_task(run_prompt(prompts.PROMPT_4, None, None, img))
-            breed_task = asyncio.create_task(run_prompt(prompts.PROMPT_5, None, None, img))
-            res4, res5 = await asyncio.gather(health_task, breed_task)
-            HEALTH_BREED_CACHE[key] = (res4, res5)
-
-        # Decisión depende de categoría
-        res3 = await run_prompt(prompts.PROMPT_3, category, {"rubric": rubric})
-
-        decision = res3
-        if "decision_level" not in decision or decision.get("decision_level") not in ALLOWED_DECISIONS:
-            gs = float(decision.get("global_score", 0))
-            level, text = fallback_decision_from_score(gs)
-            decision = {
-                "global_score": gs,
-                "weighted_score": decision.get("weighted_score", gs),
-                "band_score": decision.get("band_score", gs),
-                "decision_level": level,
-                "decision_text": text,
-                "rationale": decision.get("rationale", "Ajustado automáticamente para cumplir el formato.")
-            }
-
-        return {
-            "engine": "ai",
-            "category": category,
-            "rubric": rubric,
-            "decision": decision,
-            "health": res4["health"],
-            "breed": res5["breed"]
-        }
+async def evaluate_animal(i: int, animal, category: str, force_ai: bool, sem: asyncio.Semaphore):
+    # cada recorte es una foto más: mismo pipeline por niveles, misma caché (clave = hash del recorte)
+    base = {"index": i, "box": list(animal["box"]), "area_ratio": animal["area_ratio"]}
+    async with sem:
+        try:
+            return {**base, **await evaluate_tiered(animal["data"], category, force_ai, img_hash(animal["data"]))}
+        except Exception as e:
+            return {**base, "error": str(e)}
+
+@app.post("/api/evaluate/lot")
+async def evaluate_lot(category: str = Form(...), file: UploadFile = File(...), force_ai: bool = Form(False)):
+    # foto de corral: separar animales en el pool CPU y evaluar los recortes en paralelo
+    t0 = time.perf_counter()
+    up = await ingest.read_upload(file)
+    try:
+        seg = await execution.run_cpu(lot.split, up.data)
     except Exception as e:
+        metrics.observe_request(time.perf_counter() - t0, "/api/evaluate/lot", category, "error")
         return {"error": str(e)}
+    sem = asyncio.Semaphore(lot.LOT_CONCURRENCY)
+    animals = await asyncio.gather(*[evaluate_animal(i, a, category, force_ai, sem)
+                                     for i, a in enumerate(seg["animals"])])
+    summary: dict = {}
+    for a in animals:
+        level = a["decision"]["decision_level"] if "decision" in a else "ERROR"
+        summary[level] = summary.get(level, 0) + 1
+    ok = [a for a in animals if "error" not in a]
+    status = "error" if not ok else "escalation_error" if any("escalation_error" in a for a in ok) else "ok"
+    metrics.observe_request(time.perf_counter() - t0, "/api/evaluate/lot", category, status,
+                            "ai" if any(a.get("tier") == "ai" for a in ok) else "heuristic")
+    return {
+        "category": category,
+        "segmented": seg["segmented"],
+        "count": len(animals),
+        "summary": summary,
+        "image_size": list(seg["size"]),
+        "animals": animals,
+        "split_ms": seg["split_ms"],
+        "elapsed_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+@app.get("/healthz")
+async def healthz():
+    # 503 hasta que terminó el calentamiento (kernels, pool CPU, conexiones al proveedor)
+    code, body = warmup.healthz()
+    return JSONResponse(body, status_code=code)
+
+@app.get("/api/warmup")
+async def warmup_report():
+    return warmup.status()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/api/tiers/stats")
+async def tiers_stats():
+    return {"settings": tiers.settings(), "config": config.stats(), **tiers.STATS.stats()}
+
+_BREED_FILLER = {"mix", "mestizo", "mestiza", "cruce", "cruza", "cruzado", "cruzada", "tipo", "raza", "de", "con", "x"}
+_BREED_ALIASES = {"cebu": "brahman", "zebu": "brahman"}  # la heurística llama "Brahman" a todo el grupo cebuino
+
+def _base_breed(name) -> str:
+    # la heurística dice "Brahman/Mix" y la IA "Brahman", "Cruce Brahman x Criollo"...: se compara la raza base
+    s = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode().lower()
+    words = [w for w in re.split(r"[^a-z]+", s) if w and w not in _BREED_FILLER]
+    return _BREED_ALIASES.get(words[0], words[0]) if words else ""
+
+def verdict_diff(before, after):
+    # qué cambió entre el veredicto heurístico y el de la IA (solo campos que la UI muestra)
+    diff = {}
+    b, a = before.get("decision", {}), after.get("decision", {})
+    for k in ("decision_level", "decision_text", "global_score"):
+        if b.get(k) != a.get(k):
+            diff[k] = {"from": b.get(k), "to": a.get(k)}
+    if _base_breed((before.get("breed") or {}).get("name")) != _base_breed((after.get("breed") or {}).get("name")):
+        diff["breed"] = {"from": (before.get("breed") or {}).get("name"), "to": (after.get("breed") or {}).get("name")}
+    hb = {h["name"]: h.get("status") for h in before.get("health", [])}
+    health = {h["name"]: {"from": hb.get(h["name"]), "to": h.get("status")}
+              for h in after.get("health", []) if h.get("status") != hb.get(h["name"], "descartado")}
+    if health:
+        diff["health"] = health
+    return diff
+
+def sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/api/evaluate/stream")
+async def evaluate_stream(category: str = Form(...), file: UploadFile = File(...), force_ai: bool = Form(False)):
+    # Server-Sent Events: "heuristic" en milisegundos; "ai" (con diff) solo si el caso escala
+    up = await ingest.read_upload(file)
+    img = up.data
+
+    async def events():
+        t0 = time.perf_counter()
+        ms = lambda: int((time.perf_counter() - t0) * 1000)
+        tier, hit = await cached_verdict(up.sha256, category, force_ai)
+        if tier == "heuristic":
+            tiers.STATS.record("heuristic", ms())
+            metrics.observe_request(ms() / 1000, "/api/evaluate/stream", category, "ok", "heuristic", "hit")
+            yield sse("heuristic", {**hit, "elapsed_ms": ms(), "escalation": []})
+            yield sse("done", {"tier": "heuristic", "elapsed_ms": ms()})
+            return
+        if tier == "ai":
+            first, reasons = None, ["cached"]  # el veredicto de la IA sale enseguida: sin preliminar
+        else:
+            first, reasons = await heuristic_first(img, category)
+            if force_ai:
+                reasons = reasons + ["forced"]
+            if first is not None:
+                yield sse("heuristic", {**first, "elapsed_ms": ms(), "escalation": reasons})
+            else:
+                yield sse("heuristic_error", {"error": "veredicto heurístico no disponible", "elapsed_ms": ms()})
+        if not reasons:
+            await remember_heuristic(up.sha256, category, first)
+            tiers.STATS.record("heuristic", ms())
+            metrics.observe_request(ms() / 1000, "/api/evaluate/stream", category, "ok", "heuristic")
+            yield sse("done", {"tier": "heuristic", "elapsed_ms": ms()})
+            return
+        ai = asyncio.ensure_future(evaluate_image(img, category, up.sha256))
+        ai.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            try:
+                res = await ai
+                tiers.STATS.record("ai", ms(), reasons)
+                metrics.observe_request(ms() / 1000, "/api/evaluate/stream", category, "ok", "ai",
+                                        cache_label(res["cache"]))
+                yield sse("ai", {**res, "tier": "ai", "escalation": reasons, "elapsed_ms": ms(),
+                                 "diff": verdict_diff(first, res) if first else None})
+            except Exception as e:
+                if first is None:
+                    metrics.observe_request(ms() / 1000, "/api/evaluate/stream", category, "error", "ai")
+                    yield sse("ai_error", {"error": str(e), "elapsed_ms": ms()})
+                    yield sse("done", {"tier": "ai", "elapsed_ms": ms()})
+                    return
+                # el veredicto "heuristic" ya enviado queda como respuesta final
+                tiers.STATS.record("heuristic", ms(), reasons, escalation_error=True)
+                metrics.observe_request(ms() / 1000, "/api/evaluate/stream", category, "escalation_error", "heuristic")
+                yield sse("ai_error", {"error": str(e), "elapsed_ms": ms()})
+                yield sse("done", {"tier": "heuristic", "escalation_error": str(e), "elapsed_ms": ms()})
+                return
+            yield sse("done", {"tier": "ai", "elapsed_ms": ms()})
+        finally:
+            ai.cancel()  # cliente desconectado: los prompts compartidos (FLIGHTS) siguen y llenan la cache
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
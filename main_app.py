@@ -1,12 +1,22 @@
 
-import os, asyncio, time
+import os, asyncio, time, hashlib, json
+from typing import List, Tuple
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
 
+import config
+import execution
+import ingest
+import metrics
+import pipeline_real
+import providers
+import warmup
+from store import STORE
+
 APP_VERSION = "v40u-hide-bcs-row"
 
 app = FastAPI(title="GanadoBravo API", version=APP_VERSION)
@@ -33,7 +43,9 @@ def index():
 
 @app.get("/healthz")
 def healthz():
-    return {"ok": True, "version": APP_VERSION}
+    # 503 mientras el worker se calienta: el balanceador todavía no le manda tráfico
+    code, body = warmup.healthz(APP_VERSION)
+    return JSONResponse(body, status_code=code)
 
 @app.get("/routes")
 def routes():
@@ -51,12 +63,21 @@ def diag():
         },
         "last_error": LAST_ERROR,
         "last_result_set": LAST_RESULT is not None,
+        "executor": execution.stats(),
+        "http": providers.stats(),
+        "store": STORE.stats() if STORE is not None else None,
+        "warmup": warmup.status(),
+        "config": config.stats(),
     }
 
 @app.get("/api/last")
 def last():
     return {"ok": True, "result": LAST_RESULT}
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Error handlers
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
@@ -66,47 +87,173 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse({"status":"error","code":422,"message":"validation error","detail":exc.errors()}, status_code=422)
 
-MAX_IMAGE_MB = int(os.getenv("MAX_IMAGE_MB","8"))
+MAX_IMAGE_MB = ingest.MAX_IMAGE_MB
 WATCHDOG_SECONDS = int(os.getenv("WATCHDOG_SECONDS","20"))
 
-async def _evaluate_internal(img_bytes: bytes, mode: str):
+@app.on_event("startup")
+async def _start_metrics():
+    metrics.start_loop_monitor()
+    warmup.start()
+
+@app.on_event("shutdown")
+async def _shutdown_pools():
+    execution.shutdown()
+    await providers.aclose()
+
+def _store_args(img_bytes: bytes, mode: str, digest: str = None):
+    # digest: SHA-256 ya calculado durante la ingesta (evita una segunda pasada)
+    # la versión de config.json va en la clave: al recargar pesos no se sirven veredictos viejos
+    return ("evaluation", digest or hashlib.sha256(img_bytes).hexdigest(), mode, os.getenv("OPENAI_MODEL","gpt-4o-mini"),
+            f"{APP_VERSION}+cfg{config.current().version}")
+
+def _labels(mode: str, cache: str = "miss") -> dict:
+    # el pipeline de main_app es heurístico (pool CPU): solo la etapa de raza puede llamar al proveedor
+    return {"mode": mode, "provider": "local", "model": "-", "cache": cache}
+
+def _breed_labels(mode: str) -> dict:
+    if not pipeline_real.breed_uses_provider():
+        return _labels(mode)
+    bcfg = config.current().raw.get("breed_ai") or {}
+    return {**_labels(mode), "provider": providers.get_provider(), "model": bcfg.get("model", "gpt-4o-mini")}
+
+async def _timed(stage: str, labels: dict, stages: dict, aw):
+    # etapa → histograma de /metrics y debug.stages_ms de la respuesta
+    t = time.perf_counter()
+    try:
+        with metrics.stage(stage, **labels):
+            return await aw
+    finally:
+        stages[stage] = round((time.perf_counter()-t)*1000, 1)
+
+async def _evaluate_internal(img_bytes: bytes, mode: str, digest: str = None):
     global LAST_ERROR
+    # Resultado ya calculado (por este u otro worker, o antes del último deploy)
+    args = _store_args(img_bytes, mode, digest) if STORE is not None else None
+    if args is not None:
+        t = time.perf_counter()
+        stored = await execution.run_io(STORE.get, *args)
+        dt = time.perf_counter()-t
+        metrics.STAGE_SECONDS.observe(dt, stage="store_lookup", status="ok",
+                                      **_labels(mode, "hit" if isinstance(stored, dict) else "miss"))
+        if isinstance(stored, dict):
+            # latencia de esta respuesta; la de la evaluación original queda como referencia
+            stored["debug"] = {"latency_ms": int(dt*1000), "stages_ms": {"store_lookup": round(dt*1000, 1)},
+                               "store_hit": True, "evaluated_ms": (stored.get("debug") or {}).get("latency_ms")}
+            return stored
     try:
-        from pipeline_real import run_rubric_timeboxed, detect_health, run_breed_prompt, format_output
         t0 = time.time()
-        agg = run_rubric_timeboxed(img_bytes, mode)
-        health = detect_health(img_bytes, agg)
-        breed = run_breed_prompt(img_bytes)
-        out = format_output(agg, health, breed, mode)
-        out["debug"] = {"latency_ms": int((time.time()-t0)*1000)}
+        labels, stages = _labels(mode), {}
+        # CPU → un solo trabajo del pool (una decodificación: rubric, salud y artefacto de subida sobre
+        # el mismo Frame); I/O → cliente async. El event loop nunca ejecuta el pipeline.
+        local = await _timed("local", labels, stages, execution.run_cpu(pipeline_real.run_local, img_bytes, mode))
+        agg, health = local["metrics"], local["health"]
+        metrics.record_stages(agg["timings_ms"], **labels)  # sub-etapas medidas dentro del worker del pool
+        breed = await _timed("breed", _breed_labels(mode), stages, pipeline_real.run_breed_prompt(local["upload"], agg))
+        with metrics.stage("format", **labels):
+            out = pipeline_real.format_output(agg, health, breed, mode)
+        out["debug"] = {"latency_ms": int((time.time()-t0)*1000), "stages_ms": stages}
+        # raza degradada por un fallo del proveedor: no se persiste, el próximo intento puede salir bien
+        if args is not None and "decision_level" in out and "error" not in out["breed"]:
+            await execution.run_io(STORE.put, *args, out)
         LAST_ERROR = None
         return out
+    except execution.Overloaded:
+        raise
     except Exception as e:
         import traceback
         LAST_ERROR = {"error": str(e), "trace": traceback.format_exc()[-1200:]}
         return {"status":"error","code":500,"message":"pipeline exception","detail":str(e)}
 
-@app.post("/evaluate")
-async def evaluate(file: UploadFile = File(...), mode: str = Form("levante")):
-    global LAST_RESULT
-    img_bytes = await file.read()
-    if not img_bytes:
-        raise HTTPException(status_code=400, detail="Archivo vacío")
-    if len(img_bytes) > MAX_IMAGE_MB*1024*1024:
-        raise HTTPException(status_code=413, detail=f"Imagen supera {MAX_IMAGE_MB} MB")
+async def _evaluate_watchdog(img_bytes: bytes, mode: str, endpoint: str = "/evaluate",
+                             digest: str = None) -> Tuple[int, dict, dict]:
+    t0 = time.perf_counter()
+    code, body, headers = await _evaluate_watchdog_inner(img_bytes, mode, digest)
+    cache = "hit" if code == 200 and (body.get("debug") or {}).get("store_hit") else "miss"
+    status = "pipeline_error" if body.get("message") == "pipeline error" else code
+    metrics.observe_request(time.perf_counter() - t0, endpoint, mode, status, "heuristic" if code == 200 else None,
+                            cache)
+    return code, body, headers
+
+async def _evaluate_watchdog_inner(img_bytes: bytes, mode: str, digest: str = None) -> Tuple[int, dict, dict]:
+    # (status HTTP, cuerpo, headers) con el mismo watchdog y formato de error para /evaluate y /evaluate/batch
     try:
-        res = await asyncio.wait_for(_evaluate_internal(img_bytes, mode), timeout=WATCHDOG_SECONDS)
+        res = await asyncio.wait_for(_evaluate_internal(img_bytes, mode, digest), timeout=WATCHDOG_SECONDS)
         if isinstance(res, dict) and "decision_level" not in res:
-            LAST_RESULT = {"error": True, "payload": res}
-            return JSONResponse({"status":"error","code":500,"message":"pipeline error","detail":res}, status_code=200)
-        LAST_RESULT = {"error": False, "payload": res}
-        return JSONResponse(res, status_code=200)
+            return 500, {"status":"error","code":500,"message":"pipeline error","detail":res.get("detail")}, {}
+        return 200, res, {}
     except asyncio.TimeoutError:
-        LAST_RESULT = {"error": True, "payload": {"status":"error","code":504,"message":"watchdog timeout"}}
-        return JSONResponse({"status":"error","code":504,"message":"watchdog timeout"}, status_code=504)
+        return 504, {"status":"error","code":504,"message":"watchdog timeout"}, {}
+    except execution.Overloaded as e:
+        return 503, {"status":"error","code":503,"message":"servidor ocupado","detail":str(e)}, {"Retry-After": "2"}
     except Exception as e:
-        LAST_RESULT = {"error": True, "payload": {"status":"error","code":500,"message":str(e)}}
-        return JSONResponse({"status":"error","code":500,"message":"internal error","detail":str(e)}, status_code=500)
+        return 500, {"status":"error","code":500,"message":"internal error","detail":str(e)}, {}
+
+@app.post("/evaluate")
+async def evaluate(file: UploadFile = File(...), mode: str = Form("levante")):
+    global LAST_RESULT
+    up = await ingest.read_upload(file)  # límite, formato y SHA-256 por bloques antes de decodificar
+    code, body, headers = await _evaluate_watchdog(up.data, mode, digest=up.sha256)
+    if code == 200:
+        LAST_RESULT = {"error": False, "payload": body}
+    elif code != 503:
+        LAST_RESULT = {"error": True, "payload": body}
+    return JSONResponse(body, status_code=code, headers=headers)
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES","300"))
+BATCH_CONCURRENCY = max(1, min(int(os.getenv("BATCH_CONCURRENCY","8")), execution.EXEC_QUEUE_MAX))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES","2"))
+
+# cuerpos más grandes que esto se cortan mientras llegan (413), sin bufferizarlos
+app.add_middleware(ingest.BodyLimit, limits={
+    "/evaluate": ingest.body_limit(),
+    "/evaluate/batch": ingest.body_limit(BATCH_MAX_FILES),
+    "/evaluate_batch": ingest.body_limit(BATCH_MAX_FILES),
+})
+
+async def _batch_item(i: int, f: UploadFile, mode: str, sem: asyncio.Semaphore) -> dict:
+    async with sem:
+        t0 = time.time()
+        item = {"index": i, "filename": f.filename}
+        try:
+            up = await ingest.read_upload(f)
+        except StarletteHTTPException as e:
+            return {**item, "status": "error", "code": e.status_code, "message": e.detail, "latency_ms": 0}
+        for attempt in range(BATCH_RETRIES + 1):
+            code, body, _ = await _evaluate_watchdog(up.data, mode, "/evaluate/batch", up.sha256)
+            if code != 503 or attempt == BATCH_RETRIES:
+                break
+            await asyncio.sleep(0.5 * (attempt + 1))  # cola CPU llena: reintento corto en vez de fallar el animal
+        item["latency_ms"] = int((time.time()-t0)*1000)
+        if body.get("status") == "error":
+            return {**item, "status": "error", "code": body.get("code", code), "message": body.get("message"),
+                    "detail": body.get("detail")}
+        return {**item, "status": "ok", "result": body}
+
+@app.post("/evaluate/batch")
+@app.post("/evaluate_batch")  # ruta citada en README_DEPLOY
+async def evaluate_batch(files: List[UploadFile] = File(...), mode: str = Form("levante")):
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_MAX_FILES} imágenes por lote")
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def lines():
+        # una línea NDJSON por animal, en orden de llegada; al final un resumen del lote
+        t0 = time.time()
+        tasks = [asyncio.ensure_future(_batch_item(i, f, mode, sem)) for i, f in enumerate(files)]
+        ok = 0
+        try:
+            for fut in asyncio.as_completed(tasks):
+                item = await fut
+                ok += item["status"] == "ok"
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+            yield json.dumps({"summary": {"total": len(files), "ok": ok, "errors": len(files)-ok, "mode": mode,
+                                          "concurrency": BATCH_CONCURRENCY,
+                                          "elapsed_ms": int((time.time()-t0)*1000)}}) + "\n"
+        finally:
+            for t in tasks:  # cliente desconectado: no seguir gastando proveedor
+                t.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 # Catch-all: sirve la SPA
 @app.get("/{path:path}", response_class=HTMLResponse)
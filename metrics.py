@@ -0,0 +1,169 @@
+"""
+GanadoBravo — metrics.py
+
+Histogramas de latencia por etapa (decode, heurísticas, patología, raza, cada llamada a la IA,
+formateo) con etiquetas mode/provider/model/cache/status, y su exposición en formato de texto
+Prometheus para GET /metrics. Sin dependencias: una observación es un bisect sobre los buckets
+y un lock, barato para registrar en cada request.
+
+Los valores son por proceso (cada worker de uvicorn expone los suyos). Las etapas que corren
+en el pool de procesos devuelven sus tiempos y se registran en el proceso del request.
+
+    with metrics.stage("ai_prompt_1", mode=category, provider="openai", model=MODEL):
+        ...
+    metrics.record_stages({"decode": 12.5, "pathology": 40.1}, mode=category)   # ms
+
+Variables de entorno:
+- METRICS_ENABLED      "0" desactiva el registro (el endpoint sigue respondiendo)
+- METRICS_LOOP_LAG_S   período del monitor de retraso del event loop (default 0.5; 0 = apagado)
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+import asyncio, bisect, os, threading, time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_LOOP_LAG_S = float(os.getenv("METRICS_LOOP_LAG_S", "0.5"))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# segundos: de etapas NumPy (ms) a llamadas de visión con reintentos (decenas de s)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+REGISTRY: List[Any] = []
+
+# la categoría viene del formulario: fuera de las conocidas se agrupa para acotar las series
+MODES = {"levante", "engorde", "vaca flaca", "all"}
+
+def _mode(m: Any) -> str:
+    m = " ".join(str(m).strip().lower().replace("_", " ").split())
+    return m if m in MODES else ("-" if m in ("", "-") else "other")
+
+def _esc(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != float("inf") else "+Inf"
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # etiquetas → [conteo por bucket…, +Inf, suma]
+        REGISTRY.append(self)
+
+    def observe(self, seconds: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        if "mode" in labels:
+            labels["mode"] = _mode(labels["mode"])
+        key = tuple(str(labels.get(n, "-")) for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, seconds)  # primer bucket con le >= valor
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        # status="error" si el bloque lanza: separa las llamadas lentas de las que fallaron
+        t0 = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            if "status" in self.labelnames and "status" not in labels:
+                labels["status"] = status
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def collect(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        for key, s in series:
+            acc = 0
+            for le, c in zip(self.buckets + (float("inf"),), s[:-1]):
+                acc += c
+                le_label = 'le="%s"' % _num(le)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {s[-1]!r}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {acc}")
+        return out
+
+class Gauge:
+    # valor leído al exponer: fn() → número, o {valor_etiqueta | tupla_de_valores: número}
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], labelnames: Sequence[str] = (),
+                 kind: str = "gauge"):
+        self.name, self.help, self.fn, self.kind = name, help, fn, kind
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def collect(self) -> List[str]:
+        try:
+            v = self.fn()
+        except Exception:
+            return []
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        items = v.items() if isinstance(v, dict) else [((), v)]
+        for key, val in items:
+            key = key if isinstance(key, tuple) else (key,)
+            out.append(f"{self.name}{_labels(self.labelnames, key)} {_num(val)}")
+        return out
+
+def render() -> str:
+    lines: List[str] = []
+    for m in list(REGISTRY):
+        lines.extend(m.collect())
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram("ganadobravo_stage_seconds", "Duración de cada etapa de la evaluación",
+                          ("stage", "mode", "provider", "model", "cache", "status"))
+REQUEST_SECONDS = Histogram("ganadobravo_request_seconds", "Duración total del request de evaluación",
+                            ("endpoint", "mode", "status", "tier", "cache"))
+LOOP_LAG_SECONDS = Histogram("ganadobravo_event_loop_lag_seconds",
+                             "Retraso del event loop respecto de un sleep periódico",
+                             buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+def stage(name: str, **labels):
+    return STAGE_SECONDS.time(stage=name, **labels)
+
+def record_stages(timings: Dict[str, Any], **labels):
+    # acepta {etapa: ms} o los timings de StageGraph ({etapa: {"ms": …}})
+    for name, v in timings.items():
+        ms = v.get("ms") if isinstance(v, dict) else v
+        if ms is not None:
+            STAGE_SECONDS.observe(float(ms) / 1000, stage=name, status="ok", **labels)
+
+def observe_request(seconds: float, endpoint: str, mode: str, status: Any, tier: Optional[str] = None,
+                    cache: Optional[str] = None):
+    REQUEST_SECONDS.observe(seconds, endpoint=endpoint, mode=mode, status=status, tier=tier or "-",
+                            cache=cache or "-")
+
+_monitors: Dict[int, asyncio.Task] = {}
+
+async def _loop_lag(interval: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        t = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - t - interval))
+
+def start_loop_monitor():
+    # una tarea por event loop; el retraso mide cuánto tardó el loop en volver a atender
+    if METRICS_LOOP_LAG_S <= 0 or not METRICS_ENABLED:
+        return
+    loop = asyncio.get_running_loop()
+    t = _monitors.get(id(loop))
+    if t is None or t.done():
+        _monitors[id(loop)] = loop.create_task(_loop_lag(METRICS_LOOP_LAG_S))
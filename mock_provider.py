@@ -0,0 +1,274 @@
+"""
+GanadoBravo — mock_provider.py
+
+Proveedor de chat-completions local (OpenAI y Azure OpenAI) para pruebas de carga sin gastar
+tokens: latencia configurable, errores 5xx, ráfagas de 429 con Retry-After y respuestas JSON
+simuladas con los esquemas de prompts.PROMPT_1..5, pipeline_real._ai_system_prompt y
+breed_ai.SYSTEM_PROMPT. Las respuestas son deterministas por imagen (misma foto, mismos scores);
+la latencia y los errores usan un generador aparte.
+
+Uso:
+    python mock_provider.py --port 9100 --latency lognormal:1500,0.35 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=mock uvicorn main:app
+    # Azure: AZURE_OPENAI_ENDPOINT=http://127.0.0.1:9100 AZURE_OPENAI_API_KEY=mock AZURE_OPENAI_DEPLOYMENT=x
+
+Latencias: "fixed:MS" | "uniform:MIN,MAX" | "normal:MEDIA,SD" | "lognormal:MEDIANA,SIGMA" (ms).
+GET /mock/stats devuelve contadores; POST /mock/config cambia parámetros en caliente.
+
+Variables de entorno (los flags de la línea de comandos tienen prioridad):
+- MOCK_LATENCY         latencia de llamadas con imagen (default lognormal:1500,0.35)
+- MOCK_TEXT_LATENCY    latencia de llamadas solo texto, PROMPT_2/3 (default lognormal:600,0.3)
+- MOCK_ERROR_RATE      fracción de respuestas 500 (default 0)
+- MOCK_BAD_JSON_RATE   fracción de respuestas 200 con contenido que no es JSON (default 0)
+- MOCK_429_RATE        fracción de 429 sueltos fuera de las ráfagas (default 0)
+- MOCK_429_EVERY_S     cada cuántos segundos empieza una ráfaga de 429 (default 0 = sin ráfagas)
+- MOCK_429_BURST_S     duración de cada ráfaga; Retry-After = lo que falta (default 5)
+- MOCK_SEED            semilla de latencias/errores (default 0)
+"""
+from typing import Any, Dict, List, Optional
+import argparse, asyncio, hashlib, json, math, os, threading, time, uuid
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import decision
+
+CONFIG: Dict[str, Any] = {
+    "latency": os.getenv("MOCK_LATENCY", "lognormal:1500,0.35"),
+    "text_latency": os.getenv("MOCK_TEXT_LATENCY", "lognormal:600,0.3"),
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", "0")),
+    "bad_json_rate": float(os.getenv("MOCK_BAD_JSON_RATE", "0")),
+    "rate_429": float(os.getenv("MOCK_429_RATE", "0")),
+    "burst_every_s": float(os.getenv("MOCK_429_EVERY_S", "0")),
+    "burst_s": float(os.getenv("MOCK_429_BURST_S", "5")),
+}
+
+_rng = np.random.default_rng(int(os.getenv("MOCK_SEED", "0")))
+_rng_lock = threading.Lock()
+_t0 = time.monotonic()
+_stats: Dict[str, Any] = {"requests": 0, "inflight": 0, "by_kind": {}, "by_status": {}}
+
+def parse_latency(spec: str):
+    # devuelve una función rng -> ms; valida el formato al configurar, no en cada request
+    kind, _, args = spec.partition(":")
+    a = [float(x) for x in args.split(",") if x.strip()]
+    if kind == "fixed" and len(a) == 1:
+        return lambda r: a[0]
+    if kind == "uniform" and len(a) == 2:
+        return lambda r: r.uniform(a[0], a[1])
+    if kind == "normal" and len(a) == 2:
+        return lambda r: max(0.0, r.normal(a[0], a[1]))
+    if kind == "lognormal" and len(a) == 2:
+        return lambda r: r.lognormal(math.log(max(a[0], 1e-3)), a[1])
+    raise ValueError(f"latencia inválida: {spec!r} (fixed:MS | uniform:MIN,MAX | normal:MEDIA,SD | lognormal:MEDIANA,SIGMA)")
+
+_latency = {"vision": parse_latency(CONFIG["latency"]), "text": parse_latency(CONFIG["text_latency"])}
+
+def configure(**kw):
+    for k, v in kw.items():
+        if v is None:
+            continue
+        if k not in CONFIG:
+            raise ValueError(f"parámetro desconocido: {k}")
+        if k == "latency":
+            _latency["vision"] = parse_latency(v)
+        elif k == "text_latency":
+            _latency["text"] = parse_latency(v)
+        CONFIG[k] = v if k.endswith("latency") else float(v)
+
+# ---------- respuestas simuladas ----------
+
+# marcador (en el system prompt) → tipo de respuesta; el primero que aparece gana
+KINDS = (
+    ("validador de consistencia", "prompt_2"),
+    ("sistema de decisión de compra", "prompt_3"),
+    ("tamizaje veterinario", "prompt_4"),
+    ("clasificador de razas", "prompt_5"),
+    ("evaluación morfológica", "prompt_1"),
+    ("evaluador zootecnista", "full"),
+    ("evaluador de raza", "breed_ai"),
+)
+
+HEALTH = ("Lesión cutánea", "Claudicación", "Secreción nasal", "Conjuntivitis", "Diarrea", "Dermatitis",
+          "Lesión en pezuña", "Parásitos externos", "Tos")
+FULL_RUBRIC = ("Conformación", "Línea dorsal", "Angulación costillar", "Profundidad de pecho", "Aplomos", "Lomo",
+               "Grupo/muscling posterior", "Balance anterior-posterior", "Ancho torácico", "Inserción de cola")
+BREEDS = (("Brahman", "Bos indicus", "indicus", "Brahman/Mix", "ENRAZADO"),
+          ("Brangus", "Cruza", "indicus", "Brahman/Mix", "ENRAZADO"),
+          ("Angus", "Bos taurus", "taurus", "Angus", "TAURINO"),
+          ("Holstein", "Bos taurus", "taurus", "Holstein", "LECHERO"),
+          ("Criollo", "Cruza", "ninguno", "Criollo/Mix", "CRIOLLO"))
+
+def _kind(messages: List[Dict[str, Any]]) -> str:
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    for marker, kind in KINDS:
+        if marker in system:
+            return kind
+    return "unknown"
+
+def _user_parts(messages: List[Dict[str, Any]]):
+    text, image = "", None
+    for m in messages:
+        if m.get("role") != "user":
+            continue
+        c = m.get("content")
+        if isinstance(c, str):
+            text += c
+            continue
+        for p in c or []:
+            if p.get("type") == "text":
+                text += p.get("text", "")
+            elif p.get("type") == "image_url":
+                image = (p.get("image_url") or {}).get("url", "")
+    return text, image
+
+def _image_rng(image: Optional[str], text: str) -> np.random.Generator:
+    # mismo contenido → mismos scores, como una IA con temperature=0
+    h = hashlib.sha256((image or text).encode("utf-8", "ignore")).digest()
+    return np.random.default_rng(int.from_bytes(h[:8], "little"))
+
+def _score(r, mean=6.5, sd=1.1) -> float:
+    return round(float(np.clip(r.normal(mean, sd), 2.0, 9.5)) * 2) / 2
+
+def _health(r) -> List[Dict[str, str]]:
+    return [{"name": n, "status": "sospecha" if r.random() < 0.08 else "descartado"} for n in HEALTH]
+
+def _category(system: str) -> str:
+    for line in system.splitlines():
+        if line.startswith("Categoría de negocio:"):
+            return line.split(":", 1)[1].strip()
+    return "levante"
+
+def canned(kind: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    text, image = _user_parts(messages)
+    r = _image_rng(image, text)
+    base = r.normal(6.5, 0.8)  # calidad general del animal: las métricas se mueven juntas
+    if kind == "prompt_1":
+        return {"rubric": [{"name": m, "score": _score(r, base, 0.7), "obs": "simulado"} for m in decision.METRICS]}
+    if kind == "prompt_2":
+        try:
+            return {"rubric": json.loads(text).get("rubric", [])}
+        except (ValueError, AttributeError):
+            return {"rubric": []}
+    if kind == "prompt_3":
+        system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+        try:
+            rubric = json.loads(text).get("rubric", [])
+            return decision.decide(rubric, _category(system), rationale="Decisión simulada por mock_provider.")
+        except (ValueError, AttributeError):
+            return {"global_score": 0.0, "weighted_score": 0.0, "band_score": 0.0, "decision_level": "NO_COMPRAR",
+                    "decision_text": "No comprar", "rationale": "Entrada inválida (mock)."}
+    if kind == "prompt_4":
+        return {"health": _health(r)}
+    b = BREEDS[int(r.integers(len(BREEDS)))]
+    conf = round(float(r.uniform(0.45, 0.92)), 2)
+    if kind == "prompt_5":
+        return {"breed": {"name": b[0], "confidence": conf, "explanation": "Raza simulada por mock_provider."}}
+    if kind == "breed_ai":
+        return {"label": b[3], "class": b[4], "conf": conf, "reason": "simulado: señales de raza aleatorias"}
+    if kind == "full":
+        rubric = [{"name": m, "score": _score(r, base, 0.7), "obs": "simulado"} for m in FULL_RUBRIC]
+        g = round(float(np.mean([x["score"] for x in rubric])), 2)
+        lvl = int(np.searchsorted(decision.BANDS, g, side="right"))
+        return {"decision_level": decision.LEVELS[lvl], "decision_text": decision.TEXTS[lvl], "global_score": g,
+                "bcs": round(float(np.clip(base / 2, 1, 5)), 1), "risk": round(float(r.uniform(0.05, 0.5)), 2),
+                "rubric": rubric, "health": _health(r),
+                "breed": {"name": b[0], "confidence": conf, "explanation": "Raza simulada por mock_provider.",
+                          "family": b[1], "dominant": b[2]},
+                "reasons": ["respuesta simulada", f"puntaje global {g}"]}
+    return {"error": "prompt no reconocido por mock_provider"}
+
+# ---------- servidor ----------
+
+app = FastAPI(title="GanadoBravo mock provider")
+
+def _count(kind: str, status: int):
+    _stats["by_kind"][kind] = _stats["by_kind"].get(kind, 0) + 1
+    _stats["by_status"][str(status)] = _stats["by_status"].get(str(status), 0) + 1
+
+def _error(status: int, message: str, etype: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": etype, "code": None}}, status_code=status,
+                        headers=headers)
+
+async def _complete(body: Dict[str, Any], model: str) -> JSONResponse:
+    messages = body.get("messages") or []
+    kind = _kind(messages)
+    _, image = _user_parts(messages)
+    with _rng_lock:
+        delay = _latency["vision" if image else "text"](_rng) / 1000
+        u_err, u_429, u_bad = _rng.random(3)
+
+    _stats["requests"] += 1
+    # ráfaga de 429 al final de cada período: todas las llamadas de la ventana, sin latencia
+    every, burst = CONFIG["burst_every_s"], CONFIG["burst_s"]
+    if every > 0:
+        left = every - (time.monotonic() - _t0) % every
+        if left <= burst:
+            _count(kind, 429)
+            return _error(429, "Rate limit reached (mock burst)", "rate_limit_exceeded",
+                          {"Retry-After": str(max(1, math.ceil(left)))})
+    if u_429 < CONFIG["rate_429"]:
+        _count(kind, 429)
+        return _error(429, "Rate limit reached (mock)", "rate_limit_exceeded", {"Retry-After": "1"})
+
+    _stats["inflight"] += 1
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        _stats["inflight"] -= 1
+    if u_err < CONFIG["error_rate"]:
+        _count(kind, 500)
+        return _error(500, "The server had an error while processing your request (mock)", "server_error")
+
+    content = "lo siento, no puedo" if u_bad < CONFIG["bad_json_rate"] else json.dumps(canned(kind, messages),
+                                                                                      ensure_ascii=False)
+    _count(kind, 200)
+    return JSONResponse({
+        "id": "chatcmpl-mock-" + uuid.uuid4().hex[:12], "object": "chat.completion", "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    })
+
+@app.post("/v1/chat/completions")
+async def openai_chat(request: Request):
+    body = await request.json()
+    return await _complete(body, body.get("model") or "gpt-4o-mini")
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def azure_chat(deployment: str, request: Request):
+    return await _complete(await request.json(), deployment)
+
+@app.get("/mock/stats")
+async def mock_stats():
+    return {"config": CONFIG, "uptime_s": round(time.monotonic() - _t0, 1), **_stats}
+
+@app.post("/mock/config")
+async def mock_config(request: Request):
+    try:
+        configure(**(await request.json()))
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"config": CONFIG}
+
+def main(argv=None):
+    import uvicorn
+    ap = argparse.ArgumentParser(description="Proveedor OpenAI/Azure simulado para pruebas de carga")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--latency")
+    ap.add_argument("--text-latency")
+    ap.add_argument("--error-rate", type=float)
+    ap.add_argument("--bad-json-rate", type=float)
+    ap.add_argument("--rate-429", type=float)
+    ap.add_argument("--burst-every-s", type=float)
+    ap.add_argument("--burst-s", type=float)
+    args = ap.parse_args(argv)
+    configure(latency=args.latency, text_latency=args.text_latency, error_rate=args.error_rate,
+              bad_json_rate=args.bad_json_rate, rate_429=args.rate_429, burst_every_s=args.burst_every_s,
+              burst_s=args.burst_s)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,9 @@
 from typing import Any, Dict, List, Tuple
 import numpy as np
 from PIL import Image
-import json, pathlib
-
-def _load_cfg() -> Dict[str, Any]:
-    p = pathlib.Path("config.json")
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return {}
-    return {}
-
-CFG = _load_cfg()
+from concurrent.futures import ThreadPoolExecutor
+import config
+from frame import FrameLike, as_frame
 
 def _to_np_rgb(img: Image.Image) -> np.ndarray:
     return np.asarray(img.convert("RGB"))
@@ -30,43 +21,108 @@ def _saturation(rgb: np.ndarray) -> np.ndarray:
     return s
 
 def _red_like(rgb: np.ndarray) -> np.ndarray:
-    R = rgb[:,:,0].astype(np.float32)
-    G = rgb[:,:,1].astype(np.float32)
-    B = rgb[:,:,2].astype(np.float32)
-    s = _saturation(rgb)
-    return (R > 140) & (R > G + 20) & (R > B + 20) & (s > 0.35)
-
-def _blur_score(img: Image.Image) -> float:
-    g = np.asarray(img.convert("L"), dtype=np.float32) / 255.0
+    R = rgb[:,:,0].astype(np.int16)
+    G = rgb[:,:,1].astype(np.int16)
+    B = rgb[:,:,2].astype(np.int16)
+    mask = (R > 140) & (R > G + 20) & (R > B + 20)
+    # la saturación (float) solo se calcula en los candidatos; mismo resultado, mucho menos trabajo
+    if mask.any():
+        mask[mask] = _saturation(rgb[mask][None, :, :])[0] > 0.35
+    return mask
+
+def _blur_score(img: FrameLike) -> float:
+    g = as_frame(img).gray_f32
     gx = np.zeros_like(g); gy = np.zeros_like(g)
     gx[:,1:-1] = g[:,2:] - g[:,:-2]; gy[1:-1,:] = g[2:,:] - g[:-2,:]
     return float(np.var(gx) + np.var(gy))
 
+# --- Etiquetado de componentes (4-conexo) por runs + union-find vectorizado ---
+# Devuelve exactamente lo mismo que el flood fill original (mismo orden raster
+# de componentes) pero sin recorrer píxel a píxel en Python.
+
+def _cc_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    h, w = mask.shape
+    pad = np.zeros((h, w+2), dtype=np.int8)
+    pad[:,1:-1] = mask
+    d = np.diff(pad, axis=1)
+    rows, starts = np.nonzero(d == 1)
+    _, ends = np.nonzero(d == -1)  # fin exclusivo
+    return rows.astype(np.int64), starts.astype(np.int64), ends.astype(np.int64)
+
+def _cc_union(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, w: int) -> np.ndarray:
+    n = rows.size
+    parent = np.arange(n, dtype=np.int64)
+    if n == 0: return parent
+    W = w + 1
+    ks = rows*W + starts; ke = rows*W + ends
+    # runs de la fila siguiente que se solapan en columnas con cada run
+    lo = np.searchsorted(ke, (rows+1)*W + starts, side="right")
+    hi = np.searchsorted(ks, (rows+1)*W + ends, side="left")
+    cnt = np.maximum(hi - lo, 0)
+    total = int(cnt.sum())
+    if total == 0: return parent
+    a = np.repeat(np.arange(n, dtype=np.int64), cnt)
+    b = np.repeat(lo, cnt) + (np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(cnt) - cnt, cnt))
+    while True:
+        pa, pb = parent[a], parent[b]
+        if np.array_equal(pa, pb): break
+        # engancha siempre la raíz mayor a la menor → la raíz final es el primer run (orden raster)
+        np.minimum.at(parent, np.maximum(pa, pb), np.minimum(pa, pb))
+        while True:
+            pp = parent[parent]
+            if np.array_equal(pp, parent): break
+            parent = pp
+    return parent
+
+def _cc_reduce(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, parent: np.ndarray) -> Dict[str, np.ndarray]:
+    roots, comp = np.unique(parent, return_inverse=True)
+    comp = comp.reshape(-1)
+    if comp.size == 0:
+        z = np.zeros(0, dtype=np.int64)
+        return {"runs": (rows, starts, ends), "comp": comp, "area": z, "minr": z, "minc": z,
+                "maxr": z, "maxc": z, "first_r": z, "first_c": z}
+    order = np.argsort(comp, kind="stable")
+    bounds = np.r_[0, np.flatnonzero(np.diff(comp[order])) + 1]
+    return {"runs": (rows, starts, ends), "comp": comp,
+            "area": np.add.reduceat((ends - starts)[order], bounds),
+            "minr": rows[roots],
+            "minc": np.minimum.reduceat(starts[order], bounds),
+            "maxr": np.maximum.reduceat(rows[order], bounds),
+            "maxc": np.maximum.reduceat(ends[order] - 1, bounds),
+            # primer píxel en orden raster (define el orden de los componentes)
+            "first_r": rows[roots], "first_c": starts[roots]}
+
+def _cc_stats(mask: np.ndarray) -> Dict[str, np.ndarray]:
+    rows, starts, ends = _cc_runs(mask)
+    return _cc_reduce(rows, starts, ends, _cc_union(rows, starts, ends, mask.shape[1]))
+
 def _cc_label(mask: np.ndarray) -> Tuple[np.ndarray, List[Tuple[int,int,int,int,int]]]:
     h, w = mask.shape
+    st = _cc_stats(mask)
+    rows, starts, ends = st["runs"]
     labels = np.zeros((h,w), dtype=np.int32)
-    comp = []; cur = 0
-    visited = np.zeros_like(mask, dtype=bool)
-    for r in range(h):
-        for c in range(w):
-            if not mask[r,c] or visited[r,c]: continue
-            cur += 1
-            stack=[(r,c)]; visited[r,c]=True; labels[r,c]=cur
-            minr,minc,maxr,maxc = r,c,r,c; area=0
-            while stack:
-                rr,cc = stack.pop()
-                area += 1
-                if rr<minr: minr=rr
-                if rr>maxr: maxr=rr
-                if cc<minc: minc=cc
-                if cc>maxc: maxc=cc
-                for dr,dc in ((1,0),(-1,0),(0,1),(0,-1)):
-                    nr, nc = rr+dr, cc+dc
-                    if 0<=nr<h and 0<=nc<w and mask[nr,nc] and not visited[nr,nc]:
-                        visited[nr,nc]=True; labels[nr,nc]=cur; stack.append((nr,nc))
-            comp.append((area,minr,minc,maxr,maxc))
+    labels.reshape(-1)[np.flatnonzero(mask)] = np.repeat(st["comp"].astype(np.int32) + 1, ends - starts)
+    comp = list(zip(st["area"].tolist(), st["minr"].tolist(), st["minc"].tolist(), st["maxr"].tolist(), st["maxc"].tolist()))
     return labels, comp
 
+def _integral(mask: np.ndarray) -> np.ndarray:
+    h, w = mask.shape
+    ii = np.zeros((h+1, w+1), dtype=np.int32)
+    np.cumsum(mask, axis=0, dtype=np.int32, out=ii[1:,1:])
+    np.cumsum(ii[1:,1:], axis=1, out=ii[1:,1:])
+    return ii
+
+def _shape_features_batch(ii: np.ndarray, minr: np.ndarray, minc: np.ndarray,
+                          maxr: np.ndarray, maxc: np.ndarray) -> Dict[str, np.ndarray]:
+    # mismo cálculo que _shape_features para muchos bbox a la vez (área = píxeles de la máscara en el bbox)
+    area = (ii[maxr+1, maxc+1] - ii[minr, maxc+1] - ii[maxr+1, minc] + ii[minr, minc]).astype(np.float64)
+    bh = (maxr - minr + 1).astype(np.float64); bw = (maxc - minc + 1).astype(np.float64)
+    extent = area / np.where(bh*bw > 0, bh*bw, 1.0)
+    aspect = bw / np.maximum(1.0, bh)
+    cfg = config.current()
+    oval = (extent >= cfg.extent_min) & (aspect >= cfg.oval_aspect_lo) & (aspect <= cfg.oval_aspect_hi)
+    return {"extent": extent, "aspect": aspect, "oval": oval.astype(np.float64)}
+
 def _shape_features(mask: np.ndarray, bbox: Tuple[int,int,int,int]) -> Dict[str,float]:
     minr,minc,maxr,maxc = bbox
     sub = mask[minr:maxr+1, minc:maxc+1]
@@ -75,51 +131,118 @@ def _shape_features(mask: np.ndarray, bbox: Tuple[int,int,int,int]) -> Dict[str,
     bbox_area = float(h*w) if h*w>0 else 1.0
     extent = area / bbox_area
     aspect = (w / max(1,h))
-    shp = CFG.get("pathology",{}).get("shape",{})
-    oval = (extent >= float(shp.get("extent_min", 0.45)) and
-            float(shp.get("oval_aspect_lo", 0.6)) <= aspect <= float(shp.get("oval_aspect_hi", 1.8)))
+    cfg = config.current()
+    oval = extent >= cfg.extent_min and cfg.oval_aspect_lo <= aspect <= cfg.oval_aspect_hi
     return {"extent": extent, "aspect": aspect, "oval": float(oval)}
 
-def _roi(img: np.ndarray, y0: float, y1: float, x0: float, x1: float) -> np.ndarray:
-    h, w, _ = img.shape
+def _roi_bounds(h: int, w: int, y0: float, y1: float, x0: float, x1: float) -> Tuple[int, int, int, int]:
     r0, r1 = int(h*y0), int(h*y1)
     c0, c1 = int(w*x0), int(w*x1)
     r0 = max(0,min(h-1,r0)); r1 = max(r0+1,min(h, r1))
     c0 = max(0,min(w-1,c0)); c1 = max(c0+1,min(w, c1))
+    return r0, r1, c0, c1
+
+def _roi(img: np.ndarray, y0: float, y1: float, x0: float, x1: float) -> np.ndarray:
+    r0, r1, c0, c1 = _roi_bounds(img.shape[0], img.shape[1], y0, y1, x0, x1)
     return img[r0:r1, c0:c1, :]
 
+# Índice de componentes: UNA pasada de etiquetado sobre la máscara roja completa.
+# Guarda runs, bbox/área por componente e imagen integral; las ROI se responden desde
+# el índice y solo se re-etiquetan los runs de componentes que cruzan el borde de la
+# ROI (mismo resultado que etiquetar la ROI recortada).
+class ComponentIndex:
+    def __init__(self, mask: np.ndarray):
+        self.mask = mask
+        self.h, self.w = mask.shape
+        self.st = _cc_stats(mask)
+        self._ii = None
+
+    @property
+    def integral(self) -> np.ndarray:
+        if self._ii is None:
+            self._ii = _integral(self.mask)
+        return self._ii
+
+    def query(self, r0: int, r1: int, c0: int, c1: int) -> Dict[str, Any]:
+        st = self.st
+        rows, starts, ends = st["runs"]
+        minr, minc, maxr, maxc = st["minr"], st["minc"], st["maxr"], st["maxc"]
+        inside = (minr >= r0) & (maxr < r1) & (minc >= c0) & (maxc < c1)
+        touch = (minr < r1) & (maxr >= r0) & (minc < c1) & (maxc >= c0) & ~inside
+        in_rows = (rows >= r0) & (rows < r1)
+        cs, ce = np.clip(starts, c0, c1), np.clip(ends, c0, c1)
+        red = int((ce - cs)[in_rows].sum())
+        sel = in_rows & touch[st["comp"]] & (ce > cs)
+        rs, ss, es = rows[sel], cs[sel], ce[sel]
+        cut = _cc_reduce(rs, ss, es, _cc_union(rs, ss, es, self.w))
+        parts = [{k: st[k][inside] for k in ("area","minr","minc","maxr","maxc","first_r","first_c")},
+                 {k: cut[k] for k in ("area","minr","minc","maxr","maxc","first_r","first_c")}]
+        out = {k: np.concatenate([parts[0][k], parts[1][k]]) for k in parts[0]}
+        order = np.lexsort((out["first_c"], out["first_r"]))
+        out = {k: v[order] for k, v in out.items()}
+        out["red"] = red
+        return out
+
+    def region(self, r0: int, r1: int, c0: int, c1: int) -> Dict[str, Any]:
+        q = self.query(r0, r1, c0, c1)
+        h, w = r1 - r0, c1 - c0
+        img_area = h*w
+        cfg = config.current()
+        min_ar = cfg.min_area_ratio * img_area
+        max_ar = cfg.max_area_ratio * img_area
+        best = {"area":0,"bbox":(0,0,0,0),"oval":0.0,"extent":0.0,"aspect":0.0}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            total_red = float(np.float64(q["red"]) / img_area)
+        idx = np.flatnonzero((q["area"] >= min_ar) & (q["area"] <= max_ar))
+        if idx.size:
+            minr, minc, maxr, maxc = q["minr"][idx], q["minc"][idx], q["maxr"][idx], q["maxc"][idx]
+            feats = _shape_features_batch(self.integral, minr, minc, maxr, maxc)
+            area = q["area"][idx]
+            scores = area * (0.5 + 0.5*feats["oval"]) * (0.5 + 0.5*feats["extent"])
+            # recorrido secuencial: conserva el criterio original (score vs área del mejor actual)
+            for i in range(idx.size):
+                if scores[i] > best["area"]:
+                    best = {"area":int(area[i]),"bbox":(int(minr[i])-r0,int(minc[i])-c0,int(maxr[i])-r0,int(maxc[i])-c0),
+                            "oval":float(feats["oval"][i]),"extent":float(feats["extent"][i]),"aspect":float(feats["aspect"][i])}
+        return {"total_red": total_red, "best": best, "mask_count": int(q["area"].size), "h":h, "w":w}
+
 def _analyze_region(rgb: np.ndarray) -> Dict[str, Any]:
-    mask = _red_like(rgb)
-    labels, comps = _cc_label(mask)
     h, w, _ = rgb.shape
-    img_area = h*w
-    shp_cfg = CFG.get("pathology",{}).get("shape",{})
-    min_ar = float(shp_cfg.get("min_area_ratio", 0.0008)) * img_area
-    max_ar = float(shp_cfg.get("max_area_ratio", 0.08))    * img_area
-    best = {"area":0,"bbox":(0,0,0,0),"oval":0.0,"extent":0.0,"aspect":0.0}
-    total_red = float(mask.mean())
-    for area,minr,minc,maxr,maxc in comps:
-        if area < min_ar or area > max_ar: continue
-        feats = _shape_features(mask, (minr,minc,maxr,maxc))
-        score = area * (0.5 + 0.5*feats["oval"]) * (0.5 + 0.5*feats["extent"])
-        if score > best["area"]:
-            best = {"area":area,"bbox":(minr,minc,maxr,maxc),"oval":feats["oval"],"extent":feats["extent"],"aspect":feats["aspect"]}
-    return {"total_red": total_red, "best": best, "mask_count": len(comps), "h":h, "w":w}
-
-def run_pathology_heuristic(img: Image.Image, mode: str, vis_ratio: float) -> Dict[str, Any]:
-    cfgp = CFG.get("pathology", {}) or {}
-    alert_thr = float(cfgp.get("alert_threshold", 0.80))
-    confirm_thr = float(cfgp.get("confirm_threshold", 0.90))
-    checks = (cfgp.get("checklist", {}) or {}).get(mode, [])
-
-    blur = _blur_score(img)
-    rgb = _to_np_rgb(img)
+    return ComponentIndex(_red_like(rgb)).region(0, h, 0, w)
+
+def _red_index(fr) -> ComponentIndex:
+    return fr.memo("red_index", lambda: ComponentIndex(_red_like(fr.rgb)))
+
+def _cojera_energy(fr) -> float:
+    a = fr.gray
+    h, w = a.shape
+    roi = a[int(h*0.55):, int(w*0.45):]
+    gx = np.zeros_like(roi, dtype=np.float32); gy = np.zeros_like(roi, dtype=np.float32)
+    gx[:,1:-1] = roi[:,2:] - roi[:,:-2]; gy[1:-1,:] = roi[2:,:] - roi[:-2,:]
+    return float(np.mean(np.abs(gx)) + np.mean(np.abs(gy)))
+
+# máscara/etiquetado, blur y cojera son pasadas independientes → hilos (NumPy suelta el GIL)
+_POOL = ThreadPoolExecutor(max_workers=3, thread_name_prefix="pathology")
+
+def run_pathology_heuristic(img: FrameLike, mode: str, vis_ratio: float, checks: List[str] = None) -> Dict[str, Any]:
+    # checks: lista explícita de hallazgos a revisar (default: el checklist del modo)
+    cfg = config.current()
+    alert_thr, confirm_thr = cfg.alert_threshold, cfg.confirm_threshold
+    checks = cfg.checklist.get(mode, []) if checks is None else checks
+
+    fr = as_frame(img)
+    red_checks = {"lesion_cutanea", "ojo_infectado", "prolapso"} & set(checks)
+    f_index = _POOL.submit(_red_index, fr) if red_checks else None
+    f_cojera = _POOL.submit(_cojera_energy, fr) if "cojera" in checks else None
+    blur = fr.memo("blur_score", lambda: _blur_score(fr))
+    index = f_index.result() if f_index else None
+    h, w = fr.size[1], fr.size[0]
 
     out: List[Dict[str,Any]] = []
 
     # Lesión cutánea
     if "lesion_cutanea" in checks:
-        anal = _analyze_region(rgb)  # toda la imagen
+        anal = index.region(0, h, 0, w)  # toda la imagen
         base_conf = 0.0
         if anal["total_red"] > 0.035: base_conf = 0.86
         elif anal["total_red"] > 0.015: base_conf = 0.78
@@ -141,9 +264,7 @@ def run_pathology_heuristic(img: Image.Image, mode: str, vis_ratio: float) -> Di
 
     # Ojo infectado (ROI frontal-superior)
     if "ojo_infectado" in checks:
-        h, w, _ = rgb.shape
-        roi = rgb[:int(h*0.35), :int(w*0.35), :]
-        anal = _analyze_region(roi)
+        anal = index.region(*_roi_bounds(h, w, 0.0, 0.35, 0.0, 0.35))
         base_conf = 0.0
         if anal["total_red"] > 0.02 and anal["best"]["area"]>0: base_conf = 0.82
         shape_ok = (anal["best"]["oval"] >= 0.5) and (0.0002*h*w <= anal["best"]["area"] <= 0.005*h*w)
@@ -164,9 +285,7 @@ def run_pathology_heuristic(img: Image.Image, mode: str, vis_ratio: float) -> Di
 
     # Prolapso (ROI caudal-inferior) — exige forma oval para confirmada
     if "prolapso" in checks:
-        h, w, _ = rgb.shape
-        roi = rgb[int(h*0.55):, int(w*0.55):, :]
-        anal = _analyze_region(roi)
+        anal = index.region(*_roi_bounds(h, w, 0.55, 1.0, 0.55, 1.0))
         base_conf = 0.0
         if anal["total_red"] > 0.02 and anal["best"]["area"]>0: base_conf = 0.84
         shape_ok = (anal["best"]["oval"] >= 0.5)
@@ -187,12 +306,7 @@ def run_pathology_heuristic(img: Image.Image, mode: str, vis_ratio: float) -> Di
 
     # Cojera — nunca confirmada con este proxy
     if "cojera" in checks:
-        a = np.asarray(img.convert("L"))
-        h, w = a.shape
-        roi = a[int(h*0.55):, int(w*0.45):]
-        gx = np.zeros_like(roi, dtype=np.float32); gy = np.zeros_like(roi, dtype=np.float32)
-        gx[:,1:-1] = roi[:,2:] - roi[:,:-2]; gy[1:-1,:] = roi[2:,:] - roi[:-2,:]
-        e = float(np.mean(np.abs(gx)) + np.mean(np.abs(gy)))
+        e = f_cojera.result()
         conf = 0.0
         if e < 0.004: conf = 0.55
         elif e < 0.006: conf = 0.65
@@ -0,0 +1,85 @@
+"""
+GanadoBravo — phash.py
+
+Huella perceptual (DCT 8x8 sobre el gris reducido que ya produce heuristics._prep) e índice
+en memoria para buscar casi-duplicados por distancia de Hamming. Sirve para reconocer la
+misma foto re-codificada/re-escalada (p. ej. reenviada por WhatsApp), donde el SHA-256 cambia.
+
+Variables de entorno:
+- PHASH_MAX_DISTANCE  bits distintos (de 64) para considerar la misma foto (default 5)
+- PHASH_INDEX_MAX     huellas retenidas en el índice (default 20000, FIFO)
+"""
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from collections import OrderedDict
+import os, threading
+import numpy as np
+from PIL import Image
+
+from frame import FrameLike, as_frame
+
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "5"))
+PHASH_INDEX_MAX = int(os.getenv("PHASH_INDEX_MAX", "20000"))
+
+_N = 32
+_k = np.arange(_N)
+_DCT = (np.sqrt(2.0/_N) * np.cos(np.pi * (2*_k[None,:] + 1) * _k[:,None] / (2*_N))).astype(np.float64)
+_DCT[0] /= np.sqrt(2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def dct_hash(gray: np.ndarray) -> int:
+    # gray: float [0,1] (H,W). 32x32 → DCT-II → 8x8 de baja frecuencia → bits vs mediana (sin DC)
+    small = Image.fromarray(np.ascontiguousarray(gray, dtype=np.float32)).resize((_N, _N), Image.BOX)
+    a = np.asarray(small, dtype=np.float64)
+    low = (_DCT @ a @ _DCT.T)[:8, :8].reshape(-1)
+    bits = low > np.median(low[1:])
+    return int(np.packbits(bits).view(">u8")[0])
+
+def fingerprint(img: FrameLike) -> int:
+    return dct_hash(as_frame(img).small_gray(512))
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+class PHashIndex:
+    def __init__(self, max_entries: int = PHASH_INDEX_MAX, max_distance: int = PHASH_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._keys: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._arr = np.zeros(0, dtype=np.uint64)
+        self._arr_keys: List[Hashable] = []
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.lookups = self.approx_hits = 0
+
+    def add(self, h: int, key: Hashable):
+        with self._lock:
+            self._keys.pop(key, None)
+            self._keys[key] = h
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+            self._dirty = True
+
+    def _compact(self):
+        if self._dirty:
+            self._arr_keys = list(self._keys)
+            self._arr = np.fromiter(self._keys.values(), dtype=np.uint64, count=len(self._keys))
+            self._dirty = False
+
+    def nearest(self, h: int, max_distance: Optional[int] = None) -> Optional[Tuple[Hashable, int]]:
+        thr = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            self.lookups += 1
+            self._compact()
+            if self._arr.size == 0:
+                return None
+            x = np.bitwise_xor(self._arr, np.uint64(h))
+            dist = _POPCOUNT[x.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+            i = int(np.argmin(dist)); d = int(dist[i])
+            if d > thr:
+                return None
+            self.approx_hits += 1
+            return self._arr_keys[i], d
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._keys), "max_entries": self.max_entries, "max_distance": self.max_distance,
+                "lookups": self.lookups, "approx_hits": self.approx_hits}
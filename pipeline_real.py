@@ -1,69 +1,158 @@
 """
 GanadoBravo — pipeline_real.py (v38)
 
-Coloca aquí TU lógica real. Estas funciones serán llamadas por main.py:
-- run_metrics_pass(img, mode, pass_id)
-- aggregate_metrics(m1, m2)
-- detect_health(img, metrics)
-- run_breed_prompt(img)
-- format_output(metrics, health, breed, mode)
+Etapas del pipeline de /evaluate (main_app.py); cada una corre fuera del event loop:
+- run_rubric(img, mode)                        CPU: heurísticas + puntaje por modo (2ª pasada si hace falta)
+- detect_health(img, metrics)                  CPU: patología por ROI con el checklist del modo
+- run_breed_prompt(img, metrics)               I/O (async): raza con breed_ai; img puede ser el artefacto de subida
+- format_output(metrics, health, breed, mode)  objeto final que espera la UI (ver README_REAL.md)
+run_local(img, mode) corre las dos etapas CPU (y el artefacto de subida de la raza) sobre un solo
+Frame: la imagen se decodifica una vez por request y todo va en un único trabajo del pool.
+heuristic_eval arma el veredicto heurístico inmediato de main.py con los mismos pasos.
+ai_first_full_eval pide la evaluación completa a la IA (OpenAI o Azure OpenAI) en una sola llamada.
 """
-from typing import Any, Dict
-
-# Ejemplo de estructura intermedia esperada (ajusta a tu implementación):
-# m = { "scores": {...}, "bcs": 3.5, "risk": 0.2, "posterior_bonus": 0.1, "rubric": [...],
-#       "global_score": 7.4, "global_conf": 0.93, "reasons": ["..."] }
-
-def run_metrics_pass(img, mode: str, pass_id: int) -> Dict[str, Any]:
-    # TODO: Reemplaza con TU evaluación real (pasada 1/2).
-    # No hagas I/O de red aquí salvo que sea imprescindible.
-    raise NotImplementedError("Implementa run_metrics_pass")
-
-def aggregate_metrics(m1: Dict[str, Any], m2: Dict[str, Any]) -> Dict[str, Any]:
-    # TODO: Combina/valida m1 y m2 (promedios/consistencia).
-    raise NotImplementedError("Implementa aggregate_metrics")
-
-def detect_health(img, metrics: Dict[str, Any]):
-    # TODO: Heurísticas de salud (sin mostrar configs/oval).
-    # Devuelve lista de dicts: [{"name":"Lesión cutánea", "severity":"descartado"}, ...]
-    raise NotImplementedError("Implementa detect_health")
-
-def run_breed_prompt(img):
-    # TODO: Prompt oculto de raza (heurístico/LLM/modelo), resalta criollo/entrecruzamiento.
-    # Devuelve dict: {"name":"Criollo (...)", "confidence":0.58, "explanation":"..."}
-    raise NotImplementedError("Implementa run_breed_prompt")
-
-def format_output(metrics: Dict[str, Any], health, breed, mode: str):
-    # TODO: Construye el objeto final que la UI espera.
-    # Campos mínimos:
-    # - decision_level: "NO_COMPRAR" | "CONSIDERAR_BAJO" | "CONSIDERAR_ALTO" | "COMPRAR"
-    # - decision_text:  "No comprar" | "Considerar bajo" | "Considerar alto" | "Comprar"
-    # - global_score, bcs, risk, posterior_bonus, global_conf, notes
-    # - qc.visible_ratio, qc.stability (si aplica)
-    # - rubric: [{"name":..., "score":..., "obs":...}, ...]
-    # - reasons: ["...", ...]
-    # - health: lista (ver arriba)
-    # - breed: dict (ver arriba)
-    raise NotImplementedError("Implementa format_output")
+from typing import Any, Dict, List, Tuple
+import os, time
 
+def _mode_key(mode: str) -> Tuple[bool, str]:
+    # mode "all": rubric, patología y raza una vez; los pesos de cada modo se aplican juntos
+    import config
+    all_modes = config.is_all_modes(mode)
+    return all_modes, (config.DEFAULT_MODE if all_modes else str(mode).strip().lower().replace(" ", "_"))
 
-# ======================= AI-FIRST FULL EVALUATION =======================
-import json as _json, base64 as _b64, os as _os
-from typing import Any as _Any, Dict as _Dict, List as _List
+def _checks(all_modes: bool):
+    # None = checklist del modo; "all" = unión de los checklists de todos los modos
+    import config
+    return list(dict.fromkeys(c for cl in config.current().checklist.values() for c in cl)) if all_modes else None
+
+def run_rubric(img, mode: str, vis_ratio: float = None) -> Dict[str, Any]:
+    import heuristics, breed, config
+    from frame import as_frame
+    # mismas etapas (y nombres en /metrics) que heuristic_eval
+    timings, t = {}, [time.perf_counter()]
+    def lap(name):
+        now = time.perf_counter()
+        timings[name] = round((now - t[0]) * 1000, 2)
+        t[0] = now
+    fr = as_frame(img)
+    fr.image
+    lap("decode")
+    all_modes, mode_key = _mode_key(mode)
+    vis = 0.5 if vis_ratio is None else vis_ratio
+    first = heuristics.run_auction_heuristics(fr)
+    lap("heuristics")
+    d = heuristics.apply_heuristic_scoring({"mode": mode_key, "raw_image": fr, "qc": {"visible_ratio": vis},
+                                            "all_modes": all_modes}, first)
+    lap("scoring")
+    br = breed.run_breed_heuristic(fr, config.current().raw)
+    lap("breed_heuristic")
+    rubric = [{"name": r["name"], "score": round(float(r["score"]) * 2, 1), "obs": r["obs"]} for r in d["rubric"]]
+    by_key = dict(zip(config.RUBRIC_KEYS, (float(r["score"]) for r in d["rubric"])))
+    stab = d["ux"].get("stability")
+    out = {
+        "mode": mode, "mode_key": mode_key, "all_modes": all_modes, "visible_ratio": vis,
+        "rubric": rubric,
+        "total_1to5": d["total_1to5"],
+        "global_score": round(float(d["total_1to5"]) * 2, 2),  # escala 1–5 → 1–10 como la rubric
+        "decision_level": d["decision_level"],
+        "decision_hint": heuristics._decision_with_sublevels(d["total_1to5"])[2],
+        "bcs": by_key["bcs"],
+        "posterior": by_key["grupo_posterior"],
+        "weights_used": d["ux"]["weights_used"],
+        "global_conf": d["global_conf"],
+        # sin 2ª pasada no hubo motivo de duda: estabilidad alta
+        "stability": "alta" if stab is None else {"estable": "alta", "moderado": "media"}.get(stab["level"], "baja"),
+        "reasons": d["reasons"],
+        "breed_heuristic": br,
+        "diagnostics": {k: v for k, v in d["diagnostics"].items() if k != "SI_items"},
+        "timings_ms": timings,
+    }
+    if all_modes:
+        out["by_mode"] = d["by_mode"]
+    return out
+
+def detect_health(img, metrics: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # [{"name":"Lesión cutánea", "severity":"descartado|alerta|confirmada", "confidence":0.4}, ...]
+    import pathology
+    path = pathology.run_pathology_heuristic(img, metrics["mode_key"], metrics["visible_ratio"],
+                                             _checks(metrics["all_modes"]))
+    return [{"name": _HEALTH_NAMES.get(h["name"], h["name"]), "severity": h["severity"],
+             "confidence": h["confidence"]} for h in path.get("health", [])]
 
-def _get_ai_provider():
-    if _os.getenv("AZURE_OPENAI_API_KEY") and _os.getenv("AZURE_OPENAI_ENDPOINT"):
-        return "azure"
-    return "openai"
+def breed_uses_provider() -> bool:
+    # la raza va al proveedor de IA (y necesita el artefacto de subida); si no, stub/heurística
+    import config
+    bcfg = config.current().raw.get("breed_ai") or {}
+    return os.getenv("ENABLE_BREED", "1") != "0" and bcfg.get("enabled", True) and bcfg.get("provider", "stub") == "openai"
 
-def _openai_headers():
-    return {"Authorization": f"Bearer {_os.getenv('OPENAI_API_KEY','')}", "Content-Type": "application/json"}
+def run_local(img, mode: str, vis_ratio: float = None) -> Dict[str, Any]:
+    # {"metrics", "health", "upload"}: upload = artefacto para run_breed_prompt (None si la raza no llama al proveedor)
+    import upload
+    from frame import as_frame
+    fr = as_frame(img)
+    metrics = run_rubric(fr, mode, vis_ratio)
+    t = time.perf_counter()
+    health = detect_health(fr, metrics)
+    metrics["timings_ms"]["pathology"] = round((time.perf_counter() - t) * 1000, 2)
+    art = None
+    if breed_uses_provider():
+        t = time.perf_counter()
+        art = upload.build(fr)
+        metrics["timings_ms"]["upload"] = round((time.perf_counter() - t) * 1000, 2)
+    return {"metrics": metrics, "health": health, "upload": art}
 
-def _azure_headers():
-    return {"api-key": _os.getenv("AZURE_OPENAI_API_KEY",""), "Content-Type": "application/json"}
+async def run_breed_prompt(img, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    # raza por breed_ai sobre la heurística de la etapa rubric; si el proveedor falla queda la heurística
+    import breed_ai, config
+    h = metrics["breed_heuristic"]
+    out, error = None, None
+    cfg = config.current().raw
+    if os.getenv("ENABLE_BREED", "1") != "0" and (cfg.get("breed_ai") or {}).get("enabled", True):
+        try:
+            out = await breed_ai.run_breed_ai(img, cfg, h)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    out = out or {**h, "source": "heuristic"}
+    res = {"name": out.get("label"), "confidence": float(out.get("conf") or 0.0), "explanation": out.get("reason", ""),
+           "class": out.get("class"), "source": out.get("source")}
+    if error:
+        res["error"] = error
+    return res
 
-def _img_to_b64(img_bytes: bytes) -> str:
-    return "data:image/jpeg;base64," + _b64.b64encode(img_bytes).decode("utf-8")
+def format_output(metrics: Dict[str, Any], health, breed, mode: str) -> Dict[str, Any]:
+    level = metrics["decision_level"]
+    found = [h for h in health if h["severity"] != "descartado"]
+    out = {
+        "engine": "heuristic",
+        "mode": mode,
+        "decision_level": level,
+        "decision_text": _LEVEL_TEXT.get(level, level),
+        "global_score": metrics["global_score"],
+        "bcs": metrics["bcs"],
+        "risk": round(max([float(h["confidence"]) for h in found] or [0.0]), 2),
+        # cuánto suma el grupo posterior al total 1–5 frente a uno neutro (3.0) con los pesos del modo
+        "posterior_bonus": round(metrics["weights_used"].get("grupo_posterior", 0.0) * (metrics["posterior"] - 3.0), 2),
+        "global_conf": metrics["global_conf"],
+        "notes": metrics["decision_hint"],
+        "qc": {"visible_ratio": metrics["visible_ratio"], "stability": metrics["stability"], "auction_mode": True},
+        "rubric": metrics["rubric"],
+        "reasons": list(metrics["reasons"]) + [f"Hallazgo de salud: {h['name']} ({h['severity']})." for h in found],
+        "health": health,
+        "breed": breed,
+    }
+    if "by_mode" in metrics:
+        out["by_mode"] = {m.replace("_", " "): {"global_score": round(t["total_1to5"] * 2, 2),
+                                                "decision_level": t["decision_level"],
+                                                "decision_text": _LEVEL_TEXT.get(t["decision_level"], t["decision_label"])}
+                          for m, t in metrics["by_mode"].items()}
+    return out
+
+
+# ======================= AI-FIRST FULL EVALUATION =======================
+import json as _json, re as _re
+import metrics as _metrics
+import providers as _providers
+import upload as _upload
 
 def _ai_system_prompt(mode: str) -> str:
     return f"""Eres un evaluador zootecnista experto. Evalúa bovinos en la foto para el objetivo: '{mode}'.
@@ -111,38 +200,84 @@ def _ai_user_payload(img_b64: str):
     return [{"type":"text","text":"Evalúa estrictamente y devuelve SOLO el JSON pedido."},
             {"type":"image_url","image_url":{"url": img_b64}}]
 
-def _call_openai_vision(img_bytes: bytes, mode: str, model: str, timeout: int = 14) -> _Dict[str,_Any]:
-    provider = _get_ai_provider()
-    img_b64 = _img_to_b64(img_bytes)
-    system = _ai_system_prompt(mode)
-    messages = [{"role":"system","content":system},{"role":"user","content": _ai_user_payload(img_b64)}]
-
-    import requests
-    if provider == "openai":
-        api = "https://api.openai.com/v1/chat/completions"
-        body = {"model": model or "gpt-4o-mini", "messages": messages, "temperature": 0.2}
-        r = requests.post(api, headers=_openai_headers(), json=body, timeout=timeout)
-        r.raise_for_status()
-        content = r.json()["choices"][0]["message"]["content"]
-    else:
-        dep = _os.getenv("AZURE_OPENAI_DEPLOYMENT","")
-        endpoint = _os.getenv("AZURE_OPENAI_ENDPOINT","").rstrip("/")
-        api = f"{endpoint}/openai/deployments/{dep}/chat/completions?api-version={_os.getenv('AZURE_OPENAI_API_VERSION','2024-06-01')}"
-        body = {"messages": messages, "temperature": 0.2}
-        r = requests.post(api, headers=_azure_headers(), json=body, timeout=timeout)
-        r.raise_for_status()
-        content = r.json()["choices"][0]["message"]["content"]
-
-    import re
-    m = re.search(r"\\{.*\\}", content, re.S)
+def _vision_messages(img: _upload.ImageLike, mode: str) -> List[Dict[str, Any]]:
+    img_b64 = _upload.build(img).data_url  # artefacto compartido (reducido y codificado una vez por request)
+    return [{"role":"system","content":_ai_system_prompt(mode)},{"role":"user","content": _ai_user_payload(img_b64)}]
+
+def _parse_ai_json(content: str) -> Dict[str, Any]:
+    m = _re.search(r"\{.*\}", content, _re.S)
     if not m:
         raise ValueError("AI did not return JSON")
     data = _json.loads(m.group(0))
     data["decision_level"] = str(data.get("decision_level","")).upper().replace(" ", "_")
     return data
 
-def ai_first_full_eval(img_bytes: bytes, mode: str, model: str = None, timeout: int = None) -> _Dict[str,_Any]:
-    mdl = model or _os.getenv("OPENAI_MODEL", _os.getenv("BREED_MODEL","gpt-4o-mini"))
-    tmo = timeout or int(_os.getenv("EVAL_TIMEOUT","14"))
-    return _call_openai_vision(img_bytes, mode, mdl, timeout=tmo)
+async def ai_first_full_eval(img: _upload.ImageLike, mode: str, model: str = None, timeout: int = None) -> Dict[str, Any]:
+    # cliente async compartido del proveedor (OpenAI o Azure OpenAI según providers.get_provider)
+    mdl = model or os.getenv("OPENAI_MODEL", os.getenv("BREED_MODEL","gpt-4o-mini"))
+    tmo = timeout or int(os.getenv("EVAL_TIMEOUT","14"))
+    provider = _providers.get_provider()
+    with _metrics.stage("ai_vision", mode=mode, provider=provider, model=mdl):
+        content = await _providers.chat_completion(_vision_messages(img, mode), mdl, timeout_s=tmo,
+                                                   provider=provider, temperature=0.2)
+    return _parse_ai_json(content)
 # ===================== END AI-FIRST FULL EVALUATION =====================
+
+# ===================== HEURISTIC-FIRST (VEREDICTO INMEDIATO) =====================
+# Veredicto preliminar solo con NumPy (heuristics + pathology + breed), en la misma forma que
+# la respuesta de /api/evaluate para que la UI lo pinte y luego lo reemplace con el de la IA.
+_LEVEL_TEXT = {"NO_COMPRAR":"No comprar","CONSIDERAR_BAJO":"Considerar (bajo)","CONSIDERAR_ALTO":"Considerar alto","COMPRAR":"Comprar"}
+_HEALTH_NAMES = {"lesion_cutanea":"Lesión cutánea","ojo_infectado":"Conjuntivitis","prolapso":"Prolapso","cojera":"Claudicación"}
+_HEALTH_STATUS = {"descartado":"descartado","alerta":"sospecha","confirmada":"presente"}
+
+def heuristic_eval(img, mode: str, vis_ratio: float = None) -> Dict[str, Any]:
+    import heuristics as _heur, pathology as _path, breed as _breed, config as _config
+    from frame import as_frame
+    # tiempos por etapa (ms): corre en el pool de procesos, el proceso del request los registra
+    timings = {}
+    t = time.perf_counter()
+    def lap(name):
+        nonlocal t
+        now = time.perf_counter()
+        timings[name] = round((now - t) * 1000, 2)
+        t = now
+    fr = as_frame(img)
+    fr.image  # pathology y breed usan los píxeles completos; los niveles de 512 px salen de un draft JPEG
+    lap("decode")
+    all_modes, mode_key = _mode_key(mode)
+    first = _heur.run_auction_heuristics(fr)
+    lap("heuristics")
+    vis = 0.5 if vis_ratio is None else vis_ratio  # sin medición: mismo default que apply_heuristic_scoring
+    d = _heur.apply_heuristic_scoring({"mode": mode_key, "raw_image": fr, "qc": {"visible_ratio": vis},
+                                       "all_modes": all_modes}, first)
+    lap("scoring")
+    path = _path.run_pathology_heuristic(fr, mode_key, vis, _checks(all_modes))
+    lap("pathology")
+    br = _breed.run_breed_heuristic(fr, _config.current().raw)
+    lap("breed_heuristic")
+    draft_ms = sum(v for k, v in fr.decode_stats()["decode_ms"].items() if k != "full")
+    if draft_ms:
+        timings["decode_draft"] = round(draft_ms, 2)
+    score10 = round(float(d["total_1to5"]) * 2, 2)  # escala 1–5 → 1–10 como la rubric de la IA
+    out = {
+        "engine": "heuristic",
+        "category": mode,
+        "rubric": [{"name": r["name"], "score": round(float(r["score"]) * 2, 1), "obs": r["obs"]} for r in d["rubric"]],
+        "decision": {"global_score": score10, "weighted_score": score10, "band_score": score10,
+                     "decision_level": d["decision_level"], "decision_text": _LEVEL_TEXT.get(d["decision_level"], d["decision"]),
+                     "rationale": "Veredicto preliminar (heurístico). " + " ".join(d.get("reasons", []))},
+        "health": [{"name": _HEALTH_NAMES.get(h["name"], h["name"]), "status": _HEALTH_STATUS.get(h["severity"], "sospecha")}
+                   for h in path.get("health", [])],
+        "breed": {"name": br.get("label"), "confidence": float(br.get("conf") or 0.0), "explanation": br.get("reason", "")},
+        "diagnostics": {**{k: v for k, v in d["diagnostics"].items() if k != "SI_items"},
+                        "total_1to5": d["total_1to5"], "visible_ratio": vis_ratio},
+        "timings_ms": timings,
+    }
+    if all_modes:
+        # claves como las categorías del formulario ("vaca flaca"); "decision" queda con el modo por defecto
+        out["by_mode"] = {m.replace("_", " "): {"global_score": round(t["total_1to5"] * 2, 2), "total_1to5": t["total_1to5"],
+                                                "decision_level": t["decision_level"],
+                                                "decision_text": _LEVEL_TEXT.get(t["decision_level"], t["decision_label"])}
+                          for m, t in d["by_mode"].items()}
+    return out
+# =================== END HEURISTIC-FIRST ===================
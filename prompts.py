@@ -171,3 +171,11 @@ Devuelve SOLO JSON en español:
   }
 }
 """
+
+import hashlib as _hashlib
+
+def prompt_version(*texts: str) -> str:
+    # huella corta del texto de los prompts: cualquier cambio invalida las entradas cacheadas
+    return _hashlib.sha256("\x00".join(texts).encode("utf-8")).hexdigest()[:12]
+
+PROMPT_VERSION = prompt_version(PROMPT_1, PROMPT_2, PROMPT_3, PROMPT_4, PROMPT_5)
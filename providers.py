@@ -0,0 +1,122 @@
+"""
+GanadoBravo — providers.py
+
+Clientes HTTP compartidos por proveedor de visión (OpenAI / Azure OpenAI). Un cliente por
+proveedor y por proceso, con keep-alive y pool de conexiones: la conexión TLS se abre una
+vez y se reutiliza entre animales. HTTP/2 se activa si el paquete `h2` está instalado.
+chat_completion arma la llamada de chat-completions de cada proveedor (URL, auth, api-version)
+sobre el cliente async; main.py usa el SDK AsyncOpenAI montado sobre el mismo pool.
+
+Variables de entorno:
+- OPENAI_BASE_URL         default https://api.openai.com/v1
+- AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY  si están las dos el proveedor es Azure
+- AZURE_OPENAI_DEPLOYMENT deployment de Azure (default: el modelo pedido)
+- AZURE_OPENAI_API_VERSION  default 2024-06-01
+- HTTP_MAX_CONNECTIONS    conexiones máximas por proveedor (default 20)
+- HTTP_MAX_KEEPALIVE      conexiones ociosas retenidas (default 10)
+- HTTP_KEEPALIVE_S        expiración de conexiones ociosas (default 60)
+- HTTP_CONNECT_TIMEOUT_S  timeout de conexión (default 5); el de lectura va por llamada
+- HTTP2                   "0" para desactivar HTTP/2 aunque `h2` esté disponible
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import os, threading, importlib.util
+import httpx
+
+import metrics
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_S = float(os.getenv("HTTP_KEEPALIVE_S", "60"))
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP2 = os.getenv("HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+_lock = threading.Lock()
+_async: Dict[str, httpx.AsyncClient] = {}
+_sdk: Dict[str, Any] = {}
+_counters: Dict[str, Dict[str, int]] = {}
+
+def get_provider() -> str:
+    if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
+        return "azure"
+    return "openai"
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_S)
+
+def timeout(seconds: float) -> httpx.Timeout:
+    return httpx.Timeout(seconds, connect=min(seconds, HTTP_CONNECT_TIMEOUT_S))
+
+def _count(provider: str, error: bool):
+    # toda respuesta que pasa por los pools (SDK incluido) cuenta en /api/diag y /metrics
+    c = _counters.setdefault(provider, {"requests": 0, "errors": 0})
+    c["requests"] += 1
+    if error:
+        c["errors"] += 1
+
+def async_client(provider: str = "openai") -> httpx.AsyncClient:
+    async def hook(r: httpx.Response):
+        _count(provider, r.status_code >= 400)
+    with _lock:
+        c = _async.get(provider)
+        if c is None or c.is_closed:
+            c = _async[provider] = httpx.AsyncClient(limits=_limits(), http2=HTTP2, timeout=timeout(30),
+                                                     event_hooks={"response": [hook]})
+        return c
+
+def async_openai_sdk():
+    from openai import AsyncOpenAI
+    http = async_client("openai")
+    with _lock:
+        if "async" not in _sdk:
+            _sdk["async"] = AsyncOpenAI(base_url=OPENAI_BASE_URL, http_client=http)
+        return _sdk["async"]
+
+def configured(provider: str = None) -> bool:
+    # hay credenciales para llamar al proveedor (sin ellas, breed_ai cae a la heurística)
+    if (provider or get_provider()) == "azure":
+        return bool(os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"))
+    return os.getenv("OPENAI_API_KEY") is not None
+
+def chat_request(messages: List[Dict[str, Any]], model: Optional[str], provider: Optional[str] = None,
+                 **extra) -> Tuple[str, str, Dict[str, str], Dict[str, Any]]:
+    provider = provider or get_provider()
+    body: Dict[str, Any] = {"messages": messages, **extra}
+    if provider == "azure":
+        dep = os.getenv("AZURE_OPENAI_DEPLOYMENT") or model or "gpt-4o-mini"
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "").rstrip("/")
+        url = f"{endpoint}/openai/deployments/{dep}/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+        headers = {"api-key": os.getenv("AZURE_OPENAI_API_KEY", ""), "Content-Type": "application/json"}
+    else:
+        url = f"{OPENAI_BASE_URL}/chat/completions"
+        headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY','')}", "Content-Type": "application/json"}
+        body["model"] = model or "gpt-4o-mini"
+    return provider, url, headers, body
+
+async def chat_completion(messages: List[Dict[str, Any]], model: Optional[str] = None, timeout_s: float = 14,
+                          provider: Optional[str] = None, **extra) -> str:
+    # contenido del primer choice; HTTPError si el proveedor falla o no responde
+    provider, url, headers, body = chat_request(messages, model, provider, **extra)
+    try:
+        r = await async_client(provider).post(url, headers=headers, json=body, timeout=timeout(timeout_s))
+    except httpx.TransportError:
+        _count(provider, True); raise  # sin respuesta: el hook no la vio
+    r.raise_for_status()
+    return r.json()["choices"][0]["message"]["content"]
+
+def stats() -> Dict[str, Any]:
+    return {"http2": HTTP2, "max_connections": HTTP_MAX_CONNECTIONS, "max_keepalive": HTTP_MAX_KEEPALIVE,
+            "async_clients": sorted(_async), "calls": dict(_counters)}
+
+metrics.Gauge("ganadobravo_provider_calls_total", "Llamadas HTTP al proveedor de IA por resultado",
+              lambda: {(p, k): v for p, c in list(_counters.items()) for k, v in c.items()},
+              ("provider", "result"), kind="counter")
+
+async def aclose():
+    with _lock:
+        clients = list(_async.values())
+        _async.clear(); _sdk.clear()
+    for c in clients:
+        await c.aclose()
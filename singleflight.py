@@ -0,0 +1,37 @@
+"""
+GanadoBravo — singleflight.py
+
+Coalescencia de trabajo en vuelo: si varias peticiones piden lo mismo a la vez (misma foto
+abierta por varios compradores), la primera lanza la tarea y las demás esperan su resultado.
+
+La tarea compartida vive aparte de quien la lanzó: esperar con asyncio.shield hace que la
+cancelación de un cliente (desconexión, watchdog) solo lo retire a él; la tarea sigue para
+los demás y su resultado termina en las caches aunque ya nadie lo espere.
+"""
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = self.followers = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # marcar como recuperada aunque todos los clientes se hayan ido
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            self.leaders += 1
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inflight": len(self._tasks), "leaders": self.leaders, "followers": self.followers}
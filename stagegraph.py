@@ -0,0 +1,66 @@
+"""
+GanadoBravo — stagegraph.py
+
+Planificador mínimo de etapas async con dependencias: cada etapa declara de qué etapas
+toma su entrada y arranca apenas esas terminan, así la latencia total es la del camino
+más largo y no la suma de fases. Registra inicio/fin de cada etapa (ms desde el arranque).
+
+    g = StageGraph()
+    g.value("img", art)                        # entrada ya disponible
+    g.stage("rubric", compute_rubric, "img")   # compute_rubric(art)
+    g.stage("health", compute_health, "img")   # corre en paralelo con rubric
+    g.stage("decision", decide, "rubric")
+    results, timings = await g.run()
+"""
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio, time
+
+class StageGraph:
+    def __init__(self):
+        self._stages: Dict[str, Tuple[Callable[..., Awaitable[Any]], Tuple[str, ...]]] = {}
+        self._values: Dict[str, Any] = {}
+
+    def value(self, name: str, value: Any) -> "StageGraph":
+        self._values[name] = value
+        return self
+
+    def stage(self, name: str, fn: Callable[..., Awaitable[Any]], *after: str) -> "StageGraph":
+        # las dependencias deben existir antes: el orden de declaración es topológico (sin ciclos)
+        for dep in after:
+            if dep not in self._stages and dep not in self._values:
+                raise ValueError(f"etapa '{name}' depende de '{dep}', que no está declarada")
+        if name in self._stages or name in self._values:
+            raise ValueError(f"etapa '{name}' duplicada")
+        self._stages[name] = (fn, after)
+        return self
+
+    async def run(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+        t0 = time.perf_counter()
+        ms = lambda: round((time.perf_counter() - t0) * 1000, 1)
+        tasks: Dict[str, asyncio.Future] = {}
+        timings: Dict[str, Dict[str, float]] = {}
+
+        async def input_of(dep: str):
+            return self._values[dep] if dep in self._values else await tasks[dep]
+
+        async def run_stage(name: str, fn, after):
+            args = [await input_of(dep) for dep in after]
+            start = ms()
+            try:
+                return await fn(*args)
+            finally:
+                end = ms()
+                timings[name] = {"start_ms": start, "end_ms": end, "ms": round(end - start, 1)}
+
+        for name, (fn, after) in self._stages.items():
+            tasks[name] = asyncio.ensure_future(run_stage(name, fn, after))
+        try:
+            outs = await asyncio.gather(*tasks.values())
+        except BaseException:
+            for t in tasks.values():
+                t.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)  # recoger errores de las demás
+            raise
+        results = dict(self._values)
+        results.update(zip(tasks, outs))
+        return results, timings
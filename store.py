@@ -0,0 +1,103 @@
+"""
+GanadoBravo — store.py
+
+Almacén persistente de resultados en SQLite (modo WAL), compartido por todos los workers
+de uvicorn del mismo host y que sobrevive reinicios. Clave = hash de imagen + modo/categoría
++ modelo + versión de prompt; guarda rubric, salud/raza, decisión y evaluaciones completas.
+
+WAL permite lectores concurrentes con un escritor; cada proceso/hilo abre su propia
+conexión y las escrituras esperan el lock (busy_timeout) en vez de fallar.
+
+Variables de entorno:
+- RESULT_STORE_PATH    ruta del archivo (default results.sqlite3 junto al código; "" = desactivado)
+- RESULT_STORE_TTL_S   antigüedad máxima de una entrada (default 30 días; 0 = sin límite)
+"""
+from typing import Any, Dict, Optional
+import os, json, time, sqlite3, threading
+
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.sqlite3"))
+RESULT_STORE_TTL_S = float(os.getenv("RESULT_STORE_TTL_S", str(30*24*3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key      TEXT PRIMARY KEY,
+    kind     TEXT NOT NULL,
+    payload  TEXT NOT NULL,
+    created  REAL NOT NULL
+)
+"""
+
+def make_key(kind: str, img_hash: str, mode: str, model: str, version: str) -> str:
+    return f"{kind}|{img_hash}|{mode or '-'}|{model}|{version}"
+
+class ResultStore:
+    def __init__(self, path: str, ttl_s: float = RESULT_STORE_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._local = threading.local()
+        self.hits = self.misses = self.writes = self.errors = 0
+        self._conn()  # crea archivo/tabla y activa WAL al arrancar
+
+    def _conn(self) -> sqlite3.Connection:
+        # una conexión por hilo y por proceso (las conexiones no cruzan fork)
+        c = getattr(self._local, "conn", None)
+        if c is None or getattr(self._local, "pid", None) != os.getpid():
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            c = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            c.execute("PRAGMA busy_timeout=5000")
+            c.execute(_SCHEMA)
+            self._local.conn, self._local.pid = c, os.getpid()
+        return c
+
+    def get(self, kind: str, img_hash: str, mode: str, model: str, version: str) -> Optional[Any]:
+        try:
+            row = self._conn().execute("SELECT payload, created FROM results WHERE key = ?",
+                                       (make_key(kind, img_hash, mode, model, version),)).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return None
+        if row is None or (self.ttl_s > 0 and row[1] < time.time() - self.ttl_s):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, kind: str, img_hash: str, mode: str, model: str, version: str, payload: Any):
+        try:
+            self._conn().execute("INSERT OR REPLACE INTO results (key, kind, payload, created) VALUES (?, ?, ?, ?)",
+                                 (make_key(kind, img_hash, mode, model, version), kind,
+                                  json.dumps(payload, ensure_ascii=False, default=str), time.time()))
+            self.writes += 1
+        except sqlite3.Error:
+            self.errors += 1
+
+    def purge_expired(self) -> int:
+        if self.ttl_s <= 0:
+            return 0
+        try:
+            return self._conn().execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_s,)).rowcount
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            n = self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except sqlite3.Error:
+            n = None
+        return {"path": self.path, "entries": n, "ttl_s": self.ttl_s, "hits": self.hits, "misses": self.misses,
+                "writes": self.writes, "errors": self.errors}
+
+def open_store() -> Optional[ResultStore]:
+    if not RESULT_STORE_PATH:
+        return None
+    try:
+        return ResultStore(RESULT_STORE_PATH)
+    except (sqlite3.Error, OSError):
+        return None  # sin disco escribible: se sigue solo con las caches en memoria
+
+STORE = open_store()
@@ -0,0 +1,66 @@
+"""
+GanadoBravo — synthetic.py
+
+Bovinos sintéticos deterministas (silueta con cabeza/giba/patas/papada, lesiones rojas, ruido y
+desenfoque leve) y fotos de corral con varios animales. Módulo de runtime: warmup.py calienta
+cada worker con synthetic_cow, y bench.py y loadgen.py generan con esto sus imágenes de prueba.
+Solo depende de NumPy y PIL.
+"""
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+def synthetic_cow(w: int, h: int, seed: int = 0, lesions: int = 2) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    bg = tuple(int(x) for x in rng.integers(70, 190, 3))
+    im = Image.new("RGB", (w, h), bg)
+    d = ImageDraw.Draw(im)
+    # pasto/cielo: franja inferior más oscura
+    d.rectangle([0, int(h*0.8), w, h], fill=tuple(max(0, c-40) for c in bg))
+    _draw_cow(d, rng, 0, 0, w, h, lesions)
+    arr = np.asarray(im).astype(np.int16)
+    arr += rng.normal(0, 8, (h, w, 1)).astype(np.int16)
+    return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(0.8))
+
+def _draw_cow(d: ImageDraw.ImageDraw, rng, ox: float, oy: float, w: int, h: int, lesions: int, col=None):
+    # animal de perfil dentro del rectángulo (ox, oy, w, h); devuelve su bbox aproximado
+    col = col or tuple(int(x) for x in rng.integers(20, 240, 3))
+    bx0, by0 = ox+w*rng.uniform(0.15, 0.25), oy+h*rng.uniform(0.25, 0.35)
+    bx1, by1 = ox+w*rng.uniform(0.72, 0.85), oy+h*rng.uniform(0.6, 0.7)
+    d.ellipse([bx0, by0, bx1, by1], fill=col)                                       # cuerpo
+    d.ellipse([bx0-w*0.12, by0-h*0.08, bx0+w*0.06, by0+h*0.16], fill=col)           # cabeza
+    d.polygon([(bx0+w*0.02, by0+h*0.02), (bx0+w*0.08, by0-h*0.06), (bx0+w*0.14, by0+h*0.02)], fill=col)  # giba
+    d.ellipse([bx0-w*0.14, by0+h*0.0, bx0-w*0.08, by0+h*0.12], fill=col)            # oreja caída
+    d.polygon([(bx0-w*0.02, by0+h*0.12), (bx0+w*0.06, by0+h*0.12), (bx0+w*0.02, by0+h*0.3)], fill=col)  # papada
+    for lx in np.linspace(bx0+w*0.04, bx1-w*0.07, 4):                               # patas
+        d.rectangle([lx, (by0+by1)/2, lx+w*0.03, oy+h*0.93], fill=col)
+    d.line([(bx1, by0+h*0.05), (bx1+w*0.04, by1)], fill=col, width=max(2, w//200))   # cola
+    for _ in range(lesions):
+        cx, cy = rng.uniform(bx0+w*0.05, bx1-w*0.05), rng.uniform(by0+h*0.05, by1-h*0.05)
+        r = w*rng.uniform(0.01, 0.03)
+        d.ellipse([cx-r, cy-r*0.8, cx+r, cy+r*0.8], fill=(200, 35, 40))
+    return (int(bx0-w*0.14), int(by0-h*0.08), int(bx1+w*0.04), int(oy+h*0.93))
+
+def synthetic_pen(w: int, h: int, n: int, seed: int = 0) -> Tuple[Image.Image, List[Tuple[int, int, int, int]]]:
+    # foto de corral: n animales de tamaños distintos sobre tierra/pasto; devuelve (imagen, bboxes reales)
+    rng = np.random.default_rng(seed)
+    ground = np.array([int(x) for x in rng.integers(90, 170, 3)])
+    im = Image.new("RGB", (w, h), tuple(int(c) for c in ground + 30))
+    d = ImageDraw.Draw(im)
+    d.rectangle([0, int(h*0.25), w, h], fill=tuple(int(c) for c in ground))                        # tierra
+    d.rectangle([0, int(h*0.25), w, int(h*0.3)], fill=tuple(int(max(0, c-25)) for c in ground))    # cerca
+    cols = max(1, int(np.ceil(np.sqrt(n * w / h))))
+    rows = max(1, int(np.ceil(n / cols)))
+    cw, ch = w / cols, (h * 0.7) / rows
+    boxes = []
+    for i in range(n):
+        r, c = divmod(i, cols)
+        s = rng.uniform(0.75, 0.95)
+        ox = c*cw + rng.uniform(0, (1-s)*cw)
+        oy = h*0.3 + r*ch + rng.uniform(0, (1-s)*ch)
+        col = tuple(int(x) for x in np.clip(ground + rng.choice([-1, 1], 3) * rng.integers(50, 90, 3), 10, 245))
+        boxes.append(_draw_cow(d, rng, ox, oy, int(cw*s), int(ch*s), lesions=int(rng.integers(0, 2)), col=col))
+    arr = np.asarray(im).astype(np.int16)
+    arr += rng.normal(0, 8, (h, w, 1)).astype(np.int16)
+    return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(0.8)), boxes
@@ -0,0 +1,4 @@
+# los módulos del proyecto viven en la raíz del repo (sin paquete)
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
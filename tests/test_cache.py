@@ -0,0 +1,92 @@
+"""
+cache.LRUCache: evicción LRU por cantidad de entradas y por presupuesto de bytes (un get
+refresca la entrada), TTL, valores más grandes que el presupuesto y los contadores de stats().
+"""
+import types
+
+import pytest
+
+import cache
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # las caches de prueba no quedan en el registro global que publica /cache/stats
+    reg = {}
+    monkeypatch.setattr(cache, "REGISTRY", reg)
+    return reg
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def unit(_):
+    return 10  # cada valor ocupa 10 bytes (+ len(str(key)))
+
+def test_evicts_least_recently_used_by_entries():
+    c = cache.LRUCache("t", max_entries=3, ttl_s=0)
+    for k in "abc":
+        c.set(k, k.upper())
+    assert c.get("a") == "A"  # "a" pasa a ser la más reciente
+    c.set("d", "D")
+    assert "b" not in c._data and list(c._data) == ["c", "a", "d"]
+    c.set("e", "E")
+    assert list(c._data) == ["a", "d", "e"]
+    assert c.get("b") is None and c.get("c", "x") == "x"
+    s = c.stats()
+    assert (s["entries"], s["evictions"], s["hits"], s["misses"]) == (3, 2, 1, 2)
+
+def test_evicts_by_byte_budget():
+    c = cache.LRUCache("t", max_bytes=33, max_entries=100, ttl_s=0, sizeof=unit)
+    c.set("a", 1); c.set("b", 2); c.set("c", 3)  # 11 bytes cada una
+    assert c.stats()["bytes"] == 33 and len(c) == 3
+    c.get("a")
+    c.set("dd", 4)  # 12 bytes: 45 > 33, se van "b" y después "c" (las menos recientes) hasta entrar
+    assert list(c._data) == ["a", "dd"]
+    assert c.stats()["bytes"] == 23 and c.stats()["evictions"] == 2
+
+def test_oversized_value_is_not_stored_and_evicts_nothing():
+    c = cache.LRUCache("t", max_bytes=30, ttl_s=0, sizeof=lambda v: len(v))
+    c.set("a", "x" * 10)
+    c.set("big", "x" * 40)
+    assert c.get("big") is None and c.get("a") == "x" * 10
+    assert c.stats()["evictions"] == 0 and c.stats()["bytes"] == 11
+
+def test_replacing_a_key_updates_bytes():
+    c = cache.LRUCache("t", max_bytes=1000, ttl_s=0, sizeof=lambda v: len(v))
+    c.set("k", "x" * 100)
+    c.set("k", "x" * 10)
+    assert len(c) == 1 and c.stats()["bytes"] == 11 and c.get("k") == "x" * 10
+
+def test_ttl_expiration(clock):
+    c = cache.LRUCache("t", ttl_s=60)
+    c.set("k", {"v": 1})
+    clock[0] += 59.9
+    assert c.get("k") == {"v": 1}
+    clock[0] += 0.2
+    assert c.get("k") is None
+    s = c.stats()
+    assert (s["entries"], s["bytes"], s["expirations"], s["hits"], s["misses"]) == (0, 0, 1, 1, 1)
+
+def test_ttl_zero_never_expires(clock):
+    c = cache.LRUCache("t", ttl_s=0)
+    c.set("k", 1)
+    clock[0] += 10**9
+    assert c.get("k") == 1 and c.stats()["expirations"] == 0
+
+def test_stats_and_registry(registry):
+    c = cache.LRUCache("rubric_t", max_bytes=2048, ttl_s=5, max_entries=7)
+    assert c.stats()["hit_ratio"] is None
+    c.set("a", [1, 2, 3])
+    c.get("a"); c.get("a"); c.get("b")
+    s = c.stats()
+    assert s == {"entries": 1, "bytes": cache.approx_size([1, 2, 3]) + 1, "max_bytes": 2048, "max_entries": 7,
+                 "ttl_s": 5.0, "hits": 2, "misses": 1, "hit_ratio": 0.667, "evictions": 0, "expirations": 0}
+    assert registry == {"rubric_t": c} and cache.stats() == {"rubric_t": s}
+    c.clear()
+    assert len(c) == 0 and c.stats()["bytes"] == 0 and c.stats()["hits"] == 2  # clear no borra contadores
+
+def test_approx_size():
+    assert cache.approx_size({"a": "ñ"}) == len('{"a": "ñ"}'.encode("utf-8"))
+    assert cache.approx_size(object()) > 0
@@ -0,0 +1,170 @@
+"""
+config.py: validación de config.json, recarga en caliente por mtime (y qué pasa con archivos
+rotos o ausentes) y pesos compilados que dan bit a bit los mismos totales que la suma
+secuencial original de heuristics._weighted_total_1to5.
+"""
+import json, os, time
+
+import numpy as np
+import pytest
+
+import config
+
+def _baseline_total(rubric, w):
+    # heuristics._weighted_total_1to5 antes de config.py (sin ajuste de raza ni topes)
+    total_w = sum(w.get(r["key"], 0.0) for r in rubric)
+    if total_w <= 0: total_w = 1.0
+    return sum(r["score"] * (w.get(r["key"], 0.0)/total_w) for r in rubric)
+
+def _baseline_level(t, no_max=2.9, c_low=3.2, c_hi=3.7):
+    if t < no_max:
+        return 0
+    elif t <= c_low:
+        return 1
+    elif t <= c_hi:
+        return 2
+    return 3
+
+def _rubrics(n, seed, keep=1.0):
+    # scores de una décima en 1–5, en el orden de RUBRIC_KEYS (como los arma heuristics)
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        out = [{"key": k, "score": float(round(rng.uniform(1, 5), 1))} for k in config.RUBRIC_KEYS if rng.random() < keep]
+        yield out or [{"key": "bcs", "score": 3.0}]
+
+WEIGHT_SETS = [
+    ("default", config.DEFAULT_WEIGHTS_BY_MODE),
+    ("repo", json.load(open(os.path.join(os.path.dirname(config.__file__), "config.json"), encoding="utf-8"))
+              .get("weights_by_mode", config.DEFAULT_WEIGHTS_BY_MODE)),
+    # pesos que no suman 1 y con métricas omitidas: la normalización tiene que coincidir igual
+    ("sin_normalizar", {"levante": {"bcs": 3, "aplomos": 1.7, "linea_dorsal": 0.3},
+                        "engorde": {k: 0.1 * (i + 1) for i, k in enumerate(config.RUBRIC_KEYS)}}),
+]
+
+@pytest.mark.parametrize("name,wbm", WEIGHT_SETS, ids=[n for n, _ in WEIGHT_SETS])
+def test_weighted_totals_match_sequential_sum(name, wbm):
+    cfg = config.Compiled({"weights_by_mode": wbm}, "test")
+    for keep in (1.0, 0.6):
+        for rubric in _rubrics(500, seed=len(name) + int(keep * 10), keep=keep):
+            totals = cfg.weighted_totals(rubric)
+            for i, mode in enumerate(cfg.modes):
+                ref = _baseline_total(rubric, wbm[mode])
+                # igualdad exacta: un total en x.xx5 no puede cambiar de centésima al redondear
+                assert cfg.weighted_total(rubric, mode) == ref
+                assert float(totals[i]) == ref
+                assert float(cfg.weighted_totals(rubric, [mode])[0]) == ref
+
+def test_unknown_mode_uses_default():
+    cfg = config.Compiled({}, "defaults")
+    rubric = next(_rubrics(1, seed=3))
+    assert cfg.weighted_total(rubric, "lecheria") == _baseline_total(rubric, config.DEFAULT_WEIGHTS_BY_MODE["levante"])
+    assert cfg.mode_weights("lecheria") is cfg.weights_by_mode["levante"]
+
+@pytest.mark.parametrize("t", [1.0, 2.89, 2.9, 2.91, 3.2, 3.21, 3.7, 3.71, 5.0])
+def test_level_matches_sublevels(t):
+    assert config.Compiled({}, "defaults").level(t) == _baseline_level(t)
+    custom = config.Compiled({"decision_sublevels": {"no_comprar_max": 3.0, "considerar_bajo_max": 3.3,
+                                                     "considerar_alto_max": 3.9}}, "custom")
+    assert custom.level(t) == _baseline_level(t, 3.0, 3.3, 3.9)
+
+def test_compiled_values():
+    cfg = config.Compiled({"visibility_caps": {"lt_0_35": "3.2"}, "pathology": {"alert_threshold": 0.7,
+                           "shape": {"min_area_ratio": 0.001}, "checklist": {"levante": ["cojera"]}}}, "v")
+    assert (cfg.cap35, cfg.cap55) == (3.2, 3.9)
+    assert (cfg.alert_threshold, cfg.confirm_threshold, cfg.min_area_ratio, cfg.max_area_ratio) == (0.7, 0.9, 0.001, 0.08)
+    assert cfg.checklist == {"levante": ["cojera"]}
+    assert np.allclose(cfg.weights.sum(axis=1), 1.0)
+
+INVALID = [
+    ("no_objeto", [1, 2]),
+    ("modos_vacios", {"weights_by_mode": {}}),
+    ("modos_no_objeto", {"weights_by_mode": ["levante"]}),
+    ("sin_levante", {"weights_by_mode": {"engorde": {"bcs": 1}}}),
+    ("modo_no_objeto", {"weights_by_mode": {"levante": [0.5, 0.5]}}),
+    ("metrica_desconocida", {"weights_by_mode": {"levante": {"bcs": 0.5, "ubre": 0.5}}}),
+    ("peso_no_numerico", {"weights_by_mode": {"levante": {"bcs": "mucho"}}}),
+    ("peso_negativo", {"weights_by_mode": {"levante": {"bcs": 1.2, "aplomos": -0.2}}}),
+    ("subniveles_decrecientes", {"decision_sublevels": {"no_comprar_max": 3.3, "considerar_bajo_max": 3.2}}),
+    ("subnivel_no_numerico", {"decision_sublevels": {"considerar_alto_max": None}}),
+    ("tope_no_numerico", {"visibility_caps": {"lt_0_55": "alto"}}),
+    ("umbral_no_numerico", {"pathology": {"confirm_threshold": [0.9]}}),
+    ("forma_no_numerica", {"pathology": {"shape": {"max_area_ratio": {}}}}),
+]
+
+@pytest.mark.parametrize("name,raw", INVALID, ids=[n for n, _ in INVALID])
+def test_validation_errors(name, raw):
+    with pytest.raises(config.ConfigError):
+        config.Compiled(raw, "bad")
+
+# ---- recarga en caliente ----
+
+@pytest.fixture
+def cfgfile(tmp_path, monkeypatch):
+    # config.py aislado: archivo propio, estado de módulo nuevo y chequeo de mtime en cada llamada
+    path = tmp_path / "config.json"
+    monkeypatch.setattr(config, "CONFIG_PATH", str(path))
+    monkeypatch.setattr(config, "CONFIG_RELOAD_S", 1e-6)
+    monkeypatch.setattr(config, "_current", None)
+    monkeypatch.setattr(config, "_state", {"mtime": None, "checked": 0.0, "loaded_at": None, "reloads": 0,
+                                           "errors": 0, "last_error": None})
+    tick = [time.time_ns() - 10**9]
+
+    def write(text, bump=True):
+        path.write_text(text if isinstance(text, str) else json.dumps(text), encoding="utf-8")
+        if bump:
+            tick[0] += 10**7  # mtime distinto aunque el sistema de archivos tenga resolución gruesa
+        os.utime(path, ns=(tick[0], tick[0]))
+        time.sleep(0.001)
+    return write
+
+def _cut(c):
+    return c.cutoffs[0]
+
+def test_reload_on_mtime_change(cfgfile):
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.5}})
+    first = config.current()
+    assert _cut(first) == 2.5 and config.current() is first  # sin cambios: misma instancia
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.6}})
+    second = config.current()
+    assert _cut(second) == 2.6 and second.version != first.version
+    assert config.stats()["reloads"] == 1 and config.stats()["last_error"] is None
+
+def test_same_mtime_is_not_reloaded(cfgfile):
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.5}})
+    first = config.current()
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.8}}, bump=False)
+    assert config.current() is first
+
+def test_reload_waits_for_interval(cfgfile, monkeypatch):
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.5}})
+    first = config.current()
+    monkeypatch.setattr(config, "CONFIG_RELOAD_S", 3600)
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.6}})
+    assert config.current() is first
+    assert _cut(config.reload()) == 2.6  # reload() no espera el intervalo
+
+@pytest.mark.parametrize("broken", ["{ no es json", json.dumps({"weights_by_mode": {"engorde": {"bcs": 1}}})],
+                         ids=["json_invalido", "no_valida"])
+def test_broken_reload_keeps_previous(cfgfile, broken):
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.5}})
+    good = config.current()
+    cfgfile(broken)
+    assert config.current() is good
+    st = config.stats()
+    assert st["errors"] == 1 and st["last_error"] and st["reloads"] == 0
+    assert config.current() is good and config.stats()["errors"] == 1  # el mismo archivo roto no se reintenta
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.7}})
+    assert _cut(config.current()) == 2.7 and config.stats()["last_error"] is None
+
+def test_missing_file_keeps_current(cfgfile, tmp_path):
+    cfgfile({"decision_sublevels": {"no_comprar_max": 2.5}})
+    good = config.current()
+    os.remove(tmp_path / "config.json")
+    assert config.current() is good
+
+def test_startup_with_broken_or_missing_file(cfgfile, tmp_path):
+    assert config.current().version == "defaults" and _cut(config.current()) == 2.9  # sin archivo
+    config._current = None
+    cfgfile("[]")
+    c = config.current()
+    assert c.version == "defaults" and config.stats()["errors"] == 1
@@ -0,0 +1,181 @@
+"""
+decision.py contra la aritmética de PROMPT_3: tablas de pesos y offsets iguales a las del
+prompt, cortes exactos en 6.2/7.2/8.2, ajustes de ±1 nivel en sus umbrales y métricas
+faltantes o extra. Los casos de la tabla están calculados a mano; además una referencia en
+Decimal (aritmética decimal exacta, como la leería el prompt) se compara con rubrics al azar.
+"""
+from decimal import Decimal
+import json, re
+
+import numpy as np
+import pytest
+
+import decision
+import prompts
+
+VF, LEV, ENG = "vaca flaca", "levante", "engorde"
+BCS, APL, BAL, DOR, GRP, PEC, ANC = ("Condición corporal (BCS)", "Aplomos (patas)", "Balance anterior-posterior",
+                                     "Línea dorsal", "Grupo / muscling posterior", "Profundidad de pecho",
+                                     "Ancho torácico")
+NO, BAJO, ALTO, COMPRAR = decision.LEVELS
+
+def rub(default=None, **over):
+    # rubric con las 11 métricas en `default` (None = ausente) y algunas sobrescritas por nombre
+    names = {"bcs": BCS, "apl": APL, "bal": BAL, "dor": DOR, "grp": GRP, "pec": PEC, "anc": ANC}
+    scores = {m: default for m in decision.METRICS}
+    for k, v in over.items():
+        scores[names[k]] = v
+    return [{"name": m, "score": s} for m, s in scores.items() if s is not None]
+
+def _prompt_tables():
+    # pesos y offsets tal como están escritos en PROMPT_3
+    text = prompts.PROMPT_3
+    weights = {}
+    for cat, label in ((VF, "VACA FLACA"), (LEV, "LEVANTE"), (ENG, "ENGORDE")):
+        block = re.search(label + r"[^{]*(\{.*?\})", text, re.S).group(1)
+        weights[cat] = json.loads(block)
+    offsets = {c: float(v) for c, v in re.findall(r'"([a-z ]+)":\s+offset = ([+-]?\d+\.\d+)', text)}
+    return weights, offsets
+
+def test_tables_match_prompt():
+    weights, offsets = _prompt_tables()
+    assert weights == decision.WEIGHTS
+    assert offsets == decision.OFFSETS
+    for c, w in weights.items():
+        assert sum(Decimal(str(x)) for x in w.values()) == 1
+        assert set(w) == set(decision.METRICS)
+
+# (categoría, rubric, weighted, band, nivel base, nivel final)
+TABLE = [
+    # cortes de banda exactos; rubric uniforme → weighted = score
+    ("vf_6.2", VF, rub(5.4), 5.4, 6.2, BAJO, BAJO),
+    ("vf_6.19", VF, rub(5.39), 5.39, 6.19, NO, NO),
+    ("vf_7.2", VF, rub(6.4), 6.4, 7.2, ALTO, ALTO),
+    ("vf_7.19", VF, rub(6.39), 6.39, 7.19, BAJO, BAJO),
+    ("vf_8.2", VF, rub(7.4), 7.4, 8.2, COMPRAR, COMPRAR),
+    ("vf_8.19", VF, rub(7.39), 7.39, 8.19, ALTO, ALTO),
+    ("lev_6.2", LEV, rub(5.8), 5.8, 6.2, BAJO, BAJO),
+    ("lev_6.19", LEV, rub(5.79), 5.79, 6.19, NO, NO),
+    ("lev_7.2", LEV, rub(6.8), 6.8, 7.2, ALTO, ALTO),
+    ("lev_7.19", LEV, rub(6.79), 6.79, 7.19, BAJO, BAJO),
+    ("lev_8.2", LEV, rub(7.8), 7.8, 8.2, COMPRAR, COMPRAR),
+    ("lev_8.19", LEV, rub(7.79), 7.79, 8.19, ALTO, ALTO),
+    ("eng_6.2", ENG, rub(6.5), 6.5, 6.2, BAJO, BAJO),
+    ("eng_6.19", ENG, rub(6.49), 6.49, 6.19, NO, NO),
+    # sin BCS la regla de engorde no se aplica: el corte queda a la vista
+    ("eng_7.2_sin_bcs", ENG, rub(7.5, bcs=None), 7.5, 7.2, ALTO, ALTO),
+    ("eng_7.19_sin_bcs", ENG, rub(7.49, bcs=None), 7.49, 7.19, BAJO, BAJO),
+    ("eng_8.2_sin_bcs", ENG, rub(8.5, bcs=None), 8.5, 8.2, COMPRAR, COMPRAR),
+    ("eng_8.19_sin_bcs", ENG, rub(8.49, bcs=None), 8.49, 8.19, ALTO, ALTO),
+    # vaca flaca: estructura ≥ 6.8 y BCS ≤ 5.5 → +1
+    ("vf_sube", VF, rub(5.0, apl=7.0, bal=7.0, dor=7.0), 5.88, 6.68, BAJO, ALTO),
+    ("vf_sube_umbrales", VF, rub(5.5, apl=6.8, bal=6.8, dor=6.8), 6.072, 6.872, BAJO, ALTO),
+    ("vf_estructura_6.79", VF, rub(5.5, apl=6.79, bal=6.79, dor=6.79), 6.0676, 6.8676, BAJO, BAJO),
+    ("vf_bcs_5.6", VF, rub(5.6, apl=7.0, bal=7.0, dor=7.0), 6.216, 7.016, BAJO, BAJO),
+    ("vf_estructura_mixta", VF, rub(5.0, apl=7.4, bal=6.2, dor=6.8), 5.816, 6.616, BAJO, ALTO),
+    ("vf_tope_comprar", VF, rub(9.0, bcs=5.0), 8.92, 9.72, COMPRAR, COMPRAR),
+    # levante: estructura ≥ 7.0 y BCS ≥ 6.0 → al menos CONSIDERAR_ALTO (no sube COMPRAR ni pasa de ALTO)
+    ("lev_asegura_alto", LEV, rub(5.0, apl=7.0, bal=7.0, dor=7.0, grp=7.0, bcs=6.0), 6.06, 6.46, BAJO, ALTO),
+    ("lev_desde_no", LEV, rub(3.0, apl=7.0, bal=7.0, dor=7.0, grp=7.0, bcs=6.0), 5.18, 5.58, NO, ALTO),
+    ("lev_promedio_float", LEV, rub(5.0, apl=6.6, bal=6.8, dor=7.4, grp=7.2, bcs=6.0), 6.036, 6.436, BAJO, ALTO),
+    ("lev_bcs_5.9", LEV, rub(5.0, apl=7.0, bal=7.0, dor=7.0, grp=7.0, bcs=5.9), 6.054, 6.454, BAJO, BAJO),
+    ("lev_estructura_6.98", LEV, rub(5.0, apl=6.98, bal=6.98, dor=6.98, grp=6.98, bcs=6.0), 6.05, 6.45, BAJO, BAJO),
+    # engorde: masa ≥ 7.2 y BCS ≥ 6.5 → +1; BCS < 5.5 → −1 (los *_promedio_float dan 7.1999… sin redondear)
+    ("eng_sube_umbrales", ENG, rub(6.5, grp=7.2, pec=7.2, anc=7.2), 6.808, 6.508, BAJO, ALTO),
+    ("eng_masa_7.19", ENG, rub(6.5, grp=7.19, pec=7.19, anc=7.19), 6.8036, 6.5036, BAJO, BAJO),
+    ("eng_promedio_float", ENG, rub(6.5, grp=7.6, pec=6.8, anc=7.2), 6.824, 6.524, BAJO, ALTO),
+    ("eng_baja", ENG, rub(8.0, bcs=5.4), 7.74, 7.44, ALTO, BAJO),
+    ("eng_bcs_5.5", ENG, rub(8.0, bcs=5.5), 7.75, 7.45, ALTO, ALTO),
+    ("eng_tope_no", ENG, rub(3.0), 3.0, 2.7, NO, NO),
+    ("eng_tope_comprar", ENG, rub(9.0), 9.0, 8.7, COMPRAR, COMPRAR),
+    # métricas faltantes: el ponderado se renormaliza sobre las presentes
+    ("lev_solo_dos", LEV, rub(None, apl=8.0, bcs=5.0), 7.1818, 7.5818, ALTO, ALTO),
+    ("vf_sin_estructura", VF, rub(5.0, apl=None, bal=None, dor=None), 5.0, 5.8, NO, NO),
+]
+
+@pytest.mark.parametrize("cat,rubric,weighted,band,base,level", [t[1:] for t in TABLE], ids=[t[0] for t in TABLE])
+def test_prompt3_table(cat, rubric, weighted, band, base, level):
+    ci = decision.category_index(cat)
+    v, _ = decision.rubric_vector(rubric)
+    r = decision.score_matrix(v[None, :])
+    assert r["weighted"][0, ci] == pytest.approx(weighted, abs=5e-5)
+    assert r["band"][0, ci] == pytest.approx(band, abs=5e-5)
+    assert decision.LEVELS[int(r["base_level"][0, ci])] == base
+    d = decision.decide(rubric, cat)
+    assert d["decision_level"] == level
+    assert d["decision_text"] == decision.TEXTS[decision.LEVELS.index(level)]
+    assert d["weighted_score"] == pytest.approx(round(weighted, 2))
+    assert d["band_score"] == pytest.approx(round(band, 2))
+
+def test_global_score_includes_extras():
+    # las métricas extra cuentan en el promedio simple, no en el ponderado
+    d = decision.decide(rub(6.0) + [{"name": "Temperamento", "score": 9.0}], LEV)
+    assert d["global_score"] == 6.25 and d["weighted_score"] == 6.0
+
+def test_names_are_normalized_and_bad_scores_skipped():
+    rubric = [{"name": "LINEA_DORSAL", "score": "8"}, {"name": "aplomos (patas)", "score": 6},
+              {"name": "Lomo", "score": None}, {"name": "Lomo", "score": "n/a"}]
+    d = decision.decide(rubric, "Vaca_Flaca")
+    assert d["global_score"] == 7.0
+    assert d["weighted_score"] == pytest.approx((0.12*8 + 0.18*6) / 0.30, abs=0.005)
+
+def test_no_known_metrics_falls_back_to_global():
+    d = decision.decide([{"name": "Temperamento", "score": 7.5}], VF)
+    assert (d["weighted_score"], d["band_score"], d["decision_level"]) == (7.5, 8.3, COMPRAR)
+    d = decision.decide([], ENG)
+    assert (d["global_score"], d["weighted_score"], d["decision_level"]) == (0.0, 0.0, NO)
+
+def test_unknown_category():
+    with pytest.raises(ValueError):
+        decision.decide(rub(7.0), "lechería")
+
+# ---- referencia decimal de PROMPT_3 ----
+
+def _avg(xs):
+    xs = [x for x in xs if x is not None]
+    return sum(xs) / len(xs) if xs else None
+
+def _reference(rubric, cat):
+    w = {m: Decimal(str(x)) for m, x in decision.WEIGHTS[cat].items()}
+    s = {r["name"]: Decimal(str(r["score"])) for r in rubric}
+    glob = sum(s.values()) / len(s)
+    wsum = sum(w[m] for m in s)
+    weighted = sum(w[m] * s[m] for m in s) / wsum if wsum else glob
+    band = weighted + Decimal(str(decision.OFFSETS[cat]))
+    level = sum(band >= Decimal(e) for e in ("6.2", "7.2", "8.2"))
+    bcs = s.get(BCS)
+    if bcs is not None:
+        if cat == VF:
+            a = _avg([s.get(APL), s.get(BAL), s.get(DOR)])
+            level += a is not None and a >= Decimal("6.8") and bcs <= Decimal("5.5")
+        elif cat == LEV:
+            a = _avg([s.get(APL), s.get(BAL), s.get(DOR), s.get(GRP)])
+            if a is not None and a >= 7 and bcs >= 6:
+                level = max(level, 2)
+        else:
+            a = _avg([s.get(GRP), s.get(PEC), s.get(ANC)])
+            level += (a is not None and a >= Decimal("7.2") and bcs >= Decimal("6.5")) - (bcs < Decimal("5.5"))
+    return glob, weighted, band, decision.LEVELS[min(max(level, 0), 3)]
+
+def _random_rubrics(n, seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        # scores de una décima cerca de los umbrales; ~20 % de métricas ausentes
+        base = rng.choice([5.4, 5.5, 5.8, 6.0, 6.5, 6.8, 7.0, 7.2, 7.5])
+        out = [{"name": m, "score": float(round(base + rng.integers(-4, 5) / 10, 1))}
+               for m in decision.METRICS if rng.random() > 0.2]
+        yield out or [{"name": BCS, "score": 6.0}]
+
+@pytest.mark.parametrize("cat", decision.CATEGORIES)
+def test_matches_decimal_reference(cat):
+    for rubric in _random_rubrics(400, seed=decision.CATEGORIES.index(cat)):
+        glob, weighted, band, level = _reference(rubric, cat)
+        d = decision.decide(rubric, cat)
+        assert d["decision_level"] == level, (rubric, float(band))
+        assert abs(d["weighted_score"] - float(weighted)) <= 0.005 + 1e-9
+        assert abs(d["band_score"] - float(band)) <= 0.005 + 1e-9
+        assert abs(d["global_score"] - float(glob)) <= 0.005 + 1e-9
+
+def test_decide_all_matches_decide():
+    for rubric in _random_rubrics(50, seed=99):
+        assert decision.decide_all(rubric) == {c: decision.decide(rubric, c) for c in decision.CATEGORIES}
@@ -0,0 +1,46 @@
+"""
+Frame bajo concurrencia: varios hilos piden a la vez la imagen completa y los niveles
+reducidos (escalas DCT distintas, cada una con su lock) mientras otro lee decode_stats();
+cada decodificación ocurre una sola vez y todos sus tiempos quedan registrados.
+"""
+import threading
+
+import bench
+from frame import Frame
+
+DATA = bench._jpeg(bench.synthetic_cow(1600, 1200, seed=5))
+REQUESTS = {"full": lambda fr: fr.image, "1/2": lambda fr: fr.level(800), "1/4": lambda fr: fr.level(400),
+            "1/8": lambda fr: fr.level(200)}
+
+def test_concurrent_decodes_record_every_timing():
+    for _ in range(5):
+        fr = Frame.from_bytes(DATA)
+        jobs = [fn for fn in REQUESTS.values() for _ in range(3)]
+        start = threading.Barrier(len(jobs) + 1)
+        done, errors, results = threading.Event(), [], []
+
+        def worker(fn):
+            start.wait()
+            results.append(fn(fr))
+
+        def reader():
+            start.wait()
+            while not done.is_set():
+                try:
+                    fr.decode_stats()
+                except Exception as e:  # p. ej. "dictionary changed size during iteration"
+                    errors.append(e)
+                    return
+
+        threads = [threading.Thread(target=worker, args=(fn,)) for fn in jobs]
+        stats = threading.Thread(target=reader)
+        for t in threads + [stats]:
+            t.start()
+        for t in threads:
+            t.join()
+        done.set()
+        stats.join()
+        assert errors == []
+        assert set(fr.decode_stats()["decode_ms"]) == set(REQUESTS)
+        # memo: cada nivel se construyó una vez y todos los hilos recibieron el mismo objeto
+        assert len({id(r) for r in results}) == len(REQUESTS)
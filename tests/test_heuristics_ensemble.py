@@ -0,0 +1,39 @@
+"""
+2ª pasada de heuristics.py: el ensamble por lotes (batched=True) construye las mismas variantes
+que el serial (batched=False) y solo agrupa las estadísticas por pila, así que la salida tiene
+que ser idéntica: rubric, raza, SI_items y SI_global, variante por variante.
+"""
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import bench
+import heuristics
+from frame import Frame
+
+SIZES = [(640, 480), (800, 600), (1024, 768), (480, 640), (1600, 1200), (333, 517)]
+
+def _cow(seed: int) -> bytes:
+    w, h = SIZES[seed % len(SIZES)]
+    return bench._jpeg(bench.synthetic_cow(w, h, seed=seed, lesions=seed % 3))
+
+def _blobs(seed: int) -> bytes:
+    # manchas suaves sin animal: ahí una reducción distinta movía umbrales (BCS, costillas)
+    w, h = SIZES[seed % len(SIZES)]
+    sm = np.random.default_rng(seed).random((h // 16, w // 16, 3)) * 255
+    return bench._jpeg(Image.fromarray(sm.astype(np.uint8)).resize((w, h), Image.BICUBIC))
+
+IMAGES = [("vaca", s, _cow(s)) for s in range(12)] + [("manchas", s, _blobs(s)) for s in range(12)]
+
+@pytest.mark.parametrize("kind,seed,data", IMAGES, ids=[f"{k}{s}" for k, s, _ in IMAGES])
+def test_batched_variants_match_serial(kind, seed, data):
+    assert heuristics._batched_variants(Frame.from_bytes(data)) == heuristics._serial_variants(Frame.from_bytes(data))
+
+@pytest.mark.parametrize("kind,seed,data", IMAGES, ids=[f"{k}{s}" for k, s, _ in IMAGES])
+def test_ensemble_matches_serial(kind, seed, data):
+    a = heuristics.second_pass_ensemble(Frame.from_bytes(data), 0.7, batched=True)
+    b = heuristics.second_pass_ensemble(Frame.from_bytes(data), 0.7, batched=False)
+    assert a == b
+    assert a["n"] == 7
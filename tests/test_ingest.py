@@ -0,0 +1,133 @@
+"""
+ingest.py: BodyLimit responde 413 por Content-Length sin leer el cuerpo y corta un cuerpo
+sin Content-Length (o que miente) apenas supera el límite; read_upload responde 415 si no es
+una imagen, 413 por tamaño de archivo y 400 si viene vacío, y calcula el SHA-256 por bloques.
+Se llama a la app ASGI directamente para controlar los encabezados y contar lo que se leyó.
+"""
+import asyncio, hashlib, json
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+import ingest
+
+KB = 1024
+FILE_LIMIT = 200 * KB
+BODY_LIMIT = 400 * KB
+
+app = FastAPI()
+app.add_middleware(ingest.BodyLimit, limits={"/up": BODY_LIMIT, "/barra/": BODY_LIMIT})
+
+@app.post("/up")
+async def up(file: UploadFile = File(...)):
+    u = await ingest.read_upload(file, max_bytes=FILE_LIMIT)
+    return {"sha256": u.sha256, "size": u.size, "kind": u.kind, "spilled": u.spilled}
+
+@app.post("/libre")
+@app.post("/barra")
+async def libre(file: UploadFile = File(...)):
+    return {"size": len(await file.read())}
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 40
+BOUNDARY = "gbtestboundary"
+
+def multipart(data: bytes, filename="vaca.jpg") -> bytes:
+    return (f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def call(path, body: bytes, content_length="auto", chunk=16 * KB, method="POST"):
+    # devuelve (status, json, bytes de cuerpo entregados a la app)
+    headers = [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())]
+    if content_length == "auto":
+        content_length = len(body)
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": headers,
+             "client": ("127.0.0.1", 1), "server": ("test", 80)}
+    parts = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+    sent, out = [0], {"body": b""}
+
+    async def receive():
+        if sent[0] < len(parts):
+            p = parts[sent[0]]
+            sent[0] += 1
+            return {"type": "http.request", "body": p, "more_body": sent[0] < len(parts)}
+        return {"type": "http.disconnect"}
+
+    async def send(msg):
+        if msg["type"] == "http.response.start":
+            out["status"] = msg["status"]
+        elif msg["type"] == "http.response.body":
+            out["body"] += msg.get("body", b"")
+
+    asyncio.run(app(scope, receive, send))
+    delivered = sum(len(p) for p in parts[:sent[0]])
+    return out["status"], json.loads(out["body"] or b"null"), delivered
+
+@pytest.fixture
+def counters(monkeypatch):
+    c = dict.fromkeys(ingest._counters, 0)
+    monkeypatch.setattr(ingest, "_counters", c)
+    return c
+
+def test_accepts_image_and_hashes(counters):
+    status, body, _ = call("/up", multipart(JPEG))
+    assert status == 200
+    assert body == {"sha256": hashlib.sha256(JPEG).hexdigest(), "size": len(JPEG), "kind": "jpeg", "spilled": False}
+    assert counters["accepted"] == 1
+
+def test_not_an_image_is_415(counters):
+    status, body, _ = call("/up", multipart(b"%PDF-1.7\n" + b"x" * 5000, "vaca.pdf"))
+    assert status == 415 and "no es una imagen" in body["detail"]
+    assert counters["not_image"] == 1 and counters["accepted"] == 0
+
+def test_empty_file_is_400(counters):
+    status, body, _ = call("/up", multipart(b""))
+    assert status == 400 and counters["empty"] == 1
+
+def test_file_over_image_limit_is_413(counters):
+    # el cuerpo entra en BodyLimit pero el archivo supera MAX_IMAGE_BYTES de la ruta
+    status, body, _ = call("/up", multipart(JPEG + b"\0" * FILE_LIMIT))
+    assert status == 413 and "Imagen supera" in body["detail"]
+    assert counters["too_large"] == 1
+
+def test_declared_content_length_over_limit_reads_nothing(counters):
+    data = multipart(JPEG + b"\0" * BODY_LIMIT)
+    status, body, delivered = call("/up", data)
+    assert status == 413 and "Cuerpo supera" in body["detail"]
+    assert delivered == 0  # rechazado por el encabezado, sin leer el cuerpo
+    assert counters["body_too_large"] == 1
+
+@pytest.mark.parametrize("content_length", [None, "lie"], ids=["sin_content_length", "content_length_falso"])
+def test_streamed_body_over_limit_is_cut(counters, content_length):
+    data = multipart(JPEG + b"\0" * (3 * BODY_LIMIT))
+    chunk = 16 * KB
+    status, body, delivered = call("/up", data, content_length=1000 if content_length == "lie" else None, chunk=chunk)
+    assert status == 413 and "Cuerpo supera" in body["detail"]
+    # la lectura se corta en el primer bloque que pasa el límite, no al final del cuerpo
+    assert BODY_LIMIT < delivered <= BODY_LIMIT + chunk < len(data)
+    assert counters["body_too_large"] == 1 and counters["accepted"] == 0
+
+def test_streamed_body_under_limit_passes(counters):
+    status, body, _ = call("/up", multipart(JPEG), content_length=None, chunk=KB)
+    assert status == 200 and body["size"] == len(JPEG)
+
+def test_limit_is_per_route():
+    big = multipart(JPEG + b"\0" * BODY_LIMIT)
+    assert call("/libre", big)[0] == 200  # ruta sin límite
+    assert call("/barra", big)[0] == 413  # límite declarado como "/barra/": se normaliza sin la barra final
+
+def test_large_upload_spills_to_disk(monkeypatch):
+    if not hasattr(ingest.formparsers.MultiPartParser, "spool_max_size"):
+        pytest.skip("esta versión de Starlette no expone spool_max_size")
+    monkeypatch.setattr(ingest.formparsers.MultiPartParser, "spool_max_size", 64 * KB)
+    status, body, _ = call("/up", multipart(JPEG + b"\0" * (100 * KB)))
+    assert status == 200 and body["spilled"] is True
+
+@pytest.mark.parametrize("head,kind", [
+    (b"\xff\xd8\xff\xdb", "jpeg"), (b"\x89PNG\r\n\x1a\n", "png"), (b"RIFF\0\0\0\0WEBPVP8 ", "webp"),
+    (b"GIF89a", "gif"), (b"II*\x00", "tiff"), (b"MM\x00*", "tiff"), (b"BM\0\0", "bmp"),
+    (b"<svg", None), (b"RIFF\0\0\0\0WAVE", None), (b"", None)])
+def test_sniff(head, kind):
+    assert ingest.sniff(head) == kind
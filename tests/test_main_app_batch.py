@@ -0,0 +1,84 @@
+"""
+/evaluate y /evaluate/batch de main_app.py de punta a punta: pipeline real (pool de procesos +
+hilos), NDJSON por animal con resumen y reintento del lote cuando la cola CPU está llena (503).
+"""
+import json, os
+
+os.environ["WARMUP_ENABLED"] = "0"
+os.environ["RESULT_STORE_PATH"] = ""
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bench
+import execution
+import main_app
+
+LEVELS = {"NO_COMPRAR", "CONSIDERAR_BAJO", "CONSIDERAR_ALTO", "COMPRAR"}
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main_app.app) as c:
+        yield c
+
+def _cow(seed: int) -> bytes:
+    return bench._jpeg(bench.synthetic_cow(640, 480, seed=seed, lesions=seed % 3))
+
+def _batch(client, files, mode="levante"):
+    r = client.post("/evaluate/batch", data={"mode": mode}, files=files)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(l) for l in r.text.splitlines()]
+    return lines[:-1], lines[-1]["summary"]
+
+def test_evaluate_ok(client):
+    r = client.post("/evaluate", data={"mode": "levante"}, files={"file": ("v.jpg", _cow(1), "image/jpeg")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["decision_level"] in LEVELS
+    assert len(body["rubric"]) == 9 and body["health"] and body["breed"]["name"]
+    assert set(body["debug"]["stages_ms"]) == {"local", "breed"}
+
+def test_evaluate_pipeline_error_is_500(client):
+    # pasa la detección de formato (cabecera JPEG) pero PIL no la puede decodificar
+    r = client.post("/evaluate", data={"mode": "levante"},
+                    files={"file": ("x.jpg", b"\xff\xd8\xff\xe0" + b"\x00" * 256, "image/jpeg")})
+    assert r.status_code == 500
+    assert r.json()["message"] == "pipeline error"
+
+def test_batch_ok(client):
+    files = [("files", (f"v{i}.jpg", _cow(10 + i), "image/jpeg")) for i in range(4)]
+    files.append(("files", ("nota.txt", b"no es una imagen", "text/plain")))
+    items, summary = _batch(client, files, mode="engorde")
+    assert sorted(i["index"] for i in items) == list(range(5))
+    by_index = {i["index"]: i for i in items}
+    for i in range(4):
+        assert by_index[i]["status"] == "ok"
+        assert by_index[i]["result"]["decision_level"] in LEVELS
+    assert by_index[4]["status"] == "error" and by_index[4]["code"] == 415
+    assert summary["total"] == 5 and summary["ok"] == 4 and summary["errors"] == 1
+
+def test_batch_retries_when_overloaded(client, monkeypatch):
+    # las dos primeras tareas CPU encuentran la cola llena: cada animal reintenta y termina bien
+    real, calls = execution.run_cpu, {"n": 0}
+    def flaky(fn, *args):
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            raise execution.Overloaded("cola CPU llena")
+        return real(fn, *args)
+    monkeypatch.setattr(execution, "run_cpu", flaky)
+    files = [("files", (f"v{i}.jpg", _cow(20 + i), "image/jpeg")) for i in range(2)]
+    items, summary = _batch(client, files)
+    assert calls["n"] > 2
+    assert all(i["status"] == "ok" for i in items)
+    assert summary["ok"] == 2
+
+def test_batch_gives_up_after_retries(client, monkeypatch):
+    def full(fn, *args):
+        raise execution.Overloaded("cola CPU llena")
+    monkeypatch.setattr(execution, "run_cpu", full)
+    monkeypatch.setattr(main_app, "BATCH_RETRIES", 1)
+    items, summary = _batch(client, [("files", ("v.jpg", _cow(30), "image/jpeg"))])
+    assert items[0]["status"] == "error" and items[0]["code"] == 503
+    assert summary["errors"] == 1
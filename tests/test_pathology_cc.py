@@ -0,0 +1,97 @@
+"""
+Componentes conexas de pathology.py (runs + union-find) contra el flood fill original por
+píxel: mismas componentes (área y bbox) y misma partición de la máscara, sin importar el
+orden de las etiquetas.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+import pathology
+
+def _baseline_cc_label(mask: np.ndarray) -> Tuple[np.ndarray, List[Tuple[int,int,int,int,int]]]:
+    # versión anterior de pathology._cc_label, 4-conexa, tomada como referencia
+    h, w = mask.shape
+    labels = np.zeros((h,w), dtype=np.int32)
+    comp = []; cur = 0
+    visited = np.zeros_like(mask, dtype=bool)
+    for r in range(h):
+        for c in range(w):
+            if not mask[r,c] or visited[r,c]: continue
+            cur += 1
+            stack=[(r,c)]; visited[r,c]=True; labels[r,c]=cur
+            minr,minc,maxr,maxc = r,c,r,c; area=0
+            while stack:
+                rr,cc = stack.pop()
+                area += 1
+                if rr<minr: minr=rr
+                if rr>maxr: maxr=rr
+                if cc<minc: minc=cc
+                if cc>maxc: maxc=cc
+                for dr,dc in ((1,0),(-1,0),(0,1),(0,-1)):
+                    nr, nc = rr+dr, cc+dc
+                    if 0<=nr<h and 0<=nc<w and mask[nr,nc] and not visited[nr,nc]:
+                        visited[nr,nc]=True; labels[nr,nc]=cur; stack.append((nr,nc))
+            comp.append((area,minr,minc,maxr,maxc))
+    return labels, comp
+
+def _snake(h: int, w: int) -> np.ndarray:
+    # una sola componente que serpentea: une runs de filas alternando el extremo
+    m = np.zeros((h, w), dtype=bool)
+    m[::2] = True
+    for i, r in enumerate(range(1, h, 2)):
+        m[r, w-1 if i % 2 == 0 else 0] = True
+    return m
+
+def _comb(h: int, w: int) -> np.ndarray:
+    # dientes verticales unidos solo por la última fila: se fusionan tarde en el barrido
+    m = np.zeros((h, w), dtype=bool)
+    m[:, ::2] = True
+    m[-1] = True
+    return m
+
+def _random(h: int, w: int, p: float, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).random((h, w)) < p
+
+MASKS = [
+    ("vacia", np.zeros((17, 23), dtype=bool)),
+    ("llena", np.ones((9, 13), dtype=bool)),
+    ("vacia_0x0", np.zeros((0, 0), dtype=bool)),
+    ("1xN", _random(1, 64, 0.5, 1)),
+    ("Nx1", _random(64, 1, 0.5, 2)),
+    ("1xN_llena", np.ones((1, 40), dtype=bool)),
+    ("serpiente", _snake(31, 29)),
+    ("serpiente_1col", _snake(15, 1)),
+    ("peine", _comb(25, 33)),
+    ("peine_invertido", _comb(25, 33)[::-1]),
+    ("ajedrez", (np.indices((20, 20)).sum(axis=0) % 2).astype(bool)),
+] + [(f"azar_p{p}_s{s}", _random(48, 61, p, s)) for p in (0.1, 0.35, 0.5, 0.6, 0.9) for s in range(4)]
+
+def _same_partition(a: np.ndarray, b: np.ndarray, mask: np.ndarray) -> bool:
+    # misma partición: cero fuera de la máscara y una biyección entre etiquetas dentro
+    if (a[~mask] != 0).any() or (b[~mask] != 0).any() or (a[mask] == 0).any() or (b[mask] == 0).any():
+        return False
+    pairs = np.unique(np.stack([a[mask], b[mask]], axis=1), axis=0) if mask.any() else np.zeros((0, 2))
+    return len(np.unique(pairs[:, 0])) == len(pairs) == len(np.unique(pairs[:, 1]))
+
+@pytest.mark.parametrize("name,mask", MASKS, ids=[n for n, _ in MASKS])
+def test_cc_label_matches_baseline(name, mask):
+    ref_labels, ref_comp = _baseline_cc_label(mask)
+    labels, comp = pathology._cc_label(mask)
+    assert labels.shape == mask.shape
+    assert sorted(comp) == sorted(ref_comp)
+    assert _same_partition(labels, ref_labels, mask)
+    # la etiqueta k corresponde a comp[k-1]
+    for k, (area, minr, minc, maxr, maxc) in enumerate(comp, start=1):
+        rr, cc = np.nonzero(labels == k)
+        assert (len(rr), rr.min(), cc.min(), rr.max(), cc.max()) == (area, minr, minc, maxr, maxc)
+
+@pytest.mark.parametrize("name,mask", MASKS, ids=[n for n, _ in MASKS])
+def test_cc_stats_matches_baseline(name, mask):
+    _, ref_comp = _baseline_cc_label(mask)
+    st = pathology._cc_stats(mask)
+    comp = list(zip(st["area"].tolist(), st["minr"].tolist(), st["minc"].tolist(),
+                    st["maxr"].tolist(), st["maxc"].tolist()))
+    assert sorted(comp) == sorted(ref_comp)
+    assert int(st["area"].sum()) == int(mask.sum())
@@ -0,0 +1,109 @@
+"""
+ComponentIndex de pathology.py (un etiquetado de la máscara completa, consultas por ROI) contra
+el _analyze_region original, que volvía a etiquetar la máscara recortada a la ROI: mismas
+componentes (incluidas las que cruzan el borde y se parten), mismo rojo total y mismo "mejor"
+candidato, bit a bit.
+"""
+from typing import Any, Dict
+
+import numpy as np
+import pytest
+
+import bench
+import config
+import pathology
+
+def _baseline_analyze_region(mask: np.ndarray) -> Dict[str, Any]:
+    # versión anterior de pathology._analyze_region sobre la máscara ya recortada
+    # (_red_like es por píxel: recortar la imagen o la máscara da lo mismo)
+    st = pathology._cc_stats(mask)
+    h, w = mask.shape
+    img_area = h*w
+    cfg = config.current()
+    min_ar = cfg.min_area_ratio * img_area
+    max_ar = cfg.max_area_ratio * img_area
+    best = {"area":0,"bbox":(0,0,0,0),"oval":0.0,"extent":0.0,"aspect":0.0}
+    total_red = float(mask.mean())
+    idx = np.flatnonzero((st["area"] >= min_ar) & (st["area"] <= max_ar))
+    if idx.size:
+        minr, minc, maxr, maxc = st["minr"][idx], st["minc"][idx], st["maxr"][idx], st["maxc"][idx]
+        feats = pathology._shape_features_batch(pathology._integral(mask), minr, minc, maxr, maxc)
+        area = st["area"][idx]
+        scores = area * (0.5 + 0.5*feats["oval"]) * (0.5 + 0.5*feats["extent"])
+        for i in range(idx.size):
+            if scores[i] > best["area"]:
+                best = {"area":int(area[i]),"bbox":(int(minr[i]),int(minc[i]),int(maxr[i]),int(maxc[i])),
+                        "oval":float(feats["oval"][i]),"extent":float(feats["extent"][i]),"aspect":float(feats["aspect"][i])}
+    return {"total_red": total_red, "best": best, "mask_count": int(st["area"].size), "h":h, "w":w}
+
+def _blobs(h: int, w: int, cell: int, p: float, seed: int) -> np.ndarray:
+    # manchas de varios píxeles con bordes ruidosos: componentes dentro del rango de área de config
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((h // cell + 1, w // cell + 1)) < p
+    m = np.kron(coarse, np.ones((cell, cell), dtype=bool))[:h, :w]
+    return m ^ (rng.random((h, w)) < 0.04)
+
+def _rings(h: int, w: int) -> np.ndarray:
+    # anillos concéntricos: casi toda ROI los corta y los parte en varios trozos
+    yy, xx = np.indices((h, w))
+    d = np.hypot(yy - h / 2, xx - w / 2).astype(int)
+    return (d % 6) < 2
+
+def _snake(h: int, w: int) -> np.ndarray:
+    # una sola componente que serpentea por toda la imagen: cualquier ROI la corta
+    m = np.zeros((h, w), dtype=bool)
+    m[::2] = True
+    for i, r in enumerate(range(1, h, 2)):
+        m[r, w-1 if i % 2 == 0 else 0] = True
+    return m
+
+def _cow_mask(seed: int) -> np.ndarray:
+    return pathology._red_like(np.asarray(bench.synthetic_cow(160, 120, seed=seed, lesions=3)))
+
+MASKS = [
+    ("vacia", np.zeros((40, 50), dtype=bool)),
+    ("llena", np.ones((30, 45), dtype=bool)),
+    ("anillos", _rings(64, 80)),
+    ("serpiente", _snake(41, 70)),
+] + [(f"azar_p{p}_s{s}", np.random.default_rng(s).random((57, 73)) < p) for p in (0.2, 0.5, 0.6) for s in range(3)] \
+  + [(f"manchas_c{c}_s{s}", _blobs(90, 110, c, 0.3, s)) for c in (4, 9) for s in range(3)] \
+  + [(f"vaca_s{s}", _cow_mask(s)) for s in range(3)]
+
+def _rois(h: int, w: int, seed: int, n: int = 25):
+    # ROI completa, franjas de una fila/columna, las fijas del checklist y recortes al azar
+    out = [(0, h, 0, w), (0, 1, 0, w), (h - 1, h, 0, w), (0, h, w - 1, w), (h // 3, h // 3 + 1, w // 4, w // 4 + 1),
+           pathology._roi_bounds(h, w, 0.0, 0.35, 0.0, 0.35), pathology._roi_bounds(h, w, 0.55, 1.0, 0.55, 1.0)]
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        r0, r1 = sorted(rng.choice(h + 1, size=2, replace=False))
+        c0, c1 = sorted(rng.choice(w + 1, size=2, replace=False))
+        out.append((int(r0), int(r1), int(c0), int(c1)))
+    return out
+
+CASES = [(name, mask, roi) for i, (name, mask) in enumerate(MASKS) for roi in _rois(*mask.shape, seed=i)]
+
+@pytest.mark.parametrize("name,mask,roi", CASES, ids=[f"{n}-{r}" for n, _, r in CASES])
+def test_query_matches_cropped_labeling(name, mask, roi):
+    r0, r1, c0, c1 = roi
+    crop = mask[r0:r1, c0:c1]
+    ref = pathology._cc_stats(crop)
+    q = pathology.ComponentIndex(mask).query(r0, r1, c0, c1)
+    assert q["red"] == int(crop.sum())
+    # mismas componentes y en el mismo orden (primer píxel en orden raster dentro de la ROI)
+    for k, off in (("area", 0), ("minr", r0), ("maxr", r0), ("minc", c0), ("maxc", c0), ("first_r", r0), ("first_c", c0)):
+        assert (np.asarray(q[k]) - off).tolist() == np.asarray(ref[k]).tolist(), k
+
+@pytest.mark.parametrize("name,mask,roi", CASES, ids=[f"{n}-{r}" for n, _, r in CASES])
+def test_region_matches_baseline(name, mask, roi):
+    r0, r1, c0, c1 = roi
+    assert pathology.ComponentIndex(mask).region(r0, r1, c0, c1) == _baseline_analyze_region(mask[r0:r1, c0:c1])
+
+@pytest.mark.parametrize("h,w", [(1, 1), (2, 3), (3, 2), (5, 7), (64, 48)])
+def test_checklist_rois_match_baseline_crop(h, w):
+    # las ROI de run_pathology_heuristic recortan igual que el _roi original, también en imágenes mínimas
+    mask = np.random.default_rng(h * 100 + w).random((h, w)) < 0.5
+    index = pathology.ComponentIndex(mask)
+    for y0, y1, x0, x1 in ((0.0, 1.0, 0.0, 1.0), (0.0, 0.35, 0.0, 0.35), (0.55, 1.0, 0.55, 1.0)):
+        crop = pathology._roi(mask[:, :, None], y0, y1, x0, x1)[:, :, 0]
+        assert crop.size > 0
+        assert index.region(*pathology._roi_bounds(h, w, y0, y1, x0, x1)) == _baseline_analyze_region(crop)
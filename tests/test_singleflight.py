@@ -0,0 +1,118 @@
+"""
+SingleFlight: una sola ejecución por clave en vuelo, la cancelación de un cliente no cancela
+la tarea compartida y su resultado (o excepción) llega a todos los que esperan.
+"""
+import asyncio, gc
+
+import pytest
+
+from singleflight import SingleFlight
+
+class Work:
+    # trabajo controlable: cuenta llamadas, espera a `release` y devuelve o lanza
+    def __init__(self, result="ok", exc: BaseException = None):
+        self.calls, self.finished, self.cancelled = 0, 0, 0
+        self.result, self.exc = result, exc
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.finished += 1
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_concurrent_callers_share_one_flight():
+    async def go():
+        sf, work = SingleFlight("t"), Work(result={"v": 1})
+        waiters = [asyncio.ensure_future(sf.do("k", work)) for _ in range(5)]
+        await work.started.wait()
+        assert sf.stats() == {"inflight": 1, "leaders": 1, "followers": 4}
+        work.release.set()
+        out = await asyncio.gather(*waiters)
+        assert work.calls == 1 and all(o is out[0] for o in out)
+        assert sf.stats()["inflight"] == 0
+    run(go())
+
+def test_distinct_keys_and_later_calls_run_again():
+    async def go():
+        sf, a, b = SingleFlight("t"), Work("a"), Work("b")
+        a.release.set(); b.release.set()
+        assert await asyncio.gather(sf.do("a", a), sf.do("b", b)) == ["a", "b"]
+        # terminado el vuelo no queda nada cacheado: la próxima llamada vuelve a ejecutar
+        assert await sf.do("a", a) == "a" and a.calls == 2
+    run(go())
+
+def test_waiter_cancel_does_not_cancel_shared_flight():
+    async def go():
+        sf, work = SingleFlight("t"), Work()
+        leader = asyncio.ensure_future(sf.do("k", work))
+        follower = asyncio.ensure_future(sf.do("k", work))
+        await work.started.wait()
+        leader.cancel()  # el que lanzó la tarea se desconecta
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert sf.stats()["inflight"] == 1
+        work.release.set()
+        assert await follower == "ok"
+        assert (work.calls, work.finished, work.cancelled) == (1, 1, 0)
+    run(go())
+
+def test_flight_finishes_after_every_waiter_left():
+    async def go():
+        sf, work = SingleFlight("t"), Work()
+        waiters = [asyncio.ensure_future(sf.do("k", work)) for _ in range(3)]
+        await work.started.wait()
+        for w in waiters:
+            w.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # un cliente nuevo se suma al vuelo que sigue en curso, no lanza otro
+        late = asyncio.ensure_future(sf.do("k", work))
+        work.release.set()
+        assert await late == "ok"
+        assert (work.calls, work.finished, work.cancelled) == (1, 1, 0)
+    run(go())
+
+def test_exception_reaches_all_waiters():
+    async def go():
+        err = ValueError("proveedor caído")
+        sf, work = SingleFlight("t"), Work(exc=err)
+        waiters = [asyncio.ensure_future(sf.do("k", work)) for _ in range(4)]
+        await work.started.wait()
+        work.release.set()
+        out = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(o is err for o in out) and work.calls == 1
+        # la clave se libera: el reintento vuelve a ejecutar
+        assert sf.stats()["inflight"] == 0
+        work.exc = None
+        assert await sf.do("k", work) == "ok" and work.calls == 2
+    run(go())
+
+def test_unobserved_exception_is_not_reported():
+    # todos los clientes se fueron y la tarea falla: no debe quedar "Task exception was never retrieved"
+    async def go():
+        reported = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, ctx: reported.append(ctx))
+        sf, work = SingleFlight("t"), Work(exc=RuntimeError("x"))
+        waiter = asyncio.ensure_future(sf.do("k", work))
+        await work.started.wait()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        work.release.set()
+        while sf.stats()["inflight"]:
+            await asyncio.sleep(0)
+        del waiter
+        gc.collect()
+        await asyncio.sleep(0)
+        assert work.finished == 1 and reported == []
+    run(go())
@@ -0,0 +1,125 @@
+"""
+StageGraph: cada etapa arranca recién cuando terminan sus dependencias (y no espera a las
+demás), recibe sus entradas en el orden declarado, y un fallo se propaga a run(): las etapas
+que dependen de la fallida no corren y las que seguían en curso se cancelan.
+"""
+import asyncio
+
+import pytest
+
+from stagegraph import StageGraph
+
+class Log:
+    # eventos ("start"/"end"/"cancel", etapa) en el orden en que ocurren
+    def __init__(self):
+        self.events = []
+
+    def stage(self, name, delay=0.0, result=None, exc=None):
+        async def fn(*args):
+            self.events.append(("start", name, args))
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.events.append(("cancel", name, args))
+                raise
+            self.events.append(("end", name, args))
+            if exc is not None:
+                raise exc
+            return result if result is not None else f"{name}({','.join(map(str, args))})"
+        return fn
+
+    def index(self, kind, name):
+        return next(i for i, e in enumerate(self.events) if e[:2] == (kind, name))
+
+    def ran(self, name):
+        return any(e[1] == name for e in self.events)
+
+def _stage_tasks():
+    # tareas de etapas que siguen vivas en el loop
+    return [t for t in asyncio.all_tasks() if "run_stage" in t.get_coro().__qualname__ and not t.done()]
+
+def test_dependency_order_and_parallelism():
+    log = Log()
+    g = (StageGraph().value("img", "art")
+         .stage("upload", log.stage("upload", 0.01), "img")
+         .stage("morphology", log.stage("morphology", 0.03), "upload")
+         .stage("rubric", log.stage("rubric", 0.01), "morphology")
+         .stage("health", log.stage("health", 0.01), "upload")
+         .stage("breed", log.stage("breed", 0.02), "upload")
+         .stage("health_breed", log.stage("health_breed"), "health", "breed")
+         .stage("decision", log.stage("decision"), "rubric"))
+    results, timings = asyncio.run(g.run())
+    deps = {"upload": [], "morphology": ["upload"], "rubric": ["morphology"], "health": ["upload"],
+            "breed": ["upload"], "health_breed": ["health", "breed"], "decision": ["rubric"]}
+    for name, after in deps.items():
+        for dep in after:
+            assert log.index("end", dep) < log.index("start", name), (dep, name)
+            assert timings[dep]["end_ms"] <= timings[name]["start_ms"]
+    # health/breed no esperan a la cadena morphology → rubric, y health_breed tampoco
+    assert log.index("start", "health") < log.index("end", "morphology")
+    assert log.index("start", "breed") < log.index("end", "morphology")
+    assert log.index("end", "health_breed") < log.index("end", "morphology")
+    assert results["img"] == "art" and results["upload"] == "upload(art)"
+    assert results["health_breed"] == "health_breed(health(upload(art)),breed(upload(art)))"
+    assert results["decision"] == "decision(rubric(morphology(upload(art))))"
+    assert set(timings) == set(deps)
+    assert all(t["ms"] >= 0 and t["end_ms"] >= t["start_ms"] for t in timings.values())
+
+def test_arguments_follow_declared_order():
+    log = Log()
+    g = (StageGraph().value("a", 1).value("b", 2)
+         .stage("slow", log.stage("slow", 0.02, result="S"))
+         .stage("fast", log.stage("fast", 0.0, result="F"))
+         .stage("join", log.stage("join"), "slow", "b", "fast", "a"))
+    results, _ = asyncio.run(g.run())
+    assert results["join"] == "join(S,2,F,1)"
+
+def test_values_only_graph():
+    results, timings = asyncio.run(StageGraph().value("rubric", [1]).run())
+    assert results == {"rubric": [1]} and timings == {}
+
+def test_declaration_errors():
+    g = StageGraph().value("img", b"x")
+    with pytest.raises(ValueError):
+        g.stage("rubric", Log().stage("rubric"), "morphology")  # dependencia aún no declarada
+    g.stage("upload", Log().stage("upload"), "img")
+    with pytest.raises(ValueError):
+        g.stage("upload", Log().stage("upload"), "img")
+    with pytest.raises(ValueError):
+        g.stage("img", Log().stage("img"))
+
+def test_failure_propagates_and_cancels():
+    log = Log()
+    err = RuntimeError("prompt_4 falló")
+    g = (StageGraph().value("img", "art")
+         .stage("upload", log.stage("upload"), "img")
+         .stage("morphology", log.stage("morphology", 5.0), "upload")
+         .stage("rubric", log.stage("rubric"), "morphology")
+         .stage("health", log.stage("health", 0.01, exc=err), "upload")
+         .stage("breed", log.stage("breed"), "upload")
+         .stage("health_breed", log.stage("health_breed"), "health", "breed"))
+
+    async def go():
+        with pytest.raises(RuntimeError) as ei:
+            await g.run()
+        assert ei.value is err
+        # no queda ninguna etapa colgando en el loop
+        assert _stage_tasks() == []
+    asyncio.run(asyncio.wait_for(go(), timeout=2))
+    assert not log.ran("health_breed") and not log.ran("rubric")  # dependían de la fallida / cancelada
+    assert log.ran("breed") and ("end", "breed") in [e[:2] for e in log.events]
+    assert ("cancel", "morphology") in [e[:2] for e in log.events]
+
+def test_cancelling_run_cancels_stages():
+    log = Log()
+    g = StageGraph().stage("a", log.stage("a", 5.0)).stage("b", log.stage("b"), "a")
+
+    async def go():
+        task = asyncio.ensure_future(g.run())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert _stage_tasks() == []
+    asyncio.run(asyncio.wait_for(go(), timeout=2))
+    assert ("cancel", "a") in [e[:2] for e in log.events] and not log.ran("b")
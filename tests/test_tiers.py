@@ -0,0 +1,95 @@
+"""
+tiers.escalation_reasons: cada umbral de "escalation" en su valor exacto (no escala) y apenas
+pasado (escala con su motivo), interruptores on_*, datos no medidos que no cuentan, totales
+de by_mode y overrides de config.json sobre DEFAULTS; más los contadores de TierStats.
+"""
+import pytest
+
+import config
+import tiers
+
+def _calm(**diag):
+    # veredicto heurístico sin ninguna señal de duda con la configuración por defecto
+    far = max(tiers._cutoffs()) + 1.0
+    dg = {"evidence": 4.0, "visible_ratio": 0.9, "total_1to5": far, "sigma_rubric": 0.2, "low_conf_count": 0,
+          "conflict_ribs_bcs": False, "SI_global": 0.9}
+    dg.update(diag)
+    return {"diagnostics": dg, "health": [{"name": "cojera", "status": "descartado"}]}
+
+def _with_health(status):
+    h = _calm()
+    h["health"] = [{"name": "cojera", "status": "descartado"}, {"name": "lesion_cutanea", "status": status}]
+    return h
+
+D = dict(tiers.DEFAULTS)
+CUT = tiers._cutoffs()[0]
+
+# (caso, h, overrides de settings, motivos esperados)
+CASES = [
+    ("tranquilo", _calm(), {}, []),
+    ("evidencia_en_umbral", _calm(evidence=D["min_evidence"]), {}, []),
+    ("evidencia_baja", _calm(evidence=D["min_evidence"] - 0.01), {}, ["low_evidence"]),
+    ("sin_evidencia", {"diagnostics": {"total_1to5": CUT + 1.0}}, {}, ["low_evidence"]),
+    ("visibilidad_en_umbral", _calm(visible_ratio=D["min_visible_ratio"]), {}, []),
+    ("visibilidad_baja", _calm(visible_ratio=D["min_visible_ratio"] - 0.01), {}, ["low_visibility"]),
+    ("visibilidad_no_medida", _calm(visible_ratio=None), {}, []),
+    ("limite_arriba", _calm(total_1to5=CUT + D["borderline_margin"] / 2), {}, ["borderline"]),
+    ("limite_abajo", _calm(total_1to5=CUT - D["borderline_margin"] / 2), {}, ["borderline"]),
+    ("fuera_del_margen", _calm(total_1to5=CUT + D["borderline_margin"] * 1.5), {}, []),
+    ("margen_cero", _calm(total_1to5=CUT), {"borderline_margin": 0.0}, []),
+    ("sigma_en_umbral", _calm(sigma_rubric=D["max_rubric_sigma"]), {}, []),
+    ("sigma_alta", _calm(sigma_rubric=D["max_rubric_sigma"] + 0.01), {}, ["rubric_dispersion"]),
+    ("baja_conf_en_umbral", _calm(low_conf_count=D["max_low_conf"]), {}, []),
+    ("baja_conf_excedida", _calm(low_conf_count=D["max_low_conf"] + 1), {}, ["low_confidence"]),
+    ("costillas_bcs", _calm(conflict_ribs_bcs=True), {}, ["ribs_bcs_conflict"]),
+    ("costillas_bcs_apagado", _calm(conflict_ribs_bcs=True), {"on_ribs_bcs_conflict": False}, []),
+    ("estabilidad_en_umbral", _calm(SI_global=D["min_stability"]), {}, []),
+    ("inestable", _calm(SI_global=D["min_stability"] - 0.01), {}, ["unstable"]),
+    ("sin_segunda_pasada", _calm(SI_global=None), {}, []),
+    ("salud_alerta", _with_health("alerta"), {}, ["health_alert"]),
+    ("salud_confirmada", _with_health("confirmada"), {}, ["health_alert"]),
+    ("salud_apagado", _with_health("alerta"), {"on_health_alert": False}, []),
+    ("umbral_propio", _calm(evidence=3.0), {"min_evidence": 3.5}, ["low_evidence"]),
+    ("varios_motivos", _calm(evidence=1.0, sigma_rubric=0.9, SI_global=0.1), {},
+     ["low_evidence", "rubric_dispersion", "unstable"]),
+    ("desactivado", _calm(evidence=0.0), {"enabled": False}, ["escalation_disabled"]),
+]
+
+@pytest.mark.parametrize("h,over,expected", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_escalation_reasons(h, over, expected):
+    assert tiers.escalation_reasons(h, {**tiers.DEFAULTS, **over}) == expected
+
+def test_borderline_in_any_mode():
+    # mode=all: el total del modo principal está lejos de los cortes pero otro modo cae en el límite
+    h = _calm()
+    h["by_mode"] = {"engorde": {"total_1to5": CUT + 1.0}, "vaca_flaca": {"total_1to5": CUT + 0.01}}
+    assert tiers.escalation_reasons(h, dict(tiers.DEFAULTS)) == ["borderline"]
+    h["by_mode"]["vaca_flaca"]["total_1to5"] = CUT + 1.0
+    assert tiers.escalation_reasons(h, dict(tiers.DEFAULTS)) == []
+
+def test_settings_override_defaults(monkeypatch):
+    cfg = config.Compiled({"escalation": {"min_evidence": 4.5, "on_health_alert": False},
+                           "decision_sublevels": {"no_comprar_max": 2.0, "considerar_bajo_max": 3.0,
+                                                  "considerar_alto_max": 4.0}}, "test")
+    monkeypatch.setattr(config, "_current", cfg)
+    monkeypatch.setattr(config, "CONFIG_RELOAD_S", 0)
+    s = tiers.settings()
+    assert s["min_evidence"] == 4.5 and s["on_health_alert"] is False
+    assert s["max_rubric_sigma"] == tiers.DEFAULTS["max_rubric_sigma"]
+    assert tiers._cutoffs() == [2.0, 3.0, 4.0]
+    h = _with_health("alerta")
+    h["diagnostics"].update(evidence=4.0, total_1to5=3.02)
+    assert tiers.escalation_reasons(h) == ["low_evidence", "borderline"]
+
+def test_tier_stats():
+    st = tiers.TierStats(window=3)
+    assert st.stats()["escalation_rate"] is None and st.stats()["ai"]["p50_ms"] is None
+    for ms in (10, 20, 30, 40):  # la ventana conserva las 3 últimas latencias
+        st.record("heuristic", ms)
+    st.record("ai", 900, ["borderline", "low_evidence"])
+    st.record("heuristic", 50, ["borderline"], escalation_error=True)
+    s = st.stats()
+    assert (s["total"], s["escalation_rate"], s["escalation_errors"]) == (6, round(1 / 6, 3), 1)
+    assert s["reasons"] == {"borderline": 2, "low_evidence": 1}
+    assert s["heuristic"] == {"count": 5, "p50_ms": 40.0, "p95_ms": 49.0, "mean_ms": 40.0}
+    assert s["ai"]["count"] == 1 and s["ai"]["p95_ms"] == 900.0
@@ -0,0 +1,103 @@
+"""
+GanadoBravo — tiers.py
+
+Evaluación escalonada: primero el veredicto heurístico (NumPy, milisegundos); solo los
+casos con señales de duda escalan a la IA de visión. Es el mismo criterio que usa
+heuristics.apply_heuristic_scoring para lanzar la 2ª pasada, llevado a todo el servicio.
+
+Umbrales en config.json → "escalation" (los que falten toman DEFAULTS):
+- enabled              false = siempre IA (comportamiento anterior)
+- min_evidence         evidencia 1–5 (visibilidad + contraste) por debajo → escala
+- min_visible_ratio    solo si la visibilidad fue medida
+- borderline_margin    |total − corte de decision_sublevels| menor a esto → escala
+- max_rubric_sigma     dispersión de la rubric heurística
+- max_low_conf         cuántas estimaciones con conf < 0.6 se toleran
+- on_ribs_bcs_conflict costillas marcadas con BCS alto → escala
+- min_stability        SI de la 2ª pasada por debajo → escala
+- on_health_alert      cualquier hallazgo de salud no descartado → escala
+"""
+from typing import Any, Dict, List, Optional
+from collections import deque
+import threading
+import numpy as np
+
+import config
+
+DEFAULTS = {
+    "enabled": True,
+    "min_evidence": 2.5,
+    "min_visible_ratio": 0.55,
+    "borderline_margin": 0.1,
+    "max_rubric_sigma": 0.6,
+    "max_low_conf": 1,
+    "on_ribs_bcs_conflict": True,
+    "min_stability": 0.55,
+    "on_health_alert": True,
+}
+
+def settings() -> Dict[str, Any]:
+    return {**DEFAULTS, **(config.current().get("escalation") or {})}
+
+def _cutoffs() -> List[float]:
+    return list(config.current().cutoffs)
+
+def escalation_reasons(h: Dict[str, Any], s: Optional[Dict[str, Any]] = None) -> List[str]:
+    # h: salida de pipeline_real.heuristic_eval (con "diagnostics"); [] = el veredicto heurístico basta
+    s = s or settings()
+    if not s["enabled"]:
+        return ["escalation_disabled"]
+    dg = h.get("diagnostics") or {}
+    out = []
+    if float(dg.get("evidence", 0.0)) < s["min_evidence"]:
+        out.append("low_evidence")
+    vis = dg.get("visible_ratio")
+    if vis is not None and float(vis) < s["min_visible_ratio"]:
+        out.append("low_visibility")
+    # con mode=all (by_mode) cuenta el límite de cualquiera de los modos
+    totals = [float(dg.get("total_1to5", 0.0))] + [float(v["total_1to5"]) for v in (h.get("by_mode") or {}).values()]
+    if any(abs(t - c) < s["borderline_margin"] for t in totals for c in _cutoffs()):
+        out.append("borderline")
+    if float(dg.get("sigma_rubric", 0.0)) > s["max_rubric_sigma"]:
+        out.append("rubric_dispersion")
+    if int(dg.get("low_conf_count", 0)) > s["max_low_conf"]:
+        out.append("low_confidence")
+    if s["on_ribs_bcs_conflict"] and dg.get("conflict_ribs_bcs"):
+        out.append("ribs_bcs_conflict")
+    si = dg.get("SI_global")
+    if si is not None and float(si) < s["min_stability"]:
+        out.append("unstable")
+    if s["on_health_alert"] and any(x.get("status") != "descartado" for x in h.get("health", [])):
+        out.append("health_alert")
+    return out
+
+class TierStats:
+    def __init__(self, window: int = 2000):
+        self._lock = threading.Lock()
+        self._lat = {"heuristic": deque(maxlen=window), "ai": deque(maxlen=window)}
+        self._count = {"heuristic": 0, "ai": 0}
+        self._reasons: Dict[str, int] = {}
+        self._errors = 0
+
+    def record(self, tier: str, ms: float, reasons: List[str] = (), escalation_error: bool = False):
+        # escalation_error: se intentó la IA y falló; la respuesta fue la heurística (tier "heuristic")
+        with self._lock:
+            self._count[tier] += 1
+            self._lat[tier].append(ms)
+            self._errors += escalation_error
+            for r in reasons:
+                self._reasons[r] = self._reasons.get(r, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._count.values())
+            out = {"total": total, "escalation_rate": round(self._count["ai"]/total, 3) if total else None,
+                   "reasons": dict(self._reasons), "escalation_errors": self._errors}
+            for tier, lat in self._lat.items():
+                a = np.array(lat) if lat else None
+                out[tier] = {"count": self._count[tier],
+                             "p50_ms": round(float(np.percentile(a, 50)), 1) if a is not None else None,
+                             "p95_ms": round(float(np.percentile(a, 95)), 1) if a is not None else None,
+                             "mean_ms": round(float(a.mean()), 1) if a is not None else None}
+            return out
+
+STATS = TierStats()
@@ -0,0 +1,70 @@
+"""
+GanadoBravo — upload.py
+
+Artefacto de subida para las llamadas de visión: la imagen se reduce al lado largo
+configurado y se codifica a JPEG UNA vez por request; PROMPT_1/4/5 (main.py), la evaluación
+completa por IA (pipeline_real) y la raza por IA (breed_ai) reutilizan el mismo base64.
+Si el archivo original ya es un JPEG dentro de límites se envía tal cual.
+
+Variables de entorno:
+- UPLOAD_LONG_SIDE      lado largo máximo en px (default 1024)
+- UPLOAD_JPEG_QUALITY   calidad JPEG inicial (default 85)
+- UPLOAD_MAX_KB         si el JPEG supera este tamaño se re-codifica con menor calidad (default 300)
+"""
+from typing import Any, Dict, NamedTuple, Union
+import io, os, time, base64
+from PIL import Image
+
+from frame import Frame, FrameLike, as_frame
+
+UPLOAD_LONG_SIDE = int(os.getenv("UPLOAD_LONG_SIDE", "1024"))
+UPLOAD_JPEG_QUALITY = int(os.getenv("UPLOAD_JPEG_QUALITY", "85"))
+UPLOAD_MAX_KB = int(os.getenv("UPLOAD_MAX_KB", "300"))
+
+class UploadArtifact(NamedTuple):
+    b64: str
+    size: tuple
+    source_bytes: int
+    upload_bytes: int
+    quality: int
+    encode_ms: float
+
+    @property
+    def data_url(self) -> str:
+        return "data:image/jpeg;base64," + self.b64
+
+    def stats(self) -> Dict[str, Any]:
+        return {"width": self.size[0], "height": self.size[1], "source_bytes": self.source_bytes,
+                "upload_bytes": self.upload_bytes, "quality": self.quality, "encode_ms": self.encode_ms}
+
+ImageLike = Union[UploadArtifact, FrameLike]
+
+def _encode(fr: Frame, long_side: int, quality: int) -> UploadArtifact:
+    t0 = time.perf_counter()
+    w, h = fr.size
+    src = fr.source
+    src_len = len(src) if src is not None else 0
+    max_bytes = UPLOAD_MAX_KB * 1024
+    if src is not None and fr.format == "JPEG" and max(w, h) <= long_side and src_len <= max_bytes:
+        data, q = src, 0  # ya es un JPEG pequeño: sin re-codificar
+    else:
+        img = fr.level(long_side).convert("RGB")
+        q = quality
+        while True:
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=q, optimize=True)
+            data = buf.getvalue()
+            if len(data) <= max_bytes or q <= 60:
+                break
+            q -= 10
+        w, h = img.size
+    return UploadArtifact(base64.b64encode(data).decode("ascii"), (w, h), src_len, len(data), q,
+                          round((time.perf_counter() - t0) * 1000, 1))
+
+def build(img: ImageLike, long_side: int = None, quality: int = None) -> UploadArtifact:
+    if isinstance(img, UploadArtifact):
+        return img
+    long_side = long_side or UPLOAD_LONG_SIDE
+    quality = quality or UPLOAD_JPEG_QUALITY
+    fr = as_frame(img)
+    return fr.memo(("upload", long_side, quality), lambda: _encode(fr, long_side, quality))
@@ -0,0 +1,174 @@
+"""
+GanadoBravo — warmup.py
+
+Arranque en caliente de cada worker de uvicorn. Al iniciar, en segundo plano:
+- importa los módulos del pipeline (NumPy, PIL, heurísticas, patología, raza, SDK de OpenAI)
+  midiendo el tiempo de importación de cada uno;
+- corre las heurísticas completas sobre un bovino sintético chico, en este proceso y en cada
+  worker del pool CPU, para pagar ahí la inicialización perezosa (decodificadores de PIL,
+  config.json, hilos de patología, primeras llamadas de NumPy);
+- abre las conexiones HTTP (TCP + TLS) en el pool async de cada proveedor que se va a usar: el de
+  providers.get_provider() (raza y evaluación completa) y OpenAI si además lo usa el SDK de main.py.
+
+Hasta que termina, /healthz responde 503 con la fase en curso para que el balanceador no mande compradores
+a un worker frío. Un fallo en una fase queda en el reporte pero no deja al worker fuera para
+siempre: al terminar (o al vencer WARMUP_TIMEOUT_S) se marca listo igual.
+
+Variables de entorno:
+- WARMUP_ENABLED     "0" desactiva el calentamiento (el worker queda listo de inmediato)
+- WARMUP_SIZE        ancho en px de la imagen sintética (default 320)
+- WARMUP_CONNECT     "0" no abre conexiones con el proveedor
+- WARMUP_TIMEOUT_S   tope del calentamiento completo (default 60)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio, importlib, io, os, sys, time
+
+import metrics
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+WARMUP_SIZE = max(64, int(os.getenv("WARMUP_SIZE", "320")))
+WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "1") != "0"
+WARMUP_TIMEOUT_S = float(os.getenv("WARMUP_TIMEOUT_S", "60"))
+
+# en orden de dependencia: cada tiempo es lo que agrega ese módulo sobre los anteriores
+KERNEL_MODULES = ("numpy", "PIL.Image", "frame", "heuristics", "pathology", "breed", "decision", "tiers",
+                  "pipeline_real", "lot")
+MODULES = KERNEL_MODULES + ("openai", "breed_ai")
+
+IMPORTS_MS: Dict[str, float] = {}
+STATE: Dict[str, Any] = {"ready": not WARMUP_ENABLED, "phase": "idle" if WARMUP_ENABLED else "disabled",
+                         "started": time.time(), "ready_after_s": None, "errors": []}
+_task: Optional[asyncio.Task] = None
+
+def timed_import(name: str):
+    # importa y registra cuánto costó; si ya estaba cargado no cuenta (lo pagó otro módulo)
+    if name in sys.modules:
+        return sys.modules[name]
+    t = time.perf_counter()
+    mod = importlib.import_module(name)
+    IMPORTS_MS[name] = round((time.perf_counter() - t) * 1000, 1)
+    return mod
+
+def preload(modules=MODULES) -> Dict[str, Any]:
+    loaded, failed = {}, {}
+    for name in modules:
+        try:
+            timed_import(name)
+            loaded[name] = IMPORTS_MS.get(name, 0.0)
+        except Exception as e:  # dependencia opcional ausente (p. ej. openai): se reporta y se sigue
+            failed[name] = f"{type(e).__name__}: {e}"
+    return {"imports_ms": loaded, "failed": failed}
+
+def _sample(width: int = WARMUP_SIZE) -> bytes:
+    # bovino sintético: pasa por todas las ramas de heurísticas y patología
+    from synthetic import synthetic_cow
+    buf = io.BytesIO()
+    synthetic_cow(width, width * 3 // 4, seed=7, lesions=1).save(buf, format="JPEG", quality=88)
+    return buf.getvalue()
+
+def warm_kernels(width: int = WARMUP_SIZE) -> Dict[str, Any]:
+    # se ejecuta en este proceso y como tarea del pool CPU (función de módulo: picklable)
+    imports = preload(KERNEL_MODULES)
+    import pipeline_real, phash
+    from frame import Frame
+    data = _sample(width)
+    t = time.perf_counter()
+    out = pipeline_real.heuristic_eval(data, "levante")
+    phash.fingerprint(Frame.from_bytes(data))
+    return {"pid": os.getpid(), "ms": round((time.perf_counter() - t) * 1000, 1),
+            "stages_ms": out.get("timings_ms", {}), **imports}
+
+def _probe(provider: str):
+    # GET liviano al host del proveedor: cualquier respuesta HTTP deja la conexión en el pool
+    import providers
+    if provider == "azure":
+        url = os.getenv("AZURE_OPENAI_ENDPOINT", "").rstrip("/") + "/openai/models?api-version=" + \
+            providers.AZURE_OPENAI_API_VERSION
+        headers = {"api-key": os.getenv("AZURE_OPENAI_API_KEY", "")}
+    else:
+        url = f"{providers.OPENAI_BASE_URL}/models"
+        headers = {"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY','')}"}
+    return url, headers, providers.timeout(providers.HTTP_CONNECT_TIMEOUT_S * 2)
+
+async def warm_providers() -> Dict[str, Any]:
+    import providers
+    provider = providers.get_provider()
+    # el SDK de main.py va siempre a OpenAI: con Azure configurado se calientan los dos pools
+    names = [provider] + (["openai"] if provider != "openai" and providers.configured("openai") else [])
+    out: Dict[str, Any] = {"provider": provider}
+    for name in names:
+        url, headers, tmo = _probe(name)
+        t = time.perf_counter()
+        try:
+            r = await providers.async_client(name).get(url, headers=headers, timeout=tmo)
+            out[name] = {"url": url.split("?")[0], "status": r.status_code, "ms": round((time.perf_counter() - t) * 1000, 1)}
+        except Exception as e:
+            out[name] = {"url": url.split("?")[0], "error": f"{type(e).__name__}: {e}"}
+    return out
+
+async def _phase(name: str, aw):
+    STATE["phase"] = name
+    t, status = time.perf_counter(), "ok"
+    try:
+        STATE[name] = await aw
+    except Exception as e:
+        STATE["errors"].append(f"{name}: {type(e).__name__}: {e}")
+        status = "error"
+    metrics.STAGE_SECONDS.observe(time.perf_counter() - t, stage=f"warmup_{name}", status=status)
+
+async def _warm_pool() -> List[Dict[str, Any]]:
+    # una tarea por worker, en paralelo: cada submit sin worker libre levanta uno nuevo
+    import execution
+    if execution.CPU_POOL_KIND != "process":
+        return []
+    res = await asyncio.gather(*[execution.run_cpu(warm_kernels) for _ in range(execution.CPU_WORKERS)],
+                               return_exceptions=True)
+    for r in res:
+        if isinstance(r, BaseException):
+            raise r
+    return [{"pid": r["pid"], "ms": r["ms"]} for r in res]
+
+async def run():
+    import execution
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(_run(execution), timeout=WARMUP_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        STATE["errors"].append(f"timeout tras {WARMUP_TIMEOUT_S:g} s en fase {STATE['phase']}")
+    finally:
+        STATE["warmup_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        STATE["ready_after_s"] = round(time.time() - STATE["started"], 2)
+        STATE["phase"], STATE["ready"] = "ready", True
+
+async def _run(execution):
+    # imports en un hilo: el event loop sigue respondiendo /healthz mientras tanto
+    await _phase("imports", execution.run_io(preload))
+    kernels = _phase("kernels", execution.run_io(warm_kernels))
+    pool = _phase("cpu_pool", _warm_pool())
+    conns = _phase("providers", warm_providers()) if WARMUP_CONNECT else asyncio.sleep(0)
+    await asyncio.gather(kernels, pool, conns)
+
+def start():
+    # llamar desde el startup de la app; una sola vez por proceso
+    global _task
+    if not WARMUP_ENABLED or _task is not None:
+        return
+    STATE["started"] = time.time()
+    _task = asyncio.get_running_loop().create_task(run())
+
+def status() -> Dict[str, Any]:
+    return {**STATE, "imports_ms": dict(IMPORTS_MS)}
+
+def healthz(version: str = None) -> Tuple[int, Dict[str, Any]]:
+    body = {"ok": STATE["ready"], "ready": STATE["ready"], "phase": STATE["phase"]}
+    if version:
+        body["version"] = version
+    if STATE["ready"]:
+        body["ready_after_s"] = STATE["ready_after_s"]
+        if STATE["errors"]:
+            body["warnings"] = list(STATE["errors"])
+    return (200 if STATE["ready"] else 503), body
+
+metrics.Gauge("ganadobravo_ready", "1 cuando el worker terminó el calentamiento", lambda: 1 if STATE["ready"] else 0)
+metrics.Gauge("ganadobravo_import_seconds", "Tiempo de importación por módulo al arrancar",
+              lambda: {k: v / 1000 for k, v in IMPORTS_MS.items()}, ("module",))